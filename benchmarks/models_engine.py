@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks of the CAiMIRA models engine (``caimira.models`` and
+``caimira.monte_carlo``), with their results stored as JSON and compared
+against a baseline to flag performance regressions.
+
+Each benchmark builds a fresh model before every (timed) repetition, such that
+the method caches of the models do not hide the cost of the computation.
+
+Usage::
+
+    python benchmarks/models_engine.py run --output baseline.json
+    # ... change the models ...
+    python benchmarks/models_engine.py run --output results.json
+    python benchmarks/models_engine.py compare baseline.json results.json [--threshold 0.1]
+
+The comparison exits with a non-zero status if any benchmark is slower than
+its baseline by more than the threshold (a fraction of the baseline time).
+
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+import typing
+
+import numpy as np
+
+import caimira
+from caimira import models
+from caimira.apps.calculator import model_generator
+
+#: The relative slowdown beyond which a benchmark is flagged as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+DEFAULT_SAMPLE_SIZE = 250_000
+DEFAULT_REPEAT = 5
+
+#: The times (in hours) at which the concentrations are evaluated.
+CONCENTRATION_TIMES = tuple(np.linspace(8.5, 18.5, 41))
+
+#: A callable which builds the (untimed) state of a benchmark, and returns
+#: the (timed) callable of the benchmark.
+Setup = typing.Callable[[], typing.Callable[[], typing.Any]]
+
+
+def _form(short_range: bool = False, geographic_data: bool = False) -> model_generator.FormData:
+    form_data = model_generator.baseline_raw_form_data()
+    if short_range:
+        form_data['short_range_option'] = 'short_range_yes'
+        form_data['short_range_interactions'] = json.dumps([
+            {'expiration': 'Shouting', 'start_time': '10:30', 'duration': '30'},
+            {'expiration': 'Speaking', 'start_time': '14:00', 'duration': '15'},
+        ])
+    if geographic_data:
+        form_data['geographic_population'] = 100_000
+        form_data['geographic_cases'] = 500
+    return model_generator.FormData.from_dict(form_data)
+
+
+def _scalar_concentration_model(state_changes: int = 4) -> models.ConcentrationModel:
+    """A deterministic concentration model, whose windows open ``state_changes`` times."""
+    return models.ConcentrationModel(
+        room=models.Room(volume=75, inside_temp=models.PiecewiseConstant((0., 24.), (293,))),
+        ventilation=models.MultipleVentilation((
+            models.SlidingWindow(
+                active=models.PeriodicInterval(period=24 * 60 / state_changes, duration=12 * 60 / state_changes),
+                outside_temp=models.PiecewiseConstant((0., 24.), (283,)),
+                window_height=1.6, opening_length=0.6,
+            ),
+            models.AirChange(active=models.PeriodicInterval(period=120, duration=120), air_exch=0.25),
+        )),
+        infected=models.InfectedPopulation(
+            number=1,
+            virus=models.Virus.types['SARS_CoV_2'],
+            presence=models.SpecificInterval(((8.5, 12.5), (13.5, 18.5))),
+            mask=models.Mask.types['No mask'],
+            activity=models.Activity.types['Seated'],
+            expiration=models.Expiration.types['Speaking'],
+            host_immunity=0.,
+        ),
+        evaporation_factor=0.3,
+    )
+
+
+def concentration_scalar() -> typing.Callable[[], typing.Any]:
+    model = _scalar_concentration_model()
+    return lambda: [model.concentration(t) for t in CONCENTRATION_TIMES]
+
+
+def concentration_sampled(sample_size: int) -> Setup:
+    mc_model = _form().build_mc_model()
+
+    def setup():
+        model = mc_model.concentration_model.build_model(size=sample_size)
+        return lambda: [model.concentration(t) for t in CONCENTRATION_TIMES]
+    return setup
+
+
+def normed_integrated_concentration(state_changes: int) -> Setup:
+    def setup():
+        model = _scalar_concentration_model(state_changes)
+        return lambda: model.normed_integrated_concentration(0., 24.)
+    return setup
+
+
+def deposited_exposure(sample_size: int, short_range: bool) -> Setup:
+    mc_model = _form(short_range=short_range).build_mc_model()
+
+    def setup():
+        model = mc_model.build_model(size=sample_size)
+        return model.deposited_exposure
+    return setup
+
+
+def total_probability_rule(sample_size: int) -> Setup:
+    mc_model = _form(geographic_data=True).build_mc_model()
+
+    def setup():
+        model = mc_model.build_model(size=sample_size)
+        return model.total_probability_rule
+    return setup
+
+
+def build_model(sample_size: int) -> Setup:
+    mc_model = _form(short_range=True).build_mc_model()
+    return lambda: lambda: mc_model.build_model(size=sample_size)
+
+
+def benchmarks(sample_size: int) -> typing.Dict[str, Setup]:
+    """The benchmarks, by name. Their setup is deferred until they are run."""
+    return {
+        'concentration[scalar]': lambda: concentration_scalar(),
+        f'concentration[{sample_size}]': lambda: concentration_sampled(sample_size)(),
+        **{
+            f'normed_integrated_concentration[{state_changes}_state_changes]': normed_integrated_concentration(state_changes)
+            for state_changes in (4, 40, 400)
+        },
+        f'deposited_exposure[{sample_size}]': lambda: deposited_exposure(sample_size, short_range=False)(),
+        f'deposited_exposure[{sample_size},short_range]': lambda: deposited_exposure(sample_size, short_range=True)(),
+        f'total_probability_rule[{sample_size}]': lambda: total_probability_rule(sample_size)(),
+        f'build_model[{sample_size}]': lambda: build_model(sample_size)(),
+    }
+
+
+def time_benchmark(setup: Setup, repeat: int) -> typing.List[float]:
+    """Return the duration (in seconds) of each repetition of the given benchmark."""
+    durations = []
+    for _ in range(repeat):
+        benchmark = setup()
+        start = time.perf_counter()
+        benchmark()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run(sample_size: int, repeat: int, select: typing.Optional[str] = None) -> dict:
+    np.random.seed(0)
+    results = {}
+    for name, setup in benchmarks(sample_size).items():
+        if select and select not in name:
+            continue
+        durations = time_benchmark(setup, repeat)
+        results[name] = {
+            'min': min(durations),
+            'median': statistics.median(durations),
+            'durations': durations,
+        }
+        print(f"{name:<55} {min(durations):>10.4f}s", file=sys.stderr)
+    return {
+        'metadata': {
+            'date': datetime.datetime.now().astimezone().isoformat(),
+            'caimira': caimira.__version__,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'node': platform.node(),
+            'sample_size': sample_size,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> typing.List[str]:
+    """
+    Print the ratio of the (minimum) time of each benchmark to its baseline,
+    and return the names of the benchmarks slower by more than the threshold.
+
+    """
+    regressions = []
+    print(f"{'benchmark':<55} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            print(f"{name:<55} {'-':>10} {result['min']:>10.4f} {'new':>7}")
+            continue
+        baseline_time = baseline['results'][name]['min']
+        ratio = result['min'] / baseline_time
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<55} {baseline_time:>10.4f} {result['min']:>10.4f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks, and store their results as JSON")
+    run_parser.add_argument("--output", help="The JSON file of the results (default: standard output)")
+    run_parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--select", help="Only run the benchmarks whose name contains this string")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare the results of the benchmarks to a baseline")
+    compare_parser.add_argument("baseline", help="The JSON file of the baseline results")
+    compare_parser.add_argument("results", help="The JSON file of the results to compare")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="The relative slowdown flagged as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        output = json.dumps(run(args.sample_size, args.repeat, args.select), indent=2)
+        if args.output:
+            with open(args.output, 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            print(output)
+    else:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        with open(args.results) as fh:
+            results = json.load(fh)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
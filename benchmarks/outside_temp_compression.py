@@ -0,0 +1,61 @@
+"""
+Benchmark of the compression of outside temperature profiles (see
+``caimira.models.WindowOpening.compress_outside_temp``): the number of
+concentration segments of a natural ventilation model, against the relative
+error of its (mean) infection probability and the time to compute it.
+
+Usage::
+
+    python benchmarks/outside_temp_compression.py [--sample-size 2000]
+
+"""
+import argparse
+import dataclasses
+import time
+
+import numpy as np
+
+from caimira.apps.calculator import model_generator
+
+TOLERANCES = (0., 0.001, 0.005, 0.01, 0.02, 0.05)
+MONTHS = ('January', 'April', 'July', 'October')
+
+
+def run(month: str, rtol: float, sample_size: int):
+    form_data = model_generator.baseline_raw_form_data()
+    form_data['event_month'] = month
+    form = model_generator.FormData.from_dict(form_data)
+
+    model_generator.OUTSIDE_TEMP_RTOL = rtol
+    # The same samples for every tolerance.
+    np.random.seed(0)
+    model = form.build_model(sample_size=sample_size)
+    segments = len(model.concentration_model.state_change_times()) - 1
+
+    start = time.perf_counter()
+    probability = model.infection_probability().mean()
+    return segments, probability, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    default_rtol = model_generator.OUTSIDE_TEMP_RTOL
+    print(f"{'month':<10} {'rtol':>6} {'segments':>9} {'rel. error':>11} {'time (s)':>9}")
+    try:
+        for month in MONTHS:
+            exact = None
+            for rtol in TOLERANCES:
+                segments, probability, duration = run(month, rtol, args.sample_size)
+                if exact is None:
+                    exact = probability
+                error = abs(probability - exact) / exact
+                print(f"{month:<10} {rtol:>6} {segments:>9} {error:>11.2e} {duration:>9.3f}")
+    finally:
+        model_generator.OUTSIDE_TEMP_RTOL = default_rtol
+
+
+if __name__ == '__main__':
+    main()
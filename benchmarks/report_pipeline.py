@@ -0,0 +1,150 @@
+"""
+End-to-end benchmark of the report pipeline: a corpus of realistic forms is
+run through ``ReportGenerator.build_report``, and the wall time, CPU time and
+peak RSS (resident memory) of each of its stages (see
+``caimira.apps.calculator.metrics.stage_timer``) are reported, to show which
+stage dominates for which kind of form.
+
+The alternative scenarios are computed in a thread (rather than a worker
+process, as in the calculator app) such that their resources are accounted
+for in this process. The peak RSS of each stage is measured by resetting the
+"high water mark" of the process at its start, which is only supported on
+Linux (see ``caimira.apps.calculator.memory``).
+
+Usage::
+
+    python benchmarks/report_pipeline.py [--select natural] [--output results.json]
+
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import json
+import time
+import typing
+
+from caimira.apps.calculator import make_app, memory, metrics, model_generator
+
+#: The forms of the corpus, as the changes to the baseline form data.
+CORPUS: typing.Dict[str, typing.Dict[str, typing.Any]] = {
+    'natural_ventilation': {
+        'ventilation_type': 'natural_ventilation',
+        'window_opening_regime': 'windows_open_periodically',
+        'windows_frequency': '60', 'windows_duration': '10',
+        'event_month': 'July',
+    },
+    'mechanical_ventilation_hepa': {
+        'ventilation_type': 'mechanical_ventilation',
+        'mechanical_ventilation_type': 'mech_type_air_supply', 'air_supply': '500',
+        'hepa_option': '1', 'hepa_amount': '250',
+        'mask_wearing_option': 'mask_on', 'mask_type': 'FFP2',
+    },
+    'short_range': {
+        'short_range_option': 'short_range_yes',
+        'short_range_interactions': json.dumps([
+            {'expiration': 'Shouting', 'start_time': '10:30', 'duration': '30'},
+            {'expiration': 'Speaking', 'start_time': '14:00', 'duration': '15'},
+        ]),
+    },
+    'precise_activity': {
+        'activity_type': 'precise',
+        'precise_activity': json.dumps({
+            'physical_activity': 'Light activity',
+            'respiratory_activity': [{'type': 'Breathing', 'percentage': 70}, {'type': 'Speaking', 'percentage': 30}],
+        }),
+    },
+    'probabilistic_exposure': {
+        'short_range_option': 'short_range_yes',
+        'short_range_interactions': json.dumps([
+            {'expiration': 'Speaking', 'start_time': '11:00', 'duration': '20'},
+        ]),
+        'exposure_option': 'p_probabilistic_exposure',
+        'geographic_population': 100_000, 'geographic_cases': 500,
+    },
+    'conditional_probability_plot': {
+        'conditional_probability_plot': '1',
+    },
+    'viral_load_percentiles': {
+        'conditional_probability_viral_loads': '1',
+    },
+}
+
+
+@dataclasses.dataclass
+class StageUsage:
+    #: The stage, as named by ``metrics.stage_timer``.
+    stage: str
+    wall_time: float
+    cpu_time: float
+    #: The peak RSS of the process during the stage (in MiB), if known.
+    peak_rss: typing.Optional[float]
+
+
+class StageProfiler:
+    """A stage observer (see ``metrics.observe_stages``) measuring the resources of each stage."""
+    def __init__(self) -> None:
+        self.stages: typing.List[StageUsage] = []
+
+    @contextlib.contextmanager
+    def __call__(self, stage: str) -> typing.Iterator[None]:
+        memory.reset_peak_rss()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append(StageUsage(
+                stage=stage,
+                wall_time=time.perf_counter() - wall_start,
+                cpu_time=time.process_time() - cpu_start,
+                peak_rss=memory.peak_rss(),
+            ))
+
+
+def profile_report(generator, form: model_generator.FormData) -> typing.Tuple[float, typing.List[StageUsage]]:
+    """Build the report of the given form, returning its total wall time and the usage of its stages."""
+    profiler = StageProfiler()
+    executor_factory = functools.partial(concurrent.futures.ThreadPoolExecutor, 1)
+    start = time.perf_counter()
+    with metrics.observe_stages(profiler):
+        generator.build_report("", form, executor_factory)
+    return time.perf_counter() - start, profiler.stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--select", help="Only run the forms whose name contains this string")
+    parser.add_argument("--output", help="Also store the results in this JSON file")
+    args = parser.parse_args()
+
+    generator = make_app().settings['report_generator']
+    # Warm up the (process-wide) caches, e.g. of the weather data and templates.
+    generator.build_report(
+        "", model_generator.FormData.from_dict(model_generator.baseline_raw_form_data()),
+        functools.partial(concurrent.futures.ThreadPoolExecutor, 1),
+    )
+
+    results = {}
+    print(f"{'form':<30} {'stage':<35} {'wall (s)':>9} {'cpu (s)':>9} {'peak RSS (MiB)':>15}")
+    for name, changes in CORPUS.items():
+        if args.select and args.select not in name:
+            continue
+        form = model_generator.FormData.from_dict({**model_generator.baseline_raw_form_data(), **changes})
+        total, stages = profile_report(generator, form)
+        for usage in stages:
+            peak_rss = '-' if usage.peak_rss is None else f'{usage.peak_rss:.1f}'
+            print(f"{name:<30} {usage.stage:<35} {usage.wall_time:>9.3f} {usage.cpu_time:>9.3f} {peak_rss:>15}")
+        print(f"{name:<30} {'(total)':<35} {total:>9.3f}")
+        results[name] = {
+            'total_wall_time': total,
+            'stages': [dataclasses.asdict(usage) for usage in stages],
+        }
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,21 @@
-from .expert import ExpertApplication
-from .expert_co2 import CO2Application
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .expert import ExpertApplication
+    from .expert_co2 import CO2Application
 
 __all__ = ['ExpertApplication', 'CO2Application']
+
+# The expert applications (and their dependencies: IPython, ipywidgets and
+# matplotlib) are imported on first use, not by the calculator app.
+_LAZY_ATTRIBUTES = {
+    'ExpertApplication': '.expert',
+    'CO2Application': '.expert_co2',
+}
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
@@ -8,10 +8,9 @@ import concurrent.futures
 import datetime
 import base64
 import functools
+import hashlib
 import html
 import json
-import pandas as pd
-from io import StringIO
 import os
 from pathlib import Path
 import traceback
@@ -21,14 +20,23 @@ import zlib
 
 import jinja2
 import loky
-from tornado.web import Application, RequestHandler, StaticFileHandler
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.web import Application, HTTPError, RequestHandler, StaticFileHandler
+from tornado.iostream import StreamClosedError
 import tornado.log
 
 from . import markdown_tools
+from . import memory
+from . import metrics
 from . import model_generator
-from .report_generator import ReportGenerator, calculate_report_data
+from . import profiler
+from .report_generator import ReportGenerator, calculate_report_data, render_uncertainties_plot, PLOT_FORMATS
+from .arve import ArveClient
+from .cases_data import CasesDataIndex
 from .data_service import DataService
+from .job_queue import JobQueue, QueueFullError
+from .progress import ProgressChannel, Stage, call_with_progress
+from .scenario_pool import scenario_lane, scenario_pool_size
+from .worker_pool import worker_executor
 from .user import AuthenticatedUser, AnonymousUser
 
 # The calculator version is based on a combination of the model version and the
@@ -44,7 +52,10 @@ LOG = logging.getLogger(__name__)
     
 
 class BaseRequestHandler(RequestHandler):
-    
+    #: Whether the worker computations of the handler can be profiled on request
+    #: (see ``profiler``).
+    profiling_supported = False
+
     async def prepare(self):
         """Called at the beginning of a request before  `get`/`post`/etc."""
 
@@ -61,6 +72,78 @@ class BaseRequestHandler(RequestHandler):
         else:
             self.current_user = AnonymousUser()
 
+    def on_finish(self) -> None:
+        handler = type(self).__name__
+        metrics.HTTP_REQUESTS.labels(handler=handler, method=self.request.method, code=self.get_status()).inc()
+        metrics.HTTP_REQUEST_DURATION.labels(handler=handler).observe(self.request.request_time())
+
+    def profiling_authorized(self, request_id: str) -> bool:
+        """
+        Whether the request may profile (or fetch the profile of) the given
+        request id: in debug mode, or with a signed ``X-Caimira-Profile`` header.
+        """
+        if self.settings.get("debug", False):
+            return True
+        header = self.request.headers.get('X-Caimira-Profile', '')
+        return profiler.verify(self.settings['profiling_secret'], header) == request_id
+
+    def profile_request_id(self) -> typing.Optional[str]:
+        """The id under which the worker computations of the request are profiled, if any."""
+        if not self.profiling_supported:
+            return None
+        request_id = self.request.headers.get('X-Caimira-Profile', '').partition(':')[0]
+        if not profiler.REQUEST_ID_PATTERN.fullmatch(request_id):
+            # In debug mode, every request is profiled.
+            request_id = uuid.uuid4().hex
+        return request_id if self.profiling_authorized(request_id) else None
+
+    async def run_in_worker(self, fn: typing.Callable, *args, **kwargs) -> typing.Any:
+        """
+        Compute ``fn(*args, **kwargs)`` in a report worker process, and merge
+        the metrics (e.g. report stage timings) recorded by the worker.
+
+        The task is limited to the ``report_memory_limit`` setting, and fails
+        with a "503 Service Unavailable" error if it exceeds it. If profiling
+        was requested (see :meth:`profile_request_id`), the task is profiled
+        and its profile stored under the ``X-Caimira-Profile-Id`` response header.
+        """
+        executor = worker_executor(
+            self.settings['handler_worker_pool_size'],
+            template_searchpath=self.settings['template_searchpath'],
+            warm_up_model=self.settings['worker_warm_up_model'],
+        )
+        task: typing.List[typing.Any] = [
+            memory.guarded_call,
+            self.settings['report_memory_limit'], self.settings['report_memory_tracing'],
+            fn, *args,
+        ]
+        request_id = self.profile_request_id()
+        if request_id is not None:
+            task = [profiler.profiled_call, request_id, self.settings['profiling_interval'], *task]
+        with metrics.WORKER_TASKS_IN_FLIGHT.track_inprogress():
+            future = executor.submit(metrics.collect, *task, **kwargs)
+            try:
+                result, task_metrics = await asyncio.wrap_future(future)
+            except Exception as err:
+                metrics.merge_error(err)
+                if isinstance(err, memory.MemoryLimitExceeded):
+                    raise HTTPError(503, str(err)) from err
+                raise
+        metrics.merge(task_metrics)
+        if request_id is not None:
+            result, profile = result
+            self.settings['profile_store'].add(profile)
+            self.set_header('X-Caimira-Profile-Id', request_id)
+            LOG.info(f"Profiled request {request_id} ({profile.duration:.1f} s, {profile.sample_count} samples)")
+        return result
+
+    async def run_report_in_worker(self, fn: typing.Callable, *args, **kwargs) -> typing.Any:
+        """
+        As :meth:`run_in_worker`, for a function computing a report of the given
+        ``sample_size``, which is reduced if the report exceeds the memory limit.
+        """
+        return await self.run_in_worker(memory.call_with_sample_size_fallback, fn, *args, **kwargs)
+
     def write_error(self, status_code: int, **kwargs) -> None:
         template = self.settings["template_environment"].get_template(
             "error.html.j2")
@@ -97,6 +180,8 @@ class Missing404Handler(BaseRequestHandler):
 
 
 class ConcentrationModel(BaseRequestHandler):
+    profiling_supported = True
+
     async def post(self) -> None:
         requested_model_config = {
             name: self.get_argument(name) for name in self.request.arguments
@@ -118,7 +203,8 @@ class ConcentrationModel(BaseRequestHandler):
                 self.send_error(500, reason=error_message)
                 
         try:
-            form = model_generator.FormData.from_dict(requested_model_config)
+            with metrics.stage_timer('from_dict'):
+                form = model_generator.FormData.from_dict(requested_model_config)
         except Exception as err:
             if self.settings.get("debug", False):
                 import traceback
@@ -130,27 +216,123 @@ class ConcentrationModel(BaseRequestHandler):
 
         base_url = self.request.protocol + "://" + self.request.host
         report_generator: ReportGenerator = self.settings['report_generator']
-        executor = loky.get_reusable_executor(
-            max_workers=self.settings['handler_worker_pool_size'],
-            timeout=300,
-        )
         # Re-generate the report with the conditional probability of infection plot
         if self.get_cookie('conditional_plot'):
             form.conditional_probability_plot = True if self.get_cookie('conditional_plot') == '1' else False
             self.clear_cookie('conditional_plot') # Clears cookie after changing the form value.
         
-        report_task = executor.submit(
+        report: str = await self.run_report_in_worker(
             report_generator.build_report, base_url, form,
             executor_factory=functools.partial(
-                concurrent.futures.ThreadPoolExecutor,
+                scenario_lane,
                 self.settings['report_generation_parallelism'],
             ),
         )
-        report: str = await asyncio.wrap_future(report_task)
         self.finish(report)
 
 
+class ConcentrationModelEvents(BaseRequestHandler):
+    #: The maximum time (in seconds) to wait for the stages of a completed report
+    #: which are still on their way from the worker.
+    PROGRESS_TIMEOUT = 5.
+
+    async def get(self) -> None:
+        """
+        Expects the calculator form inputs as URL arguments (as for the permalink),
+        including the XSRF token of the form. Streams the report as server-sent
+        events: "headline" (probability of infection and expected new cases),
+        "concentrations", "alternative_scenarios" and finally "report" (the
+        rendered HTML), each one as soon as it is available, or "report_error".
+        """
+        # As the report is computed by a GET request, the XSRF token is not checked
+        # by default.
+        self.check_xsrf_cookie()
+        requested_model_config = {
+            name: self.get_argument(name) for name in self.request.arguments
+        }
+        try:
+            with metrics.stage_timer('from_dict'):
+                form = model_generator.FormData.from_dict(requested_model_config)
+        except Exception as err:
+            if self.settings.get("debug", False):
+                print(traceback.format_exc())
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            await self.finish(json.dumps(response_json))
+            return
+        if self.get_cookie('conditional_plot'):
+            form.conditional_probability_plot = self.get_cookie('conditional_plot') == '1'
+            self.clear_cookie('conditional_plot')
+
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+
+        base_url = self.request.protocol + "://" + self.request.host
+        report_generator: ReportGenerator = self.settings['report_generator']
+        progress_channel: ProgressChannel = self.settings['progress_channel']
+        await progress_channel.ensure_started()
+        with progress_channel.stream() as (progress_sender, stages):
+            report_task = asyncio.ensure_future(self.run_report_in_worker(
+                call_with_progress, progress_sender, report_generator.build_report, base_url, form,
+                executor_factory=functools.partial(
+                    scenario_lane,
+                    self.settings['report_generation_parallelism'],
+                ),
+            ))
+            try:
+                await self._send_events(report_task, stages)
+            except StreamClosedError:
+                # The client went away, there is nobody left to send the report to.
+                report_task.cancel()
+                return
+        await self.finish()
+
+    async def _send_events(self, report_task: "asyncio.Future", stages: "asyncio.Queue[Stage]") -> None:
+        # A report computed again (with fewer samples, see ``memory``) sends its
+        # stages again, but each stage is only sent to the client once.
+        sent_stages: typing.Set[str] = set()
+        received = 0
+        while True:
+            next_stage = asyncio.ensure_future(stages.get())
+            await asyncio.wait([next_stage, report_task], return_when=asyncio.FIRST_COMPLETED)
+            if not next_stage.done():
+                next_stage.cancel()
+                break
+            received += 1
+            await self._send_stage(*next_stage.result(), sent_stages)
+
+        try:
+            report, n_stages = report_task.result()
+        except Exception as err:
+            error_id = uuid.uuid4()
+            LOG.error(f"Report generation failed (ERROR UUID {error_id})", exc_info=err)
+            await self._send_event('report_error', json.dumps({'error_id': str(error_id)}))
+            return
+
+        # The stages sent before the report was returned may still be on their way.
+        while received < n_stages:
+            try:
+                stage, data = await asyncio.wait_for(stages.get(), self.PROGRESS_TIMEOUT)
+            except asyncio.TimeoutError:
+                LOG.warning(f"{n_stages - received} stages of the report were not received")
+                break
+            received += 1
+            await self._send_stage(stage, data, sent_stages)
+        await self._send_event('report', json.dumps({'html': report}))
+
+    async def _send_stage(self, stage: str, data: str, sent_stages: typing.Set[str]) -> None:
+        if stage not in sent_stages:
+            sent_stages.add(stage)
+            await self._send_event(stage, data)
+
+    async def _send_event(self, event: str, data: str) -> None:
+        self.write(f'event: {event}\ndata: {data}\n\n')
+        await self.flush()
+
+
 class ConcentrationModelJsonResponse(BaseRequestHandler):
+    profiling_supported = True
+
     def check_xsrf_cookie(self):
         """
         This request handler implements a stateless API that returns report data in JSON format.
@@ -169,7 +351,8 @@ class ConcentrationModelJsonResponse(BaseRequestHandler):
             pprint(requested_model_config)
 
         try:
-            form = model_generator.FormData.from_dict(requested_model_config)
+            with metrics.stage_timer('from_dict'):
+                form = model_generator.FormData.from_dict(requested_model_config)
         except Exception as err:
             if self.settings.get("debug", False):
                 import traceback
@@ -179,32 +362,259 @@ class ConcentrationModelJsonResponse(BaseRequestHandler):
             await self.finish(json.dumps(response_json))
             return
 
-        executor = loky.get_reusable_executor(
-            max_workers=self.settings['handler_worker_pool_size'],
-            timeout=300,
-        )
-        report_data_task = executor.submit(calculate_report_data, form, form.build_model())
-        report_data: dict = await asyncio.wrap_future(report_data_task)
+        report_data: dict = await self.run_report_in_worker(_report_json_data, form)
         await self.finish(report_data)
 
 
+def _report_json_data(form: model_generator.FormData, sample_size: int = model_generator.DEFAULT_MC_SAMPLE_SIZE) -> dict:
+    # Computed by the report worker processes, such that neither the model nor
+    # the report data is built on the event loop.
+    with metrics.stage_timer('build_model'):
+        model = form.build_model(sample_size=sample_size)
+    with metrics.stage_timer('calculate_report_data'):
+        report_data = calculate_report_data(form, model)
+    # Flag the reports computed with fewer samples to fit in the memory available.
+    report_data['sample_size'] = sample_size
+    report_data['reduced_sample_size'] = sample_size < model_generator.DEFAULT_MC_SAMPLE_SIZE
+    return report_data
+
+
+class ConcentrationModelJsonBatch(BaseRequestHandler):
+    def check_xsrf_cookie(self):
+        """
+        This request handler implements a stateless API (see ``ConcentrationModelJsonResponse``).
+        Thus, XSRF cookies are disabled by overriding base class implementation of this method with a pass statement.
+        """
+        pass
+
+    async def post(self) -> None:
+        """
+        Expects a list of algorithm inputs in HTTP POST request body in JSON format.
+        The forms are evaluated in parallel by the worker pool, and the report data of each
+        is streamed back as newline-delimited JSON (``{"index": ..., "report_data": ...}``,
+        or ``{"index": ..., "error": ...}``) in order of completion.
+        """
+        try:
+            requested_model_configs = json.loads(self.request.body)
+            if not isinstance(requested_model_configs, list):
+                raise ValueError('a list of forms is expected')
+        except Exception as err:
+            self.set_status(400)
+            await self.finish(json.dumps({'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}))
+            return
+
+        max_batch_size = self.settings['report_batch_max_size']
+        if len(requested_model_configs) > max_batch_size:
+            self.set_status(413)
+            await self.finish(json.dumps({
+                'code': 413, 'error': f'A batch is limited to {max_batch_size} forms',
+            }))
+            return
+
+        self.set_header('Content-Type', 'application/x-ndjson')
+
+        # At most ``report_batch_concurrency`` forms of the batch are given to the
+        # workers at any one time, such that the reports requested meanwhile do not
+        # queue behind the whole batch.
+        in_flight = asyncio.Semaphore(self.settings['report_batch_concurrency'])
+        # Identical forms (as commonly found when auditing similar rooms) are only
+        # computed once, and the result is sent for each of them.
+        indices_by_form: typing.Dict[str, typing.List[int]] = {}
+        tasks: typing.List["asyncio.Future[typing.Tuple[str, typing.Dict[str, typing.Any]]]"] = []
+        try:
+            for index, requested_model_config in enumerate(requested_model_configs):
+                try:
+                    with metrics.stage_timer('from_dict'):
+                        form = model_generator.FormData.from_dict(requested_model_config)
+                except Exception as err:
+                    await self._write_line({'index': index, 'error': f'Your request was invalid {html.escape(str(err))}'})
+                    continue
+                key = json.dumps(model_generator.FormData.to_dict(form), sort_keys=True)
+                if key not in indices_by_form:
+                    indices_by_form[key] = []
+                    tasks.append(asyncio.ensure_future(self._compute(key, form, in_flight)))
+                indices_by_form[key].append(index)
+
+            for task in asyncio.as_completed(tasks):
+                key, line = await task
+                for index in indices_by_form[key]:
+                    await self._write_line({'index': index, **line})
+        except StreamClosedError:
+            # The client went away: the forms which are not computed yet are dropped.
+            for task in tasks:
+                task.cancel()
+            return
+        await self.finish()
+
+    async def _compute(
+            self, key: str, form: model_generator.FormData, in_flight: asyncio.Semaphore,
+    ) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+        try:
+            async with in_flight:
+                return key, {'report_data': await self.run_report_in_worker(_report_json_data, form)}
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            error_id = uuid.uuid4()
+            LOG.error(f"Batch report failed (ERROR UUID {error_id})", exc_info=err)
+            return key, {'error': f'The report could not be generated (error {error_id})'}
+
+    async def _write_line(self, line: dict) -> None:
+        self.write(json.dumps(line) + '\n')
+        await self.flush()
+
+
+class ReportJobs(BaseRequestHandler):
+    def check_xsrf_cookie(self):
+        """
+        This request handler implements a stateless API (see ``ConcentrationModelJsonResponse``).
+        Thus, XSRF cookies are disabled by overriding base class implementation of this method with a pass statement.
+        """
+        pass
+
+    async def post(self) -> None:
+        """
+        Expects algorithm input in HTTP POST request body in JSON format.
+        Queues the computation of the report data and returns the identifier of the job
+        (HTTP 202), or HTTP 503 with a ``Retry-After`` header if the queue is full.
+        """
+        try:
+            with metrics.stage_timer('from_dict'):
+                form = model_generator.FormData.from_dict(json.loads(self.request.body))
+        except Exception as err:
+            if self.settings.get("debug", False):
+                print(traceback.format_exc())
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            await self.finish(json.dumps(response_json))
+            return
+
+        job_queue: JobQueue = self.settings['job_queue']
+        try:
+            job = job_queue.submit(
+                memory.guarded_call,
+                self.settings['report_memory_limit'], self.settings['report_memory_tracing'],
+                memory.call_with_sample_size_fallback, _report_json_data, form,
+            )
+        except QueueFullError as err:
+            self.set_status(503)
+            self.set_header('Retry-After', str(err.retry_after))
+            await self.finish({'code': 503, 'error': str(err)})
+            return
+
+        self.set_status(202)
+        self.set_header('Location', f'{self.request.path.rstrip("/")}/{job.job_id}')
+        await self.finish({'job_id': job.job_id, 'status': job.status})
+
+    def get(self) -> None:
+        """Returns the depth and wait-time statistics of the job queue."""
+        job_queue: JobQueue = self.settings['job_queue']
+        self.finish(job_queue.stats())
+
+
+class ReportJobResult(BaseRequestHandler):
+    #: The maximum time (in seconds) that a client may wait for a job to complete.
+    MAX_WAIT = 60.
+
+    async def get(self, job_id: str) -> None:
+        """
+        Returns the status of the job, and its result once completed. The optional
+        ``wait`` argument (in seconds) holds the response until the job is completed.
+        """
+        job_queue: JobQueue = self.settings['job_queue']
+        job = job_queue.get(job_id)
+        if job is None:
+            self.set_status(404)
+            await self.finish({'code': 404, 'error': f'Unknown job {html.escape(job_id)}'})
+            return
+
+        try:
+            wait = float(self.get_argument('wait', '0'))
+        except ValueError:
+            wait = 0.
+        await job.wait(min(max(wait, 0.), self.MAX_WAIT))
+
+        response: typing.Dict[str, typing.Any] = {'job_id': job.job_id, 'status': job.status}
+        if job.status == 'done':
+            response['report_data'] = job.future.result()
+        elif job.status == 'failed' and isinstance(job.future.exception(), memory.MemoryLimitExceeded):
+            response['error'] = str(job.future.exception())
+        elif job.status == 'failed':
+            error_id = uuid.uuid4()
+            LOG.error(f"Report job {job.job_id} failed (ERROR UUID {error_id})", exc_info=job.future.exception())
+            response['error'] = f'The report could not be generated (error {error_id})'
+        await self.finish(response)
+
+
+class ReportPlot(BaseRequestHandler):
+    async def get(self, plot_id: str, image_format: str) -> None:
+        """
+        Returns the uncertainties plot of a report, rendered on demand. As the plot
+        identifier is its (encoded) data, the response can be cached forever.
+        """
+        etag = f'"{hashlib.sha256(plot_id.encode()).hexdigest()}.{image_format}"'
+        if self.request.headers.get('If-None-Match') == etag:
+            self.set_status(304)
+            await self.finish()
+            return
+
+        try:
+            image: bytes = await self.run_in_worker(render_uncertainties_plot, plot_id, image_format)
+        except (ValueError, OverflowError) as err:
+            self.set_status(400)
+            await self.finish({'code': 400, 'error': str(err)})
+            return
+
+        self.set_header('Content-Type', PLOT_FORMATS[image_format])
+        self.set_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.set_header('Etag', etag)
+        await self.finish(image)
+
+
+class ReportProfile(BaseRequestHandler):
+    def get(self, request_id: str, collapsed: typing.Optional[str]) -> None:
+        """
+        Returns the profile of a request (see ``profiler``): the top functions
+        in JSON, or the collapsed stacks (for flame graph tools) as plain text.
+        Unauthorized requests get the same response as unknown profiles.
+        """
+        profile_store: profiler.ProfileStore = self.settings['profile_store']
+        profile = profile_store.get(request_id) if self.profiling_authorized(request_id) else None
+        if profile is None:
+            self.set_status(404)
+            self.finish({'code': 404, 'error': 'Unknown (or expired) profile'})
+        elif collapsed:
+            self.set_header('Content-Type', 'text/plain; charset=UTF-8')
+            self.finish(profile.collapsed())
+        else:
+            self.finish(profile.summary())
+
+
 class StaticModel(BaseRequestHandler):
     async def get(self) -> None:
-        form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
+        with metrics.stage_timer('from_dict'):
+            form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
         base_url = self.request.protocol + "://" + self.request.host
         report_generator: ReportGenerator = self.settings['report_generator']
-        executor = loky.get_reusable_executor(max_workers=self.settings['handler_worker_pool_size'])
-        report_task = executor.submit(
+        report: str = await self.run_report_in_worker(
             report_generator.build_report, base_url, form,
             executor_factory=functools.partial(
-                concurrent.futures.ThreadPoolExecutor,
+                scenario_lane,
                 self.settings['report_generation_parallelism'],
             ),
         )
-        report: str = await asyncio.wrap_future(report_task)
         self.finish(report)
 
 
+class Metrics(BaseRequestHandler):
+    def get(self) -> None:
+        """Returns the operational metrics of the calculator, in the Prometheus text format."""
+        metrics.JOB_QUEUE_DEPTH.set(self.settings['job_queue'].depth)
+        metrics.WORKER_POOL_SIZE.set(self.settings['handler_worker_pool_size'] or 0)
+        self.set_header('Content-Type', metrics.CONTENT_TYPE)
+        self.finish(metrics.exposition())
+
+
 class LandingPage(BaseRequestHandler):
     def get(self):
         template_environment = self.settings["template_environment"]
@@ -250,90 +660,32 @@ class CompressedCalculatorFormInputs(BaseRequestHandler):
 
 class ArveData(BaseRequestHandler):
     async def get(self, hotel_id, floor_id):
-        client_id = self.settings["arve_client_id"]
-        client_secret = self.settings['arve_client_secret']
-        arve_api_key = self.settings['arve_api_key']
-
-        if (client_id == None or client_secret == None or arve_api_key == None):
+        arve_client: typing.Optional[ArveClient] = self.settings['arve_client']
+        if arve_client is None:
             # If the credentials are not defined, we skip the ARVE API connection
             return self.send_error(401)
-            
-        http_client = AsyncHTTPClient()
 
-        URL = 'https://arveapi.auth.eu-central-1.amazoncognito.com/oauth2/token'
-        headers = { "Content-Type": "application/x-www-form-urlencoded",
-                    "Authorization": b"Basic " + base64.b64encode(f'{client_id}:{client_secret}'.encode())
-        }
-        
-        try:
-            response = await http_client.fetch(HTTPRequest(
-                url=URL,
-                method='POST',
-                headers=headers,
-                body="grant_type=client_credentials"
-            ),
-            raise_error=True)
-        except Exception as e:
-            print("Something went wrong: %s" % e)
-        
-        access_token = json.loads(response.body)['access_token']
-        
-        URL = f'https://api.arve.swiss/v1/{hotel_id}/{floor_id}'
-        headers = {
-              "x-api-key": arve_api_key,
-              "Authorization": f'Bearer {access_token}'
-        }
         try:
-            response = await http_client.fetch(HTTPRequest(
-                url=URL,
-                method='GET',
-                headers=headers,
-            ),
-            raise_error=True)
-        except Exception as e:
-            print("Something went wrong: %s" % e)
-        
+            sensor_data = await arve_client.sensor_data(hotel_id, floor_id)
+        except Exception as err:
+            LOG.error(f"Something went wrong with the ARVE API: {err}")
+            return self.send_error(502)
+
         self.set_header("Content-Type", 'application/json')
-        return self.finish(response.body)
+        return self.finish(sensor_data)
+
 
-    
 class CasesData(BaseRequestHandler):
     async def get(self, country):
-        http_client = AsyncHTTPClient()
-        # First we need the country to fetch the data
-        URL = f'https://restcountries.com/v3.1/alpha/{country}?fields=name'
-        try:
-            response = await http_client.fetch(HTTPRequest(
-                url=URL,
-                method='GET',
-            ),
-            raise_error=True)
-        except Exception as e:
-            print("Something went wrong: %s" % e)
+        """
+        Returns the 7-day rolling average of the daily new cases of the given
+        country (ISO code or name), or an empty response if it is not available.
+        """
+        cases_data: CasesDataIndex = self.settings['cases_data']
+        await cases_data.ensure_started()
+        cases = cases_data.lookup(country)
+        return self.finish('' if cases is None else str(cases))
 
-        country_name = json.loads(response.body)['name']['common']
-        
-        # Get global incident rates
-        URL = 'https://covid19.who.int/WHO-COVID-19-global-data.csv'
-        try:
-            response = await http_client.fetch(HTTPRequest(
-                url=URL,
-                method='GET',
-            ),
-            raise_error=True)
-        except Exception as e:
-            print("Something went wrong: %s" % e)
-
-        df = pd.read_csv(StringIO(response.body.decode('utf-8')), index_col=False)
-        cases = df.loc[df['Country'] == country_name]
-        # 7-day rolling average
-        current_date = str(datetime.datetime.now()).split(' ')[0]
-        eight_days_ago = str(datetime.datetime.now() - datetime.timedelta(days=7)).split(' ')[0]
-        cases = cases.set_index(['Date_reported'])
-        # If any of the 'New_cases' is 0, it means the data is not updated.
-        if (cases.loc[eight_days_ago:current_date]['New_cases'] == 0).any(): return self.finish('')
-        return self.finish(str(round(cases.loc[eight_days_ago:current_date]['New_cases'].mean())))
-    
 
 class GenericExtraPage(BaseRequestHandler):
 
@@ -376,6 +728,10 @@ def make_app(
         (get_root_url(r'/?'), LandingPage),
         (get_root_calculator_url(r'/?'), CalculatorForm),
         (get_root_calculator_url(r'/report'), ConcentrationModel),
+        (get_root_calculator_url(r'/report/events'), ConcentrationModelEvents),
+        (get_root_calculator_url(r'/report/plots/([0-9A-Za-z_-]+)\.(png|svg)'), ReportPlot),
+        (get_root_calculator_url(r'/profiles/([0-9A-Za-z_-]+)(\.collapsed)?'), ReportProfile),
+        (get_root_url(r'/metrics'), Metrics),
         (get_root_url(r'/static/(.*)'), StaticFileHandler, {'path': static_dir}),
         (get_root_calculator_url(r'/static/(.*)'), StaticFileHandler, {'path': calculator_static_dir}),
     ] 
@@ -383,6 +739,9 @@ def make_app(
     urls: typing.List = base_urls + [
         (get_root_url(r'/_c/(.*)'), CompressedCalculatorFormInputs),
         (get_root_calculator_url(r'/report-json'), ConcentrationModelJsonResponse),
+        (get_root_calculator_url(r'/report-json/batch'), ConcentrationModelJsonBatch),
+        (get_root_calculator_url(r'/report-json/jobs'), ReportJobs),
+        (get_root_calculator_url(r'/report-json/jobs/([0-9a-f]+)'), ReportJobResult),
         (get_root_calculator_url(r'/baseline-model/result'), StaticModel),
         (get_root_calculator_url(r'/api/arve/v1/(.*)/(.*)'), ArveData),
         (get_root_calculator_url(r'/cases/(.*)'), CasesData),
@@ -430,6 +789,19 @@ def make_app(
     template_environment.globals['get_url']=get_root_url
     template_environment.globals['get_calculator_url']=get_root_calculator_url
     
+    arve_client = None
+    arve_credentials = [
+        os.environ.get('ARVE_CLIENT_ID', None),
+        os.environ.get('ARVE_CLIENT_SECRET', None),
+        os.environ.get('ARVE_API_KEY', None),
+    ]
+    if all(arve_credentials):
+        client_id, client_secret, api_key = typing.cast(typing.List[str], arve_credentials)
+        arve_client = ArveClient(
+            client_id, client_secret, api_key,
+            response_ttl=float(os.environ.get('ARVE_RESPONSE_TTL', 60)),
+        )
+
     data_service_credentials = {
         'data_service_client_email': os.environ.get('DATA_SERVICE_CLIENT_EMAIL', None),
         'data_service_client_password': os.environ.get('DATA_SERVICE_CLIENT_PASSWORD', None),
@@ -439,6 +811,11 @@ def make_app(
     if data_service_enabled:
         data_service = DataService(data_service_credentials)
 
+    handler_worker_pool_size = int(os.environ.get("HANDLER_WORKER_POOL_SIZE", 1)) or None
+    # Fresh report workers pre-load the data (and optionally compute a small
+    # baseline model) before accepting their first report.
+    worker_warm_up_model = os.environ.get('WORKER_WARM_UP_MODEL', 'False').lower() == 'true'
+
     if debug:
         tornado.log.enable_pretty_logging()
 
@@ -452,13 +829,24 @@ def make_app(
         # COOKIE_SECRET being undefined will result in no login information being
         # presented to the user.
         cookie_secret=os.environ.get('COOKIE_SECRET', '<undefined>'),
-        arve_client_id=os.environ.get('ARVE_CLIENT_ID', None),
-        arve_client_secret=os.environ.get('ARVE_CLIENT_SECRET', None),
-        arve_api_key=os.environ.get('ARVE_API_KEY', None),
+        # The ARVE sensor data is cached for ARVE_RESPONSE_TTL seconds.
+        arve_client=arve_client,
 
         # Data Service Integration
         data_service=data_service,
 
+        # The stages of the reports streamed as server-sent events are received
+        # from the worker processes on a local socket (see ``progress``).
+        progress_channel=ProgressChannel(),
+
+        # The number of new cases of each country (from the WHO data), refreshed
+        # in the background every CASES_DATA_REFRESH_INTERVAL seconds. Until data is
+        # first fetched, the requests retry at most every CASES_DATA_RETRY_INTERVAL seconds.
+        cases_data=CasesDataIndex(
+            refresh_interval=float(os.environ.get('CASES_DATA_REFRESH_INTERVAL', 6 * 3600)),
+            retry_interval=float(os.environ.get('CASES_DATA_RETRY_INTERVAL', 300)),
+        ),
+
         # Process parallelism controls. There is a balance between serving a single report
         # requests quickly or serving multiple requests concurrently.
         # The defaults are: handle one report at a time, and allow parallelism
@@ -466,11 +854,51 @@ def make_app(
         # processes being determined based on the number of CPUs. For some deployments,
         # such as on OpenShift this number does *not* reflect the real number of CPUs that
         # can be used, and it is recommended to specify these values explicitly (through
-        # the environment variables).
-        handler_worker_pool_size=(
-            int(os.environ.get("HANDLER_WORKER_POOL_SIZE", 1)) or None
+        # the environment variables). The alternative scenarios of the reports computed
+        # by a handler worker share a persistent pool of ``report_generation_parallelism``
+        # processes (see ``scenario_pool``): REPORT_PARALLELISM is the number of these
+        # processes for the whole application, divided between the handler workers.
+        handler_worker_pool_size=handler_worker_pool_size,
+        worker_warm_up_model=worker_warm_up_model,
+        template_searchpath=loader.searchpath,
+        report_generation_parallelism=scenario_pool_size(
+            int(os.environ.get('REPORT_PARALLELISM', 0)) or None,
+            handler_worker_pool_size,
         ),
-        report_generation_parallelism=(
-            int(os.environ.get('REPORT_PARALLELISM', 0)) or None
+        # The increase of resident memory (in MiB) during a report above which the
+        # report workers compute it again with fewer samples, or fail it (rather
+        # than being killed for running out of memory). It should be set below the
+        # memory available to each task, as it is only checked between the stages
+        # of a report.
+        # With REPORT_MEMORY_TRACING, the memory allocated by each stage is traced
+        # (at some cost to performance) and exposed in the metrics.
+        report_memory_limit=float(os.environ.get('REPORT_MEMORY_LIMIT', 0)) or None,
+        report_memory_tracing=os.environ.get('REPORT_MEMORY_TRACING', 'False').lower() == 'true',
+        # The worker computations of the report (and report-json) requests are
+        # profiled in debug mode, or when requested with a ``X-Caimira-Profile``
+        # header signed with PROFILING_SECRET (see ``profiler``). The last
+        # PROFILE_STORE_SIZE profiles are kept, and served under /profiles.
+        profiling_secret=os.environ.get('PROFILING_SECRET', None),
+        profiling_interval=float(os.environ.get('PROFILING_INTERVAL', profiler.DEFAULT_INTERVAL)),
+        profile_store=profiler.ProfileStore(int(os.environ.get('PROFILE_STORE_SIZE', 64))),
+        # The maximum number of forms accepted by a single batch report-json request,
+        # and the number of them which are given to the workers at any one time.
+        report_batch_max_size=int(os.environ.get('REPORT_BATCH_MAX_SIZE', 1000)),
+        report_batch_concurrency=(
+            int(os.environ.get('REPORT_BATCH_CONCURRENCY', 0)) or handler_worker_pool_size or loky.cpu_count()
+        ),
+
+        # The asynchronous report job API shares the worker processes of the report
+        # handlers. Jobs beyond the maximum queue depth are rejected (with a
+        # "Retry-After" hint) rather than piling up behind the workers.
+        job_queue=JobQueue(
+            executor_factory=functools.partial(
+                worker_executor,
+                handler_worker_pool_size,
+                template_searchpath=loader.searchpath,
+                warm_up_model=worker_warm_up_model,
+            ),
+            max_depth=int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 16)),
+            result_ttl=float(os.environ.get('JOB_RESULT_TTL', 600)),
         ),
     )
@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+import typing
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+
+LOG = logging.getLogger(__name__)
+
+#: The OAuth (client credentials) token endpoint of the ARVE API.
+ARVE_TOKEN_URL = 'https://arveapi.auth.eu-central-1.amazoncognito.com/oauth2/token'
+
+#: The root URL of the ARVE API.
+ARVE_API_URL = 'https://api.arve.swiss/v1'
+
+
+def _http_client() -> AsyncHTTPClient:
+    # The (shared) curl client keeps the connections to the API alive between
+    # requests, which the simple client does not. It is used when available.
+    try:
+        from tornado.curl_httpclient import CurlAsyncHTTPClient
+    except ImportError:
+        return AsyncHTTPClient()
+    return CurlAsyncHTTPClient()
+
+
+class ArveClient:
+    """
+    A client of the ARVE sensors API.
+
+    The access token is shared by all the requests, and refreshed shortly before
+    it expires. The sensor data of each (hotel, floor) is cached for
+    ``response_ttl`` seconds, and concurrent requests for the same data wait
+    for a single call to the API.
+
+    """
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: str,
+            api_key: str,
+            token_url: str = ARVE_TOKEN_URL,
+            api_url: str = ARVE_API_URL,
+            response_ttl: float = 60.,
+            token_refresh_margin: float = 60.,
+    ):
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._api_key = api_key
+        self.token_url = token_url
+        self.api_url = api_url.rstrip('/')
+        self.response_ttl = response_ttl
+        self.token_refresh_margin = token_refresh_margin
+
+        self._token: typing.Optional[str] = None
+        self._token_expiry = 0.
+        self._token_request: typing.Optional[asyncio.Task] = None
+        # The (expiry time, body) of the cached responses, by (hotel, floor).
+        self._responses: typing.Dict[typing.Tuple[str, str], typing.Tuple[float, bytes]] = {}
+        self._requests: typing.Dict[typing.Tuple[str, str], asyncio.Task] = {}
+
+    async def access_token(self) -> str:
+        """Return a valid access token, requesting a new one if it is about to expire."""
+        if self._token is not None and time.time() < self._token_expiry - self.token_refresh_margin:
+            return self._token
+        if self._token_request is None or self._token_request.done():
+            self._token_request = asyncio.ensure_future(self._request_token())
+        return await asyncio.shield(self._token_request)
+
+    async def _request_token(self) -> str:
+        credentials = base64.b64encode(f'{self._client_id}:{self._client_secret}'.encode()).decode()
+        response = await _http_client().fetch(HTTPRequest(
+            url=self.token_url,
+            method='POST',
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Authorization": f"Basic {credentials}",
+            },
+            body="grant_type=client_credentials",
+        ), raise_error=True)
+        token = json.loads(response.body)
+        self._token = token['access_token']
+        self._token_expiry = time.time() + float(token.get('expires_in', 3600))
+        return token['access_token']
+
+    async def sensor_data(self, hotel_id: str, floor_id: str) -> bytes:
+        """Return the (JSON) sensor data of the given hotel and floor."""
+        key = (hotel_id, floor_id)
+        cached = self._responses.get(key)
+        if cached is not None and time.time() < cached[0]:
+            return cached[1]
+        if key not in self._requests:
+            self._requests[key] = asyncio.ensure_future(self._request_sensor_data(key))
+        return await asyncio.shield(self._requests[key])
+
+    async def _request_sensor_data(self, key: typing.Tuple[str, str]) -> bytes:
+        try:
+            try:
+                body = await self._fetch_sensor_data(key, await self.access_token())
+            except HTTPClientError as err:
+                if err.code != 401:
+                    raise
+                # The token was revoked (or expired early): retry with a new one.
+                self._token = None
+                body = await self._fetch_sensor_data(key, await self.access_token())
+        finally:
+            del self._requests[key]
+
+        now = time.time()
+        self._responses = {
+            cached_key: cached for cached_key, cached in self._responses.items() if cached[0] > now
+        }
+        self._responses[key] = (now + self.response_ttl, body)
+        return body
+
+    async def _fetch_sensor_data(self, key: typing.Tuple[str, str], access_token: str) -> bytes:
+        hotel_id, floor_id = key
+        response = await _http_client().fetch(HTTPRequest(
+            url=f'{self.api_url}/{hotel_id}/{floor_id}',
+            method='GET',
+            headers={
+                "x-api-key": self._api_key,
+                "Authorization": f'Bearer {access_token}',
+            },
+        ), raise_error=True)
+        return response.body
@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+import io
+import json
+import logging
+import time
+import typing
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import PeriodicCallback
+
+LOG = logging.getLogger(__name__)
+
+#: The daily new cases of each country, published by the WHO.
+WHO_CASES_URL = 'https://covid19.who.int/WHO-COVID-19-global-data.csv'
+
+#: The ISO codes and names of the countries.
+COUNTRIES_URL = 'https://restcountries.com/v3.1/all?fields=cca2,cca3,name'
+
+Fetcher = typing.Callable[[str], typing.Awaitable[bytes]]
+
+
+async def _http_fetch(url: str) -> bytes:
+    response = await AsyncHTTPClient().fetch(HTTPRequest(url=url, method='GET'), raise_error=True)
+    return response.body
+
+
+def rolling_average_cases(
+        cases_csv: bytes,
+        today: datetime.date,
+        days: int = 7,
+) -> typing.Tuple[typing.Dict[str, typing.Optional[int]], typing.Dict[str, str]]:
+    """
+    Compute the average daily new cases of each country over the last ``days``
+    days (inclusive of ``today``) from the WHO data. The average is ``None`` if
+    any of the daily new cases is 0, which means that the data is not up to date.
+
+    Returns the averages by (ISO 3166-1 alpha-2) country code, and the country
+    code by (lower case) country name.
+
+    """
+    import pandas as pd
+
+    df = pd.read_csv(
+        io.BytesIO(cases_csv),
+        usecols=['Date_reported', 'Country_code', 'Country', 'New_cases'],
+        # Otherwise the code of Namibia ("NA") is read as a missing value.
+        keep_default_na=False,
+        na_values={'New_cases': ['']},
+    )
+    codes_by_name = {
+        str(name).lower(): str(code)
+        for name, code in df[['Country', 'Country_code']].drop_duplicates().itertuples(index=False)
+    }
+
+    start = str(today - datetime.timedelta(days=days))
+    recent = df[(df['Date_reported'] >= start) & (df['Date_reported'] <= str(today))]
+    averages: typing.Dict[str, typing.Optional[int]] = {}
+    for code, cases in recent.groupby('Country_code')['New_cases']:
+        mean = cases.mean()
+        averages[str(code)] = None if (cases == 0).any() or pd.isna(mean) else round(mean)
+    return averages, codes_by_name
+
+
+def country_codes(countries_json: bytes) -> typing.Dict[str, str]:
+    """Return the alpha-2 country code by (lower case) alpha-3 code and common name."""
+    codes: typing.Dict[str, str] = {}
+    for country in json.loads(countries_json):
+        codes[country['cca3'].lower()] = country['cca2']
+        codes[country['name']['common'].lower()] = country['cca2']
+    return codes
+
+
+class CasesDataIndex:
+    """
+    An in-memory index of the recent (rolling average) number of new cases
+    of each country, refreshed in the background.
+
+    A country is looked up by its ISO 3166-1 alpha-2 or alpha-3 code, or by
+    its name. If a refresh fails, the last successfully fetched data is kept.
+    If no data could be fetched yet, the countries are unknown until the next
+    periodic refresh, or until ``retry_interval`` has elapsed since the failure
+    for the lookups to try again.
+
+    """
+    def __init__(
+            self,
+            refresh_interval: float = 6 * 3600.,
+            retry_interval: float = 300.,
+            fetch: Fetcher = _http_fetch,
+            today: typing.Callable[[], datetime.date] = datetime.date.today,
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._fetch = fetch
+        self._today = today
+        self._averages: typing.Dict[str, typing.Optional[int]] = {}
+        self._codes: typing.Dict[str, str] = {}
+        self._refreshing: typing.Optional[asyncio.Task] = None
+        self._periodic_refresh: typing.Optional[PeriodicCallback] = None
+        #: The time at which the data was last refreshed successfully.
+        self.last_refresh: typing.Optional[float] = None
+        #: The time at which a refresh last failed.
+        self.last_failure: typing.Optional[float] = None
+
+    def lookup(self, country: str) -> typing.Optional[int]:
+        """Return the average daily new cases of the given country, if known."""
+        country = country.strip().lower()
+        code = self._codes.get(country, country.upper())
+        return self._averages.get(code)
+
+    async def ensure_started(self) -> None:
+        """
+        Start the periodic refresh (in the running event loop), and wait for
+        the first refresh to complete if no data has been fetched yet (unless
+        it failed less than ``retry_interval`` ago).
+        """
+        if self._periodic_refresh is None:
+            self._periodic_refresh = PeriodicCallback(self.refresh, self.refresh_interval * 1000)
+            self._periodic_refresh.start()
+        if self.last_refresh is None:
+            if self.last_failure is not None and time.time() - self.last_failure < self.retry_interval:
+                return
+            await self.refresh()
+
+    def stop(self) -> None:
+        if self._periodic_refresh is not None:
+            self._periodic_refresh.stop()
+            self._periodic_refresh = None
+
+    def refresh(self) -> "asyncio.Task[None]":
+        """Refresh the data, unless a refresh is already in progress."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        return self._refreshing
+
+    async def _refresh(self) -> None:
+        try:
+            cases_csv, countries_json = await asyncio.gather(
+                self._fetch(WHO_CASES_URL), self._fetch(COUNTRIES_URL),
+            )
+            # Parsing the (large) CSV file would otherwise block the event loop.
+            averages, codes_by_name = await asyncio.get_running_loop().run_in_executor(
+                None, rolling_average_cases, cases_csv, self._today(),
+            )
+            codes = {**codes_by_name, **country_codes(countries_json)}
+        except Exception:
+            LOG.exception("Could not refresh the cases data, the previous data is kept")
+            self.last_failure = time.time()
+            return
+        self._averages, self._codes = averages, codes
+        self.last_refresh = time.time()
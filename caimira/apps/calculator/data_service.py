@@ -1,9 +1,14 @@
+import asyncio
+import base64
+import binascii
 import dataclasses
 import json
 import logging
+import time
 import typing
 
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import PeriodicCallback
 
 LOG = logging.getLogger(__name__)
 
@@ -25,10 +30,33 @@ class DataService():
     # Cached access token
     _access_token: typing.Optional[str] = None
 
+    # The time (in seconds) for which the fetched data is fresh. Stale data
+    # is returned whilst it is fetched again in the background.
+    cache_ttl: float = 300.
+
+    # The time (in seconds) beyond which stale data is no longer returned.
+    max_staleness: float = 24 * 3600.
+
+    # Access tokens expiring within this time (in seconds) are renewed.
+    token_expiry_margin: float = 30.
+
+    # The cached data, and the time at which it was fetched
+    _data: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+    _data_time: typing.Optional[float] = dataclasses.field(default=None, init=False, repr=False)
+    _refreshing: typing.Optional[asyncio.Task] = dataclasses.field(default=None, init=False, repr=False)
+    _periodic_refresh: typing.Optional[PeriodicCallback] = dataclasses.field(default=None, init=False, repr=False)
+
     def _is_valid(self, access_token):
-        # decode access_token
-        # check validity
-        return False
+        # The token is a JWT: its (unverified) payload gives its expiry time.
+        if not access_token:
+            return False
+        try:
+            payload = access_token.split('.')[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            expiry = float(claims['exp'])
+        except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+            return False
+        return time.time() < expiry - self.token_expiry_margin
 
     async def _login(self):
         if self._is_valid(self._access_token):
@@ -58,6 +86,45 @@ class DataService():
         return self._access_token
 
     async def fetch(self):
+        """
+        Return the data of the service. Cached data is returned as long as it is
+        fresh, or stale (up to ``max_staleness``) whilst it is being refreshed.
+        The data is also refreshed periodically, in the background.
+        """
+        if self._periodic_refresh is None and self.cache_ttl > 0:
+            self._periodic_refresh = PeriodicCallback(self._background_refresh, self.cache_ttl * 1000)
+            self._periodic_refresh.start()
+
+        age = None if self._data_time is None else time.time() - self._data_time
+        if age is not None and age < self.cache_ttl:
+            return self._data
+        refresh = self.refresh()
+        if age is not None and age < self.max_staleness:
+            # The refresh is not awaited, hence its failure is only logged.
+            refresh.add_done_callback(_log_refresh_failure)
+            return self._data
+        return await refresh
+
+    def refresh(self) -> "asyncio.Future":
+        """Fetch the data again, unless it is already being fetched."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._fetch())
+            # The result of a background refresh may never be awaited.
+            self._refreshing.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return asyncio.shield(self._refreshing)
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as err:
+            LOG.error(f"Could not refresh the data service data (the previous data is kept): {err}")
+
+    def stop(self):
+        if self._periodic_refresh is not None:
+            self._periodic_refresh.stop()
+            self._periodic_refresh = None
+
+    async def _fetch(self):
         access_token = await self._login()
 
         http_client = AsyncHTTPClient()
@@ -70,5 +137,13 @@ class DataService():
         ),
         raise_error=True)
 
-        return json.loads(response.body)
-    
\ No newline at end of file
+        self._data = json.loads(response.body)
+        self._data_time = time.time()
+        return self._data
+    
+
+
+def _log_refresh_failure(refresh: "asyncio.Future") -> None:
+    # Log (and hence retrieve) the error of a refresh whose result is not awaited.
+    if not refresh.cancelled() and refresh.exception() is not None:
+        LOG.error(f"Could not refresh the data service data (the previous data is kept): {refresh.exception()}")
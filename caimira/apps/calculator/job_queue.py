@@ -0,0 +1,188 @@
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import math
+import time
+import typing
+import uuid
+
+from . import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a :class:`JobQueue` which is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"The job queue is full, retry in {retry_after} seconds")
+        #: A suggested delay (in seconds) before the job is submitted again.
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: typing.Callable, *args) -> typing.Tuple[float, float, typing.Any]:
+    """
+    Call the given function (typically in a worker process), and return the
+    times at which the call started and finished alongside the result.
+
+    """
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+
+@dataclasses.dataclass
+class Job:
+    #: The unique identifier of the job, used by the client to fetch the result.
+    job_id: str
+
+    #: The time (seconds since the epoch) at which the job was accepted.
+    submitted: float
+
+    #: The future which resolves to the result of the job.
+    future: "asyncio.Future[typing.Any]"
+
+    #: The time at which a worker started computing the job.
+    started: typing.Optional[float] = None
+
+    #: The time at which a worker finished computing the job.
+    finished: typing.Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if not self.future.done():
+            return 'pending'
+        elif self.future.cancelled() or self.future.exception() is not None:
+            return 'failed'
+        return 'done'
+
+    async def wait(self, timeout: float) -> None:
+        """Wait (at most ``timeout`` seconds) for the job to be completed."""
+        if timeout <= 0 or self.future.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except Exception:
+            # Either the job is still pending, or it failed. In both cases the
+            # status of the job tells the full story.
+            pass
+
+
+class JobQueue:
+    """
+    A bounded queue of jobs which are computed asynchronously by an executor.
+
+    Jobs are accepted until ``max_depth`` of them are pending, beyond which
+    a :class:`QueueFullError` is raised so that the client can be told to
+    back-off. Completed jobs are kept for ``result_ttl`` seconds so that the
+    client has a chance to collect the result.
+
+    As for the report handlers, the metrics recorded by each job (see
+    :func:`metrics.collect`) are merged into the metrics of this process once
+    the job is completed.
+
+    """
+    def __init__(
+            self,
+            executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            max_depth: int = 16,
+            result_ttl: float = 600.,
+    ):
+        self._executor_factory = executor_factory
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self._jobs: typing.Dict[str, Job] = {}
+        # The (queue wait, run) times, in seconds, of the most recent jobs.
+        self._timings: typing.Deque[typing.Tuple[float, float]] = collections.deque(maxlen=100)
+        self.n_accepted = 0
+        self.n_rejected = 0
+
+    @property
+    def depth(self) -> int:
+        """The number of jobs which are waiting for, or being computed by, a worker."""
+        return sum(not job.future.done() for job in self._jobs.values())
+
+    def retry_after(self) -> int:
+        """A suggested delay (in seconds) before re-submitting a rejected job."""
+        run_times = [run_time for _, run_time in self._timings]
+        mean_run_time = sum(run_times) / len(run_times) if run_times else 1.
+        return min(max(1, math.ceil(mean_run_time)), 60)
+
+    def submit(self, fn: typing.Callable, *args) -> Job:
+        """
+        Submit ``fn(*args)`` to be computed by the executor, and return the
+        :class:`Job` which tracks it.
+
+        """
+        self._prune()
+        if self.depth >= self.max_depth:
+            self.n_rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        job = Job(job_id=uuid.uuid4().hex, submitted=time.time(), future=future)
+
+        executor = self._executor_factory()
+        concurrent_future = executor.submit(_timed_call, metrics.collect, fn, *args)
+
+        def job_done(done_future: concurrent.futures.Future):
+            if done_future.cancelled():
+                # result() would raise a CancelledError (a BaseException, which
+                # would leave the job pending forever), hence the job fails.
+                job.finished = time.time()
+                future.set_exception(RuntimeError("The job was cancelled before it was computed"))
+                future.exception()
+                return
+            try:
+                started, finished, (result, job_metrics) = done_future.result()
+            except Exception as err:
+                metrics.merge_error(err)
+                job.finished = time.time()
+                future.set_exception(err)
+            else:
+                metrics.merge(job_metrics)
+                job.started, job.finished = started, finished
+                self._timings.append((started - job.submitted, finished - started))
+                future.set_result(result)
+            # Retrieve the exception to avoid "exception never retrieved" warnings
+            # for jobs whose result is never collected.
+            future.exception()
+
+        def on_done(done_future: concurrent.futures.Future):
+            future.get_loop().call_soon_threadsafe(job_done, done_future)
+
+        concurrent_future.add_done_callback(on_done)
+        self._jobs[job.job_id] = job
+        self.n_accepted += 1
+        return job
+
+    def get(self, job_id: str) -> typing.Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        # Forget about the jobs whose result has been available for too long.
+        expiry = time.time() - self.result_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.future.done() and job.finished < expiry:
+                del self._jobs[job_id]
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the queue depth and wait-time statistics of the queue."""
+        wait_times = sorted(wait_time for wait_time, _ in self._timings)
+        run_times = [run_time for _, run_time in self._timings]
+
+        def percentile(values, fraction):
+            if not values:
+                return None
+            return values[min(len(values) - 1, int(fraction * len(values)))]
+
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'accepted': self.n_accepted,
+            'rejected': self.n_rejected,
+            'wait_time_p50': percentile(wait_times, 0.5),
+            'wait_time_p95': percentile(wait_times, 0.95),
+            'wait_time_max': wait_times[-1] if wait_times else None,
+            'run_time_mean': sum(run_times) / len(run_times) if run_times else None,
+        }
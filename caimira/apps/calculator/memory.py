@@ -0,0 +1,174 @@
+"""
+Memory accounting and limits of the tasks computed by the report workers.
+
+Each task records the peak resident memory (RSS) of its worker and,
+optionally, the peak memory allocated by each of its stages (as traced by
+:mod:`tracemalloc`). The increase of the resident memory since the start of
+the task is checked against a ceiling at the start and end of each stage (see
+:func:`metrics.stage_timer`), such that the memory held by the worker between
+tasks (e.g. its caches) does not count towards the limit. A report which
+exceeds it is computed again with fewer Monte Carlo samples, and fails with
+:class:`MemoryLimitExceeded` if it still does not fit (rather than the worker
+being killed for running out of memory).
+
+The processes to which a task hands its alternative scenarios (see
+:mod:`scenario_pool`) are held to the same limit, and their peak resident
+memory is recorded with the metrics of the task.
+
+The resident memory is only known on Linux; elsewhere the tasks are neither
+accounted for nor limited.
+
+"""
+import contextlib
+import dataclasses
+import gc
+import logging
+import threading
+import tracemalloc
+import typing
+
+from . import metrics
+from .defaults import DEFAULT_MC_SAMPLE_SIZE
+
+LOG = logging.getLogger(__name__)
+
+#: The smallest sample size to which a report is degraded to fit in the
+#: memory limit.
+MIN_DEGRADED_SAMPLE_SIZE = DEFAULT_MC_SAMPLE_SIZE // 16
+
+_MiB = 1024 * 1024
+
+# The memory guard of the task computed by each thread, see :func:`current_guard`.
+_local = threading.local()
+
+
+class MemoryLimitExceeded(MemoryError):
+    pass
+
+
+def _proc_status(field: str) -> typing.Optional[float]:
+    # The given memory field (in MiB) of /proc/self/status, if available.
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss() -> typing.Optional[float]:
+    """The resident memory (in MiB) of this process, if known."""
+    return _proc_status('VmRSS')
+
+
+def peak_rss() -> typing.Optional[float]:
+    """The peak resident memory (in MiB) of this process since it was last reset, if known."""
+    return _proc_status('VmHWM')
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak resident memory of this process, returning whether this is supported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+
+@dataclasses.dataclass
+class MemoryGuard:
+    """
+    A stage observer (see :func:`metrics.observe_stages`) which checks the
+    increase of the resident memory of the process since the ``baseline`` (in
+    MiB, typically its resident memory at the start of the task) against the
+    limit (in MiB), and records the peak memory allocated by each stage if
+    ``trace`` is set.
+
+    """
+    limit: typing.Optional[float] = None
+    trace: bool = False
+    baseline: float = 0.
+
+    def check(self, stage: str) -> None:
+        if not self.limit:
+            return
+        rss = current_rss()
+        if rss is not None and rss - self.baseline > self.limit:
+            raise MemoryLimitExceeded(
+                f"The report needs more memory than the {self.limit:.0f} MiB available "
+                f"(at the {stage} stage, {rss - self.baseline:.0f} MiB were in use)"
+            )
+
+    @contextlib.contextmanager
+    def __call__(self, stage: str) -> typing.Iterator[None]:
+        self.check(stage)
+        if self.trace:
+            tracemalloc.reset_peak()
+        yield
+        if self.trace:
+            _, peak = tracemalloc.get_traced_memory()
+            metrics.record_stage_memory(stage, peak / _MiB)
+        self.check(stage)
+
+
+def guarded_call(
+        limit: typing.Optional[float],
+        trace: bool,
+        fn: typing.Callable,
+        *args,
+        **kwargs,
+) -> typing.Any:
+    """
+    Call ``fn(*args, **kwargs)`` (in a worker process) within the given memory
+    limit (in MiB over the resident memory of the process before the call, or
+    None for no limit), recording the peak resident memory of the process, and
+    the memory allocated by each stage if ``trace`` is set.
+
+    """
+    reset_peak_rss()
+    guard = MemoryGuard(limit, trace, current_rss() or 0.)
+    previous, _local.guard = current_guard(), guard
+    start_tracing = trace and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    try:
+        with metrics.observe_stages(guard):
+            return fn(*args, **kwargs)
+    finally:
+        _local.guard = previous
+        if start_tracing:
+            tracemalloc.stop()
+        peak = peak_rss()
+        if peak is not None:
+            metrics.record_peak_rss(peak)
+
+
+def current_guard() -> typing.Optional[MemoryGuard]:
+    """The memory guard of the task computed by this thread (see :func:`guarded_call`), if any."""
+    return getattr(_local, 'guard', None)
+
+
+def call_with_sample_size_fallback(fn: typing.Callable, *args, **kwargs) -> typing.Any:
+    """
+    Call ``fn(*args, sample_size=..., **kwargs)``, starting with the default
+    sample size, which is halved each time the memory is exhausted, down to
+    ``MIN_DEGRADED_SAMPLE_SIZE``.
+
+    """
+    sample_size = DEFAULT_MC_SAMPLE_SIZE
+    while True:
+        try:
+            return fn(*args, sample_size=sample_size, **kwargs)
+        except MemoryError as err:
+            if sample_size // 2 < MIN_DEGRADED_SAMPLE_SIZE:
+                if isinstance(err, MemoryLimitExceeded):
+                    raise
+                raise MemoryLimitExceeded(f"The report needs more memory than is available ({err})") from err
+            LOG.warning(f"{err}: computing the report again with {sample_size // 2} samples")
+            sample_size //= 2
+            metrics.record_count('memory_degraded_reports', 1)
+            # Release the (cyclic references to the) models of the failed attempt.
+            gc.collect()
@@ -0,0 +1,326 @@
+"""
+Operational metrics of the calculator, exposed in the Prometheus text format.
+
+The metrics are held by the (main) process serving the requests. Work done
+by the worker processes is measured with :func:`stage_timer`,
+:func:`record_count` and :func:`record_cache_lookup`, collected by running
+the work through :func:`collect`, and merged with :func:`merge`.
+
+When the calculator is served by several processes, set the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable (see the multiprocess mode
+of ``prometheus_client``) for :func:`exposition` to aggregate their metrics.
+
+"""
+import contextlib
+import dataclasses
+import os
+import threading
+import time
+import typing
+
+import prometheus_client
+import prometheus_client.multiprocess
+
+#: The default buckets (in seconds) of the duration histograms.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60., 120.)
+
+#: The buckets (in MiB) of the memory histograms.
+MEMORY_BUCKETS = (16., 64., 128., 256., 512., 1024., 2048., 4096., 8192.)
+
+#: The registry of the metrics of the calculator (in the main process).
+REGISTRY = prometheus_client.CollectorRegistry()
+
+HTTP_REQUESTS = prometheus_client.Counter(
+    'caimira_http_requests_total', 'The number of HTTP requests handled.',
+    ['handler', 'method', 'code'], registry=REGISTRY,
+)
+HTTP_REQUEST_DURATION = prometheus_client.Histogram(
+    'caimira_http_request_duration_seconds', 'The time taken to handle HTTP requests.',
+    ['handler'], buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+REPORT_STAGE_DURATION = prometheus_client.Histogram(
+    'caimira_report_stage_duration_seconds', 'The time taken by each stage of the report generation.',
+    ['stage'], buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+WORKER_POOL_SIZE = prometheus_client.Gauge(
+    'caimira_worker_pool_size', 'The maximum number of report worker processes (0 if based on the CPUs).',
+    multiprocess_mode='max', registry=REGISTRY,
+)
+WORKER_TASKS_IN_FLIGHT = prometheus_client.Gauge(
+    'caimira_worker_tasks_in_flight', 'The number of tasks submitted to the report workers and not yet completed.',
+    multiprocess_mode='livesum', registry=REGISTRY,
+)
+WORKER_WARM_UP_DURATION = prometheus_client.Histogram(
+    'caimira_worker_warm_up_duration_seconds', 'The time taken to initialise the report worker processes.',
+    buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+WORKER_WARM_UP_ERRORS = prometheus_client.Counter(
+    'caimira_worker_warm_up_errors_total', 'The number of report worker warm-up steps which failed.',
+    ['step'], registry=REGISTRY,
+)
+WORKER_BUSY_SECONDS = prometheus_client.Counter(
+    'caimira_worker_busy_seconds_total', 'The time spent by the report workers computing tasks.',
+    registry=REGISTRY,
+)
+SCENARIO_TASK_WAIT = prometheus_client.Histogram(
+    'caimira_scenario_task_wait_seconds',
+    'The time that the alternative scenarios of the reports waited for a scenario process.',
+    buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+SCENARIO_TASK_DURATION = prometheus_client.Histogram(
+    'caimira_scenario_task_duration_seconds',
+    'The time taken by the scenario processes to compute the alternative scenarios of the reports.',
+    buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+JOB_QUEUE_DEPTH = prometheus_client.Gauge(
+    'caimira_job_queue_depth', 'The number of pending asynchronous report jobs.',
+    multiprocess_mode='livesum', registry=REGISTRY,
+)
+CACHE_LOOKUPS = prometheus_client.Counter(
+    'caimira_cache_lookups_total', 'The number of cache lookups, by cache and result (hit or miss).',
+    ['cache', 'result'], registry=REGISTRY,
+)
+MC_SAMPLES = prometheus_client.Counter(
+    'caimira_mc_samples_total', 'The number of Monte Carlo samples of the models which were computed.',
+    registry=REGISTRY,
+)
+WORKER_PEAK_RSS = prometheus_client.Histogram(
+    'caimira_worker_task_peak_rss_mib', 'The peak resident memory (in MiB) of the report workers during each task.',
+    buckets=MEMORY_BUCKETS, registry=REGISTRY,
+)
+REPORT_STAGE_MEMORY = prometheus_client.Histogram(
+    'caimira_report_stage_memory_mib',
+    'The peak memory (in MiB) allocated by each stage of the report generation, when traced.',
+    ['stage'], buckets=MEMORY_BUCKETS, registry=REGISTRY,
+)
+MEMORY_DEGRADED_REPORTS = prometheus_client.Counter(
+    'caimira_memory_degraded_reports_total',
+    'The number of reports computed again with fewer samples, having exceeded the memory limit.',
+    registry=REGISTRY,
+)
+
+#: The counters which can be incremented with ``record_count``.
+COUNTS = {
+    'mc_samples': MC_SAMPLES,
+    'memory_degraded_reports': MEMORY_DEGRADED_REPORTS,
+}
+
+#: The content type of the metrics returned by :func:`exposition`.
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+#: The attribute of the exceptions raised by :func:`collect` holding the metrics of the failed call.
+_ERROR_METRICS_ATTRIBUTE = 'caimira_task_metrics'
+
+
+def exposition() -> bytes:
+    """
+    Return the metrics in the Prometheus text format: those of this process,
+    or of all the processes in the multiprocess mode of ``prometheus_client``.
+
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        prometheus_client.multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry)
+    return prometheus_client.generate_latest(REGISTRY)
+
+
+@dataclasses.dataclass
+class WorkerMetrics:
+    """The metrics of a task computed by a worker process, to be merged in the main process."""
+    #: The duration of each of the stages of the task.
+    stages: typing.List[typing.Tuple[str, float]] = dataclasses.field(default_factory=list)
+
+    #: The counts (e.g. Monte Carlo samples) recorded by the task.
+    counts: typing.Dict[str, float] = dataclasses.field(default_factory=dict)
+
+    #: The (hit, miss) cache lookups of the task.
+    cache_lookups: typing.Dict[str, typing.List[int]] = dataclasses.field(default_factory=dict)
+
+    #: The time taken by the task.
+    duration: float = 0.
+
+    #: The time taken to warm up the worker, if this is the first task it computes.
+    warm_up_duration: typing.Optional[float] = None
+
+    #: The warm-up steps of the worker which failed, if this is the first task it computes.
+    warm_up_errors: typing.List[str] = dataclasses.field(default_factory=list)
+
+    #: The peak resident memory (in MiB) of the worker during the task, if known.
+    peak_rss: typing.Optional[float] = None
+
+    #: The peak memory (in MiB) allocated by each of the stages, if traced.
+    stage_memory: typing.List[typing.Tuple[str, float]] = dataclasses.field(default_factory=list)
+
+    #: The queue wait time and metrics of the scenario tasks computed (by
+    #: other worker processes) on behalf of the task.
+    scenario_tasks: typing.List[typing.Tuple[float, "WorkerMetrics"]] = dataclasses.field(default_factory=list)
+
+
+_local = threading.local()
+
+#: The warm-up time (and failed warm-up steps) of this (worker) process, until it is collected.
+_warm_up_duration: typing.Optional[float] = None
+_warm_up_errors: typing.List[str] = []
+
+
+def _current() -> typing.Optional[WorkerMetrics]:
+    return getattr(_local, 'metrics', None)
+
+
+#: The observers of the stages (of this process), see :func:`observe_stages`.
+_stage_observers: typing.List[typing.Callable[[str], typing.ContextManager]] = []
+
+
+@contextlib.contextmanager
+def observe_stages(observer: typing.Callable[[str], typing.ContextManager]) -> typing.Iterator[None]:
+    """
+    Within this context, enter the context manager returned by
+    ``observer(stage)`` around each stage timed with :func:`stage_timer` (e.g.
+    to measure the resources used by each stage of a report).
+
+    """
+    _stage_observers.append(observer)
+    try:
+        yield
+    finally:
+        _stage_observers.remove(observer)
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str) -> typing.Iterator[None]:
+    """Time the given stage of the report generation."""
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as observers:
+            for observer in list(_stage_observers):
+                observers.enter_context(observer(stage))
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        current = _current()
+        if current is not None:
+            current.stages.append((stage, duration))
+        else:
+            REPORT_STAGE_DURATION.labels(stage=stage).observe(duration)
+
+
+def record_count(name: str, amount: float) -> None:
+    """Increment the counter of the given name (one of ``COUNTS``)."""
+    current = _current()
+    if current is not None:
+        current.counts[name] = current.counts.get(name, 0.) + amount
+    else:
+        COUNTS[name].inc(amount)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    current = _current()
+    if current is not None:
+        lookups = current.cache_lookups.setdefault(cache, [0, 0])
+        lookups[0 if hit else 1] += 1
+    else:
+        CACHE_LOOKUPS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_peak_rss(peak_rss: float) -> None:
+    """Record the peak resident memory (in MiB) of this (worker) process during a task."""
+    current = _current()
+    if current is not None:
+        current.peak_rss = peak_rss
+    else:
+        WORKER_PEAK_RSS.observe(peak_rss)
+
+
+def record_stage_memory(stage: str, peak: float) -> None:
+    """Record the peak memory (in MiB) allocated by the given stage."""
+    current = _current()
+    if current is not None:
+        current.stage_memory.append((stage, peak))
+    else:
+        REPORT_STAGE_MEMORY.labels(stage=stage).observe(peak)
+
+
+def record_scenario_task(queue_wait: float, task_metrics: WorkerMetrics) -> None:
+    """
+    Record a scenario task computed by another worker process: the time it
+    waited for the process, and the metrics collected from it.
+
+    """
+    current = _current()
+    if current is not None:
+        current.scenario_tasks.append((queue_wait, task_metrics))
+    else:
+        _merge_scenario_task(queue_wait, task_metrics)
+
+
+def record_warm_up(duration: float, errors: typing.Sequence[str] = ()) -> None:
+    """Record the time taken to warm up this (worker) process, and the steps which failed."""
+    global _warm_up_duration, _warm_up_errors
+    _warm_up_duration = duration
+    _warm_up_errors = list(errors)
+
+
+def collect(fn: typing.Callable, *args, **kwargs) -> typing.Tuple[typing.Any, WorkerMetrics]:
+    """
+    Call the given function (typically in a worker process), and return its
+    result alongside the metrics recorded by the call.
+
+    If the call fails, the metrics are attached to the exception (which is
+    pickled with it), to be merged with :func:`merge_error`.
+
+    """
+    global _warm_up_duration, _warm_up_errors
+    metrics = WorkerMetrics(warm_up_duration=_warm_up_duration, warm_up_errors=_warm_up_errors)
+    _warm_up_duration, _warm_up_errors = None, []
+    previous, _local.metrics = _current(), metrics
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as err:
+        setattr(err, _ERROR_METRICS_ATTRIBUTE, metrics)
+        raise
+    finally:
+        metrics.duration = time.perf_counter() - start
+        _local.metrics = previous
+    return result, metrics
+
+
+def merge(metrics: WorkerMetrics) -> None:
+    """Merge the metrics of a task computed by a worker process."""
+    for stage, duration in metrics.stages:
+        REPORT_STAGE_DURATION.labels(stage=stage).observe(duration)
+    for name, amount in metrics.counts.items():
+        COUNTS[name].inc(amount)
+    for cache, (hits, misses) in metrics.cache_lookups.items():
+        CACHE_LOOKUPS.labels(cache=cache, result='hit').inc(hits)
+        CACHE_LOOKUPS.labels(cache=cache, result='miss').inc(misses)
+    WORKER_BUSY_SECONDS.inc(metrics.duration)
+    if metrics.warm_up_duration is not None:
+        WORKER_WARM_UP_DURATION.observe(metrics.warm_up_duration)
+    for step in metrics.warm_up_errors:
+        WORKER_WARM_UP_ERRORS.labels(step=step).inc()
+    if metrics.peak_rss is not None:
+        WORKER_PEAK_RSS.observe(metrics.peak_rss)
+    for stage, peak in metrics.stage_memory:
+        REPORT_STAGE_MEMORY.labels(stage=stage).observe(peak)
+    for queue_wait, task_metrics in metrics.scenario_tasks:
+        _merge_scenario_task(queue_wait, task_metrics)
+
+
+def error_metrics(error: BaseException) -> typing.Optional[WorkerMetrics]:
+    """The metrics of the failed call of :func:`collect` which raised the given exception, if any."""
+    return getattr(error, _ERROR_METRICS_ATTRIBUTE, None)
+
+
+def merge_error(error: BaseException) -> None:
+    """Merge the metrics of a task which failed with the given exception, if known."""
+    metrics = error_metrics(error)
+    if metrics is not None:
+        merge(metrics)
+
+
+def _merge_scenario_task(queue_wait: float, task_metrics: WorkerMetrics) -> None:
+    SCENARIO_TASK_WAIT.observe(queue_wait)
+    SCENARIO_TASK_DURATION.observe(task_metrics.duration)
+    merge(task_metrics)
@@ -1,11 +1,15 @@
 import dataclasses
 import datetime
+import functools
 import html
 import logging
+import os
 import typing
 import ast
+import contextlib
 import json 
 import re
+import threading
 
 import numpy as np
 
@@ -14,14 +18,163 @@ from caimira import data
 import caimira.data.weather
 import caimira.monte_carlo as mc
 from .. import calculator
-from caimira.monte_carlo.data import activity_distributions, virus_distributions, mask_distributions, short_range_distances
-from caimira.monte_carlo.data import expiration_distribution, expiration_BLO_factors, expiration_distributions, short_range_expiration_distributions
+from . import metrics
 from .defaults import (NO_DEFAULT, DEFAULT_MC_SAMPLE_SIZE, DEFAULTS, ACTIVITIES, ACTIVITY_TYPES, COFFEE_OPTIONS_INT, CONFIDENCE_LEVEL_OPTIONS, 
                        MECHANICAL_VENTILATION_TYPES, MASK_TYPES, MASK_WEARING_OPTIONS, MONTH_NAMES, VACCINE_BOOSTER_TYPE, VACCINE_TYPE, 
                        VENTILATION_TYPES, VIRUS_TYPES, VOLUME_TYPES, WINDOWS_OPENING_REGIMES, WINDOWS_TYPES)
 
 LOG = logging.getLogger(__name__)
 
+#: The relative change of the (window) air exchange within which consecutive
+#: outside temperature steps are merged, see ``WindowOpening.compress_outside_temp``.
+#: As this changes the results of the natural ventilation models (by up to about
+#: the tolerance), all the (6 minute) steps are kept unless a tolerance is given
+#: with the CAIMIRA_OUTSIDE_TEMP_RTOL environment variable (e.g. 0.01).
+OUTSIDE_TEMP_RTOL = float(os.environ.get('CAIMIRA_OUTSIDE_TEMP_RTOL', 0))
+
+#: The maximum number of outside temperature profiles kept in memory (by
+#: weather station, month and UTC offset, and once compressed).
+OUTSIDE_TEMP_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=OUTSIDE_TEMP_CACHE_SIZE)
+def outside_temp_profile(wx_station: str, month: int, utc_offset: float) -> models.PiecewiseConstant:
+    """
+    Return the mean outside temperature of the given weather station and month
+    as a PiecewiseConstant (in 6 minute steps), in the timezone of the given
+    UTC offset (in hours).
+
+    The profiles are shared by all the models of this process, which is safe
+    as they are immutable.
+
+    """
+    temp_profile = caimira.data.weather.mean_hourly_temperatures(wx_station=wx_station, month=month)
+
+    # Offset the source times according to the difference from UTC (as a
+    # result the first data value may no longer be a midnight, and the hours
+    # no longer ordered modulo 24).
+    source_times = np.arange(24) + utc_offset
+    times, temp_profile = caimira.data.weather.refine_hourly_data(
+        source_times,
+        temp_profile,
+        npts=24*10,  # 10 steps per hour => 6 min steps
+    )
+    return models.PiecewiseConstant(
+        tuple(float(t) for t in times), tuple(float(t) for t in temp_profile),
+    )
+
+
+@functools.lru_cache(maxsize=OUTSIDE_TEMP_CACHE_SIZE)
+def compressed_outside_temp(
+        outside_temp: models.PiecewiseConstant,
+        inside_temp: models.PiecewiseConstant,
+        rtol: float,
+) -> models.PiecewiseConstant:
+    """
+    Return the outside temperature profile compressed for windows opening
+    onto a room of the given inside temperature, see
+    ``WindowOpening.compress_outside_temp``. The compression does not depend
+    on the dimensions of the windows.
+
+    """
+    window = models.SlidingWindow(
+        active=models.PeriodicInterval(period=120, duration=120),
+        outside_temp=outside_temp, window_height=1., opening_length=1.,
+    )
+    room = models.Room(volume=1., inside_temp=inside_temp)
+    return window.compress_outside_temp(room, rtol).outside_temp
+
+
+#: The form fields which each of the shared components depends on, see
+#: ``shared_components``.
+_ROOM_FIELDS = (
+    'volume_type', 'room_volume', 'floor_area', 'ceiling_height',
+    'arve_sensors_option', 'room_heating_option', 'humidity', 'inside_temp',
+)
+_VENTILATION_FIELDS = _ROOM_FIELDS + (
+    'ventilation_type', 'window_opening_regime', 'windows_frequency', 'windows_duration',
+    'infected_start', 'exposed_start', 'window_type', 'window_height', 'window_width',
+    'opening_distance', 'windows_number', 'event_month', 'location_latitude',
+    'location_longitude', 'mechanical_ventilation_type', 'air_changes', 'air_supply',
+    'hepa_option', 'hepa_amount',
+)
+_PRESENCE_FIELDS = (
+    'specific_breaks', 'infected_start', 'infected_finish', 'infected_dont_have_breaks_with_exposed',
+    'infected_lunch_option', 'infected_lunch_start', 'infected_lunch_finish',
+    'infected_coffee_break_option', 'infected_coffee_duration', 'exposed_start', 'exposed_finish',
+    'exposed_lunch_option', 'exposed_lunch_start', 'exposed_lunch_finish',
+    'exposed_coffee_break_option', 'exposed_coffee_duration',
+)
+_POPULATION_FIELDS = _PRESENCE_FIELDS + (
+    'mask_wearing_option', 'mask_type', 'activity_type', 'precise_activity',
+    'total_people', 'infected_people',
+)
+_INFECTED_POPULATION_FIELDS = _POPULATION_FIELDS + ('virus_type',)
+_EXPOSED_POPULATION_FIELDS = _POPULATION_FIELDS + (
+    'vaccine_option', 'vaccine_booster_option', 'vaccine_type', 'vaccine_booster_type',
+)
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def shared_components() -> typing.Iterator[None]:
+    """
+    Share the components (room, ventilation, populations and presence
+    intervals) built by the forms within this context between the forms which
+    agree on the fields that each component depends on. For instance, the
+    alternative scenarios of a report differ from its form by a few fields,
+    and reuse the other components of the base model rather than building
+    them again.
+
+    The alternative scenarios are evaluated by other processes (see
+    ``scenario_pool``), to which they are sent in chunks (see
+    ``report_generator.comparison_report``): as pickling preserves the
+    identity of the objects, the scenarios of a chunk still share the
+    components (and the values cached on them) in the process.
+
+    """
+    if getattr(_local, 'components', None) is not None:
+        # Nested contexts share the components of the outermost one.
+        yield
+        return
+    _local.components = {}
+    try:
+        yield
+    finally:
+        _local.components = None
+
+
+def _hashable(value: typing.Any) -> typing.Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _shared_component(*field_names: str):
+    """
+    Share the component built by the decorated (argument-less) FormData method
+    within ``shared_components``, keyed on the given fields of the form.
+
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            components = getattr(_local, 'components', None)
+            if components is None:
+                return method(self)
+            key = (method.__name__, tuple(_hashable(getattr(self, name)) for name in field_names))
+            component = components.get(key)
+            metrics.record_cache_lookup('form_components', hit=component is not None)
+            if component is None:
+                component = components[key] = method(self)
+            return component
+        return wrapper
+    return decorator
+
+
 minutes_since_midnight = typing.NewType('minutes_since_midnight', int)
 
 
@@ -305,6 +458,7 @@ class FormData:
             if total_percentage != 100:
                 raise ValueError(f'The sum of all respiratory activities should be 100. Got {total_percentage}.')
 
+    @_shared_component(*_ROOM_FIELDS)
     def initialize_room(self) -> models.Room:
         # Initializes room with volume either given directly or as product of area and height
         if self.volume_type == 'room_volume_explicit':
@@ -325,6 +479,8 @@ class FormData:
         return models.Room(volume=volume, inside_temp=models.PiecewiseConstant((0, 24), (inside_temp,)), humidity=humidity)
 
     def build_mc_model(self) -> mc.ExposureModel:
+        from caimira.monte_carlo.data import short_range_distances, short_range_expiration_distributions
+
         room = self.initialize_room()        
 
         infected_population = self.infected_population()
@@ -357,23 +513,34 @@ class FormData:
         )
 
     def build_model(self, sample_size=DEFAULT_MC_SAMPLE_SIZE) -> models.ExposureModel:
+        metrics.record_count('mc_samples', sample_size)
         return self.build_mc_model().build_model(size=sample_size)
 
-    def build_CO2_model(self, sample_size=DEFAULT_MC_SAMPLE_SIZE) -> models.CO2ConcentrationModel:
-        infected_population: models.InfectedPopulation = self.infected_population().build_model(sample_size)
-        exposed_population: models.Population = self.exposed_population().build_model(sample_size)
+    def build_mc_CO2_model(self) -> mc.CO2ConcentrationModel:
+        from caimira.monte_carlo.data import activity_distributions
 
-        state_change_times = set(infected_population.presence_interval().transition_times())
-        state_change_times.update(exposed_population.presence_interval().transition_times())
+        # The number of people in the room (the CO2 emitters) does not depend
+        # on the sampled parameters of the populations.
+        populations = [
+            (population.number, population.presence)
+            for population in (self.infected_population(), self.exposed_population())
+        ]
+        state_change_times = set()
+        for _, presence in populations:
+            state_change_times.update(presence.transition_times())
         transition_times = sorted(state_change_times)
 
-        total_people = [infected_population.people_present(stop) + exposed_population.people_present(stop) 
-                        for _, stop in zip(transition_times[:-1], transition_times[1:])]
+        total_people = [sum(number * presence.triggered(stop) for number, presence in populations)
+                        for stop in transition_times[1:]]
         
+        activity_defn = ACTIVITIES[ACTIVITY_TYPES.index(self.activity_type)]['activity']
+        if self.activity_type == 'precise':
+            activity_defn, _ = self.generate_precise_activity_expiration()
+
         population = mc.SimplePopulation(
             number=models.IntPiecewiseConstant(transition_times=tuple(transition_times), values=tuple(total_people)),
             presence=None,
-            activity=activity_distributions[ACTIVITIES[ACTIVITY_TYPES.index(self.activity_type)]['activity']],
+            activity=activity_distributions[activity_defn],
         )
         
         # Builds a CO2 concentration model based on model inputs
@@ -381,7 +548,21 @@ class FormData:
             room=self.initialize_room(),
             ventilation=self.ventilation(),
             CO2_emitters=population,
-        ).build_model(size=sample_size)
+        )
+
+    def build_CO2_model(self, sample_size=DEFAULT_MC_SAMPLE_SIZE) -> models.CO2ConcentrationModel:
+        metrics.record_count('mc_samples', sample_size)
+        return self.build_mc_CO2_model().build_model(size=sample_size)
+
+    def build_expected_CO2_model(self) -> models.CO2ConcentrationModel:
+        """
+        Return the CO2 concentration model of the expected exhalation rate, whose
+        concentration is the mean of that of ``build_CO2_model`` (without the
+        sampling error), as the concentration is proportional to the exhalation
+        rate (the only sampled parameter).
+
+        """
+        return self.build_mc_CO2_model().build_expected_value_model()
 
     def tz_name_and_utc_offset(self) -> typing.Tuple[str, float]:
         """
@@ -390,17 +571,11 @@ class FormData:
 
         """
         month = MONTH_NAMES.index(self.event_month) + 1
-        timezone = caimira.data.weather.timezone_at(
+        # We choose the first of the month for the current year.
+        return caimira.data.weather.timezone_name_and_utc_offset(
             latitude=self.location_latitude, longitude=self.location_longitude,
+            year=datetime.datetime.now().year, month=month,
         )
-        # We choose the first of the month for the current year.
-        date = datetime.datetime(datetime.datetime.now().year, month, 1)
-        name = timezone.tzname(date)
-        assert isinstance(name, str)
-        utc_offset_td = timezone.utcoffset(date)
-        assert isinstance(utc_offset_td, datetime.timedelta)
-        utc_offset_hours = utc_offset_td.total_seconds() / 60 / 60
-        return name, utc_offset_hours
 
     def outside_temp(self) -> models.PiecewiseConstant:
         """
@@ -409,26 +584,11 @@ class FormData:
 
         """
         month = MONTH_NAMES.index(self.event_month) + 1
-
         wx_station = self.nearest_weather_station()
-        temp_profile = caimira.data.weather.mean_hourly_temperatures(wx_station = wx_station[0], month = MONTH_NAMES.index(self.event_month) + 1)
-
         _, utc_offset = self.tz_name_and_utc_offset()
+        return outside_temp_profile(wx_station[0], month, utc_offset)
 
-        # Offset the source times according to the difference from UTC (as a
-        # result the first data value may no longer be a midnight, and the hours
-        # no longer ordered modulo 24).
-        source_times = np.arange(24) + utc_offset
-        times, temp_profile = caimira.data.weather.refine_hourly_data(
-            source_times,
-            temp_profile,
-            npts=24*10,  # 10 steps per hour => 6 min steps
-        )
-        outside_temp = models.PiecewiseConstant(
-            tuple(float(t) for t in times), tuple(float(t) for t in temp_profile),
-        )
-        return outside_temp
-
+    @_shared_component(*_VENTILATION_FIELDS)
     def ventilation(self) -> models._VentilationBase:
         always_on = models.PeriodicInterval(period=120, duration=120)
         # Initializes a ventilation instance as a window if 'natural_ventilation' is selected, or as a HEPA-filter otherwise
@@ -439,6 +599,10 @@ class FormData:
                 window_interval = always_on
 
             outside_temp = self.outside_temp()
+            if OUTSIDE_TEMP_RTOL:
+                outside_temp = compressed_outside_temp(
+                    outside_temp, self.initialize_room().inside_temp, OUTSIDE_TEMP_RTOL,
+                )
 
             ventilation: models.Ventilation
             if self.window_type == 'window_sliding':
@@ -485,6 +649,8 @@ class FormData:
         )
 
     def mask(self) -> models.Mask:
+        from caimira.monte_carlo.data import mask_distributions
+
         # Initializes the mask type if mask wearing is "continuous", otherwise instantiates the mask attribute as
         # the "No mask"-mask
         if self.mask_wearing_option == 'mask_on':
@@ -502,7 +668,10 @@ class FormData:
             
         return (self.precise_activity['physical_activity'], respiratory_dict)
 
+    @_shared_component(*_INFECTED_POPULATION_FIELDS)
     def infected_population(self) -> mc.InfectedPopulation:
+        from caimira.monte_carlo.data import activity_distributions, virus_distributions
+
         # Initializes the virus
         virus = virus_distributions[self.virus_type]
 
@@ -532,7 +701,10 @@ class FormData:
         )
         return infected
 
+    @_shared_component(*_EXPOSED_POPULATION_FIELDS)
     def exposed_population(self) -> mc.Population:
+        from caimira.monte_carlo.data import activity_distributions
+
         scenario_activity = {
             'office': 'Seated',
             'controlroom-day': 'Seated',
@@ -757,6 +929,7 @@ class FormData:
             present_intervals.append((current_time / 60, finish / 60))
         return models.SpecificInterval(tuple(present_intervals))
 
+    @_shared_component(*_PRESENCE_FIELDS)
     def infected_present_interval(self) -> models.Interval:
         if self.specific_breaks != {}: # It means the breaks are specific and not predefined
             breaks = self.generate_specific_break_times(self.specific_breaks['infected_breaks'])
@@ -772,6 +945,7 @@ class FormData:
         duration = float(interaction['duration'])
         return models.SpecificInterval(present_times=((start_time/60, (start_time + duration)/60),))
 
+    @_shared_component(*_PRESENCE_FIELDS)
     def exposed_present_interval(self) -> models.Interval:
         if self.specific_breaks != {}: # It means the breaks are specific and not predefined
             breaks = self.generate_specific_break_times(self.specific_breaks['exposed_breaks'])
@@ -784,6 +958,8 @@ class FormData:
 
 
 def build_expiration(expiration_definition) -> mc._ExpirationBase:
+    from caimira.monte_carlo.data import expiration_distribution, expiration_BLO_factors, expiration_distributions
+
     if isinstance(expiration_definition, str):
         return expiration_distributions[expiration_definition]
     elif isinstance(expiration_definition, dict):
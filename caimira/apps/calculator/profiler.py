@@ -0,0 +1,200 @@
+"""
+Opt-in sampling profiler of the tasks computed by the report workers.
+
+While a task is computed, a background thread samples the call stack of the
+thread computing it at a fixed interval. The resulting :class:`Profile` is
+rendered as "collapsed stacks" (one ``frame;frame;frame count`` line per
+distinct stack, as read by flame graph tools such as ``flamegraph.pl`` or
+speedscope) and as a table of the functions with the most samples.
+
+Only the worker computing the task is sampled: the alternative scenarios of a
+report, computed by the scenario pool (see ``scenario_pool``), show up as the
+time spent waiting for them.
+
+Profiling is requested per request with a ``X-Caimira-Profile`` header of
+``<request id>:<signature>``, where the signature is the hex HMAC-SHA256 of
+the request id keyed by the ``PROFILING_SECRET`` of the app (or for every
+request in debug mode). The profile is then kept (in memory) under that
+request id.
+
+"""
+import collections
+import dataclasses
+import hashlib
+import hmac
+import re
+import sys
+import threading
+import time
+import types
+import typing
+from pathlib import Path
+
+#: The default interval (in seconds) between two samples of the call stack.
+DEFAULT_INTERVAL = 0.005
+
+#: The identifiers of the profiled requests, as chosen by the client.
+REQUEST_ID_PATTERN = re.compile(r'[0-9A-Za-z_-]{1,64}')
+
+
+def sign(secret: str, request_id: str) -> str:
+    """The signature of the given request id, which authorizes its profiling."""
+    return hmac.new(secret.encode(), request_id.encode(), hashlib.sha256).hexdigest()
+
+
+def verify(secret: typing.Optional[str], header: str) -> typing.Optional[str]:
+    """
+    Return the request id of the given (``<request id>:<signature>``) profiling
+    header, or None if it is malformed or not signed with the secret.
+
+    """
+    request_id, _, signature = header.partition(':')
+    if not secret or not REQUEST_ID_PATTERN.fullmatch(request_id):
+        return None
+    if not hmac.compare_digest(sign(secret, request_id), signature):
+        return None
+    return request_id
+
+
+def _frame_label(code: types.CodeType) -> str:
+    # The collapsed stacks are separated by ";", and their count by a space.
+    # (The qualified name of the code objects is only known from Python 3.11.)
+    name = getattr(code, 'co_qualname', code.co_name)
+    location = '/'.join(Path(code.co_filename).parts[-2:])
+    return f"{name} ({location}:{code.co_firstlineno})".replace(';', ':')
+
+
+@dataclasses.dataclass
+class Profile:
+    #: The identifier of the profiled request.
+    request_id: str
+
+    #: The time (in seconds) during which the task was profiled.
+    duration: float
+
+    #: The interval (in seconds) between two samples.
+    interval: float
+
+    #: The number of samples of each distinct call stack (from the outermost frame).
+    stacks: typing.Dict[typing.Tuple[str, ...], int]
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, the input format of flame graph tools."""
+        return ''.join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def top_functions(self, limit: int = 25) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        The functions with the most samples, with the fraction of the samples in
+        which they were running (``self``) or on the call stack (``total``).
+
+        """
+        sample_count = self.sample_count
+        if not sample_count:
+            return []
+        own: typing.Counter[str] = collections.Counter()
+        total: typing.Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        return [
+            {
+                'function': function,
+                'self': own[function] / sample_count,
+                'total': total[function] / sample_count,
+            }
+            for function in sorted(total, key=lambda function: (-own[function], -total[function]))[:limit]
+        ]
+
+    def summary(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'request_id': self.request_id,
+            'duration': self.duration,
+            'interval': self.interval,
+            'samples': self.sample_count,
+            'top_functions': self.top_functions(),
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of the given thread every ``interval`` seconds (from
+    a background thread) between :meth:`start` and :meth:`stop`.
+
+    """
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: typing.Counter[typing.Tuple[str, ...]] = collections.Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='caimira-profiler', daemon=True)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+
+def profiled_call(
+        request_id: str,
+        interval: float,
+        fn: typing.Callable,
+        *args,
+        **kwargs,
+) -> typing.Tuple[typing.Any, Profile]:
+    """
+    Call ``fn(*args, **kwargs)`` (in a worker process) under a sampling profiler,
+    and return its result alongside the profile.
+
+    """
+    profiler = SamplingProfiler(threading.get_ident(), interval)
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profiler.stop()
+    return result, Profile(
+        request_id=request_id,
+        duration=time.perf_counter() - start,
+        interval=interval,
+        stacks=dict(profiler.stacks),
+    )
+
+
+class ProfileStore:
+    """The most recent ``max_size`` profiles, by request id."""
+    def __init__(self, max_size: int = 64) -> None:
+        self.max_size = max_size
+        self._profiles: typing.OrderedDict[str, Profile] = collections.OrderedDict()
+
+    def add(self, profile: Profile) -> None:
+        self._profiles.pop(profile.request_id, None)
+        self._profiles[profile.request_id] = profile
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> typing.Optional[Profile]:
+        return self._profiles.get(request_id)
@@ -0,0 +1,132 @@
+"""
+The progress of the reports computed by the worker processes, streamed to
+the request handlers of the (main) process over a local socket.
+
+A request handler opens a stream of the :class:`ProgressChannel`, and passes
+its :class:`ProgressSender` to the worker as the progress callback of the
+report (see :func:`call_with_progress`). The stages are received on the event
+loop, without blocking it, and handed to the request handler through an
+:class:`asyncio.Queue`.
+
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import socket
+import typing
+import uuid
+
+LOG = logging.getLogger(__name__)
+
+#: The largest message (in bytes) which can be received, as the stages of a
+#: report include its Monte Carlo samples.
+MAX_MESSAGE_SIZE = 512 * 1024 * 1024
+
+#: A stage of a report: its name, and its data (in JSON).
+Stage = typing.Tuple[str, str]
+
+
+class ProgressSender:
+    """
+    A progress callback (see ``report_generator.ProgressCallback``) which sends
+    each stage to a stream of a :class:`ProgressChannel`. It is picklable, and
+    connects to the channel when it sends its first stage.
+
+    """
+    def __init__(self, address: typing.Tuple[str, int], token: str):
+        self.address = address
+        self.token = token
+        #: The number of stages sent so far.
+        self.sent = 0
+        self._socket: typing.Optional[socket.socket] = None
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        return {**self.__dict__, '_socket': None}
+
+    def __call__(self, stage: str, data: typing.Dict[str, typing.Any]) -> None:
+        if self._socket is None:
+            self._socket = socket.create_connection(self.address)
+            self._socket.sendall(f'{self.token}\n'.encode())
+        self._socket.sendall(f'{stage}\t{json.dumps(data)}\n'.encode())
+        self.sent += 1
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def call_with_progress(
+        sender: ProgressSender,
+        fn: typing.Callable,
+        *args,
+        **kwargs,
+) -> typing.Tuple[typing.Any, int]:
+    """
+    Call ``fn(*args, progress_callback=sender, **kwargs)`` (in a worker
+    process), and return its result alongside the number of stages sent, such
+    that the receiver knows when it has received all of them.
+
+    """
+    try:
+        return fn(*args, progress_callback=sender, **kwargs), sender.sent
+    finally:
+        sender.close()
+
+
+class ProgressChannel:
+    """
+    Receives the stages of the reports sent by the worker processes, on a
+    socket of the loopback interface. Each stream is identified by a random
+    token, and the stages sent to a closed (or unknown) stream are dropped.
+
+    """
+    def __init__(self) -> None:
+        self._server: typing.Optional[asyncio.Server] = None
+        self._streams: typing.Dict[str, "asyncio.Queue[Stage]"] = {}
+
+    async def ensure_started(self) -> None:
+        """Start listening (in the running event loop), if not done already."""
+        if self._server is None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host='127.0.0.1', port=0, limit=MAX_MESSAGE_SIZE,
+            )
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    @contextlib.contextmanager
+    def stream(self) -> typing.Iterator[typing.Tuple[ProgressSender, "asyncio.Queue[Stage]"]]:
+        """
+        Open a stream, returning the sender to pass to the worker and the queue
+        from which the stages are received. The stream is closed on exit.
+
+        """
+        if self._server is None:
+            raise RuntimeError("The progress channel is not started")
+        token = uuid.uuid4().hex
+        queue: "asyncio.Queue[Stage]" = asyncio.Queue()
+        self._streams[token] = queue
+        try:
+            yield ProgressSender(self._server.sockets[0].getsockname()[:2], token), queue
+        finally:
+            del self._streams[token]
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            token = (await reader.readline()).decode().strip()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                stage, _, data = line.decode().rstrip('\n').partition('\t')
+                queue = self._streams.get(token)
+                if queue is not None:
+                    queue.put_nowait((stage, data))
+        except (ConnectionError, ValueError):
+            LOG.warning("The progress of a report could not be received", exc_info=True)
+        finally:
+            writer.close()
@@ -2,18 +2,25 @@ import concurrent.futures
 import base64
 import dataclasses
 from datetime import datetime
+import hashlib
 import io
+import itertools
 import json
+import os
+from pathlib import Path
+import tempfile
+import time
 import typing
 import urllib
 import zlib
 
 import jinja2
 import numpy as np
-import matplotlib.pyplot as plt
 
 from caimira import models
 from caimira.apps.calculator import markdown_tools
+from caimira.apps.calculator import metrics
+from caimira.apps.calculator import model_generator
 from ... import monte_carlo as mc
 from .model_generator import FormData, DEFAULT_MC_SAMPLE_SIZE
 from ... import dataclass_utils
@@ -113,6 +120,19 @@ def concentrations_with_sr_breathing(form: FormData, model: models.ExposureModel
     return lower_concentrations
 
 
+#: A callable which is notified of the name and data of each stage of a report as soon as it is completed.
+ProgressCallback = typing.Callable[[str, typing.Dict[str, typing.Any]], None]
+
+
+def calculate_headline_data(model: models.ExposureModel) -> typing.Dict[str, typing.Any]:
+    prob = np.array(model.infection_probability())
+    return {
+        "prob_inf": prob.mean(),
+        "prob_inf_sd": prob.std(),
+        "expected_new_cases": np.array(model.expected_new_cases()).mean(),
+    }
+
+
 def calculate_report_data(form: FormData, model: models.ExposureModel) -> typing.Dict[str, typing.Any]:
     times = interesting_times(model)
     short_range_intervals = [interaction.presence.boundaries()[0] for interaction in model.short_range]
@@ -133,9 +153,10 @@ def calculate_report_data(form: FormData, model: models.ExposureModel) -> typing
         for time1, time2 in zip(times[:-1], times[1:])
     ])
 
-    CO2_model: models.CO2ConcentrationModel = form.build_CO2_model()
+    # The mean CO₂ concentration is computed exactly, without sampling.
+    CO2_model: models.CO2ConcentrationModel = form.build_expected_CO2_model()
     CO2_concentrations = {'CO₂': {'concentrations': [
-        np.array(CO2_model.concentration(float(time))).mean()
+        float(CO2_model.concentration(float(time)))
         for time in times
     ]}}
 
@@ -143,11 +164,14 @@ def calculate_report_data(form: FormData, model: models.ExposureModel) -> typing
     prob_dist_count, prob_dist_bins = np.histogram(prob/100, bins=100, density=True)
     prob_probabilistic_exposure = np.array(model.total_probability_rule()).mean()
     expected_new_cases = np.array(model.expected_new_cases()).mean()
-    uncertainties_plot_src = img2base64(_figure2bytes(uncertainties_plot(model, prob))) if form.conditional_probability_plot else None
     exposed_presence_intervals = [list(interval) for interval in model.exposed.presence_interval().boundaries()]
     conditional_probability_data = {key: value for key, value in 
                                     zip(('viral_loads', 'pi_means', 'lower_percentiles', 'upper_percentiles'), 
                                         manufacture_conditional_probability_data(model, prob))}
+    # The plot itself is rendered on demand, see ``render_uncertainties_plot``.
+    uncertainties_plot_id = encode_plot_data(
+        uncertainties_plot_data(model, prob, conditional_probability_data)
+    ) if form.conditional_probability_plot else None
 
     return {
         "model_repr": repr(model),
@@ -166,7 +190,7 @@ def calculate_report_data(form: FormData, model: models.ExposureModel) -> typing
         "prob_hist_bins": list(prob_dist_bins),
         "prob_probabilistic_exposure": prob_probabilistic_exposure,
         "expected_new_cases": expected_new_cases,
-        "uncertainties_plot_src": uncertainties_plot_src,
+        "uncertainties_plot_id": uncertainties_plot_id,
         "CO2_concentrations": CO2_concentrations,
         "vl_dist": list(np.log10(model.concentration_model.virus.viral_load_in_sputum)),
         "conditional_probability_data": conditional_probability_data,
@@ -219,11 +243,42 @@ def manufacture_conditional_probability_data(exposure_model: models.ExposureMode
     return list(viral_loads), list(pi_means), list(lower_percentiles), list(upper_percentiles)
 
 
-def uncertainties_plot(exposure_model: models.ExposureModel, prob: models._VectorisedFloat):
-    fig = plt.figure(figsize=(4, 7), dpi=110)
-    
-    infection_probability = prob / 100
-    viral_loads, pi_means, lower_percentiles, upper_percentiles = manufacture_conditional_probability_data(exposure_model, infection_probability)
+# The number of bins of the histograms of the uncertainties plot.
+_PROB_HIST_BINS = 30
+_VL_HIST_BINS = 150
+
+
+def uncertainties_plot_data(
+        exposure_model: models.ExposureModel,
+        prob: models._VectorisedFloat,
+        conditional_probability_data: typing.Dict[str, typing.List[float]],
+) -> typing.Dict[str, typing.Any]:
+    """
+    The (compact) data needed to draw the uncertainties plot, re-using the
+    conditional probability data of the report (expressed in percent).
+
+    """
+    infection_probability = np.array(prob) / 100
+    prob_hist_count, prob_hist_bins = np.histogram(infection_probability, bins=_PROB_HIST_BINS)
+    vl_hist_count, vl_hist_bins = np.histogram(
+        np.log10(exposure_model.concentration_model.infected.virus.viral_load_in_sputum),
+        bins=_VL_HIST_BINS, range=(2, 10),
+    )
+    return {
+        'viral_loads': [float(vl) for vl in conditional_probability_data['viral_loads']],
+        'pi_means': [pi / 100 for pi in conditional_probability_data['pi_means']],
+        'lower_percentiles': [pi / 100 for pi in conditional_probability_data['lower_percentiles']],
+        'upper_percentiles': [pi / 100 for pi in conditional_probability_data['upper_percentiles']],
+        'prob_mean': float(np.mean(infection_probability)),
+        'prob_hist_count': prob_hist_count.tolist(),
+        'prob_hist_bins': prob_hist_bins.tolist(),
+        'vl_hist_count': vl_hist_count.tolist(),
+        'vl_hist_bins': vl_hist_bins.tolist(),
+    }
+
+
+def uncertainties_plot(plot_data: typing.Dict[str, typing.Any]):
+    import matplotlib.pyplot as plt
 
     fig, axs = plt.subplots(2, 3, 
         gridspec_kw={'width_ratios': [5, 0.5] + [1],
@@ -236,10 +291,13 @@ def uncertainties_plot(exposure_model: models.ExposureModel, prob: models._Vecto
 
     axs[0, 1].set_visible(False)
 
-    axs[0, 0].plot(viral_loads, pi_means, label='Predictive total probability')
-    axs[0, 0].fill_between(viral_loads, lower_percentiles, upper_percentiles, alpha=0.1, label='5ᵗʰ and 95ᵗʰ percentile')
+    viral_loads = plot_data['viral_loads']
+    axs[0, 0].plot(viral_loads, plot_data['pi_means'], label='Predictive total probability')
+    axs[0, 0].fill_between(viral_loads, plot_data['lower_percentiles'], plot_data['upper_percentiles'], alpha=0.1, label='5ᵗʰ and 95ᵗʰ percentile')
 
-    axs[0, 2].hist(infection_probability, bins=30, orientation='horizontal')
+    # The histograms are drawn from their (pre-computed) counts.
+    prob_hist_bins = plot_data['prob_hist_bins']
+    axs[0, 2].hist(prob_hist_bins[:-1], bins=prob_hist_bins, weights=plot_data['prob_hist_count'], orientation='horizontal')
     axs[0, 2].set_xticks([])
     axs[0, 2].set_xticklabels([])
     axs[0, 2].set_facecolor("lightgrey")
@@ -248,9 +306,9 @@ def uncertainties_plot(exposure_model: models.ExposureModel, prob: models._Vecto
     axs[0, 2].set_xlim(0, highest_bar)
 
     axs[0, 2].text(highest_bar * 0.5, 0.5,
-                        rf"$\bf{np.round(np.mean(infection_probability) * 100, 1)}$%", ha='center', va='center')
-    axs[1, 0].hist(np.log10(exposure_model.concentration_model.infected.virus.viral_load_in_sputum),
-                    bins=150, range=(2, 10), color='grey')
+                        rf"$\bf{np.round(plot_data['prob_mean'] * 100, 1)}$%", ha='center', va='center')
+    vl_hist_bins = plot_data['vl_hist_bins']
+    axs[1, 0].hist(vl_hist_bins[:-1], bins=vl_hist_bins, weights=plot_data['vl_hist_count'], color='grey')
     axs[1, 0].set_facecolor("lightgrey")
     axs[1, 0].set_yticks([])
     axs[1, 0].set_yticklabels([])
@@ -266,7 +324,188 @@ def uncertainties_plot(exposure_model: models.ExposureModel, prob: models._Vecto
 
     axs[0, 0].legend()
     return fig
-    
+
+
+#: The directory in which the rendered plots are cached, shared by the worker
+#: processes of this user (and only accessible to them), see ``_plot_cache_dir``.
+PLOT_CACHE_DIR = Path(
+    os.environ.get('CAIMIRA_PLOT_CACHE_DIR') or Path(tempfile.gettempdir()) / f'caimira-plots-{os.getuid()}'
+)
+
+#: The time (in seconds) after which unused plots are removed from the cache.
+PLOT_CACHE_TTL = 24 * 3600
+
+#: The minimum time (in seconds) between two removals of the unused plots.
+PLOT_CACHE_PRUNE_INTERVAL = 3600
+
+#: The image formats in which the plots can be rendered, and their content type.
+PLOT_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# The size of each array of the plot data. The evenly spaced ones are encoded
+# by their bounds only.
+_PLOT_DATA_LINSPACES = {'viral_loads': 100, 'prob_hist_bins': _PROB_HIST_BINS + 1, 'vl_hist_bins': _VL_HIST_BINS + 1}
+_PLOT_DATA_ARRAYS = {
+    'pi_means': 100, 'lower_percentiles': 100, 'upper_percentiles': 100,
+    'prob_hist_count': _PROB_HIST_BINS, 'vl_hist_count': _VL_HIST_BINS,
+}
+_PLOT_DATA_HEADER_SIZE = 1 + 2 * len(_PLOT_DATA_LINSPACES)
+# The size (in bytes) of the encoded plot data, once decompressed.
+_PLOT_DATA_SIZE = 4 * (_PLOT_DATA_HEADER_SIZE + sum(_PLOT_DATA_ARRAYS.values()))
+
+
+def _write_atomically(path: Path, content: bytes) -> None:
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def _plot_cache_dir() -> typing.Optional[Path]:
+    # The cache directory, created if needed, or None if it is not private to
+    # this user (in which case the plots are not cached).
+    try:
+        PLOT_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        status = PLOT_CACHE_DIR.stat()
+    except OSError:
+        return None
+    if status.st_uid != os.getuid() or status.st_mode & 0o077:
+        return None
+    return PLOT_CACHE_DIR
+
+
+def _prune_plot_cache(cache_dir: Path) -> None:
+    # The unused plots are removed at most every PLOT_CACHE_PRUNE_INTERVAL (by
+    # any of the processes), rather than on each render.
+    now = time.time()
+    marker = cache_dir / '.pruned'
+    try:
+        if marker.stat().st_mtime > now - PLOT_CACHE_PRUNE_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    marker.touch()
+
+    expiry = now - PLOT_CACHE_TTL
+    for path in cache_dir.iterdir():
+        try:
+            if path != marker and path.stat().st_mtime < expiry:
+                path.unlink()
+        except FileNotFoundError:
+            # Removed concurrently by another process.
+            pass
+
+
+def encode_plot_data(plot_data: typing.Dict[str, typing.Any]) -> str:
+    """
+    Encode the given plot data into a (URL safe) identifier, from which the plot
+    can be rendered with ``render_uncertainties_plot``, by any replica and at any
+    time. As for the permalink, the data is zlib compressed and base64 encoded
+    (in single precision, which is plenty for a plot).
+
+    """
+    header = [plot_data['prob_mean']]
+    for name, size in _PLOT_DATA_LINSPACES.items():
+        if len(plot_data[name]) != size:
+            raise ValueError(f"Expected {size} values of {name}, got {len(plot_data[name])}")
+        header += [plot_data[name][0], plot_data[name][-1]]
+    for name, size in _PLOT_DATA_ARRAYS.items():
+        if len(plot_data[name]) != size:
+            raise ValueError(f"Expected {size} values of {name}, got {len(plot_data[name])}")
+    content = np.concatenate([header] + [plot_data[name] for name in _PLOT_DATA_ARRAYS]).astype('<f4')
+    return base64.urlsafe_b64encode(zlib.compress(content.tobytes(), 9)).decode().rstrip('=')
+
+
+def decode_plot_data(plot_id: str) -> typing.Dict[str, typing.Any]:
+    """
+    The plot data encoded by ``encode_plot_data``. Raises a ``ValueError`` if
+    the identifier is invalid.
+
+    """
+    try:
+        decompressor = zlib.decompressobj()
+        # Never decompress more than the (fixed) size of the plot data.
+        content = decompressor.decompress(
+            base64.urlsafe_b64decode(plot_id + '=' * (-len(plot_id) % 4)), _PLOT_DATA_SIZE + 1,
+        )
+    except (ValueError, zlib.error) as err:
+        raise ValueError(f"Invalid plot identifier ({err})") from err
+    if len(content) != _PLOT_DATA_SIZE or not decompressor.eof:
+        raise ValueError("Invalid plot identifier (unexpected size)")
+
+    values = np.frombuffer(content, dtype='<f4').astype(float)
+    header, values = values[:_PLOT_DATA_HEADER_SIZE], values[_PLOT_DATA_HEADER_SIZE:]
+    if not np.isfinite(header).all():
+        raise ValueError("Invalid plot identifier (non-finite bounds)")
+    plot_data: typing.Dict[str, typing.Any] = {'prob_mean': header[0]}
+    for (name, size), first, last in zip(_PLOT_DATA_LINSPACES.items(), header[1::2], header[2::2]):
+        plot_data[name] = np.linspace(first, last, size)
+    sizes = list(_PLOT_DATA_ARRAYS.values())
+    for name, array in zip(_PLOT_DATA_ARRAYS, np.split(values, np.cumsum(sizes)[:-1])):
+        plot_data[name] = array
+    return plot_data
+
+
+def render_uncertainties_plot(plot_id: str, image_format: str) -> bytes:
+    """
+    Return the uncertainties plot of the given identifier in the given format
+    (one of ``PLOT_FORMATS``). Raises a ``ValueError`` if the identifier is invalid.
+    Rendered plots are cached, but can always be rendered again from their identifier.
+
+    """
+    import matplotlib.pyplot as plt
+
+    cache_dir = _plot_cache_dir()
+    image_path = None
+    if cache_dir is not None:
+        image_path = cache_dir / f'{hashlib.sha256(plot_id.encode()).hexdigest()}.{image_format}'
+        try:
+            image = image_path.read_bytes()
+        except FileNotFoundError:
+            pass
+        else:
+            metrics.record_cache_lookup('uncertainties_plot', hit=True)
+            image_path.touch()
+            return image
+    metrics.record_cache_lookup('uncertainties_plot', hit=False)
+
+    plot_data = decode_plot_data(plot_id)
+    figure = uncertainties_plot(plot_data)
+    img_data = io.BytesIO()
+    figure.savefig(img_data, format=image_format, bbox_inches="tight", transparent=True, dpi=110)
+    plt.close(figure)
+    if cache_dir is not None and image_path is not None:
+        _prune_plot_cache(cache_dir)
+        _write_atomically(image_path, img_data.getvalue())
+    return img_data.getvalue()
+
+
+#: The template environments of the report, built once per (worker) process and loader.
+_TEMPLATE_ENVIRONMENTS: typing.Dict[typing.Hashable, jinja2.Environment] = {}
+
+#: The rendered markdown blocks of each environment, alongside the template they were rendered from.
+_COMMON_TEXT: typing.Dict[typing.Hashable, typing.Tuple[jinja2.Template, typing.Dict[str, str]]] = {}
+
+#: The maximum number of template environments kept, the oldest being dropped first.
+_MAX_TEMPLATE_ENVIRONMENTS = 8
+
+
+def _loader_key(loader: jinja2.BaseLoader) -> typing.Hashable:
+    # The report generator (and hence its loader) is pickled for each report
+    # computed by a worker process, so the loaders are identified by where they
+    # load the templates from rather than by their identity. Other loaders are
+    # identified by their identity, hence the bound on the cached environments.
+    if isinstance(loader, jinja2.FileSystemLoader):
+        return (type(loader), tuple(loader.searchpath), loader.encoding, loader.followlinks)
+    if isinstance(loader, jinja2.PackageLoader):
+        return (type(loader), loader.package_name, loader.package_path, loader.encoding)
+    if isinstance(loader, jinja2.ChoiceLoader):
+        return (type(loader), tuple(_loader_key(choice) for choice in loader.loaders))
+    if isinstance(loader, jinja2.PrefixLoader):
+        return (
+            type(loader), loader.delimiter,
+            tuple(sorted((prefix, _loader_key(prefix_loader)) for prefix, prefix_loader in loader.mapping.items())),
+        )
+    return loader
+
 
 def _img2bytes(figure):
     # Draw the image
@@ -393,23 +632,55 @@ def manufacture_alternative_scenarios(form: FormData) -> typing.Dict[str, mc.Exp
     return scenarios
 
 
-def scenario_statistics(mc_model: mc.ExposureModel, sample_times: typing.List[float], compute_prob_exposure: bool):
-    model = mc_model.build_model(size=DEFAULT_MC_SAMPLE_SIZE)
-    if (compute_prob_exposure):
-        # It means we have data to calculate the total_probability_rule
-        prob_probabilistic_exposure = model.total_probability_rule()
-    else:
-        prob_probabilistic_exposure = 0.
+def scenario_statistics(
+        mc_model: mc.ExposureModel,
+        sample_times: typing.List[float],
+        compute_prob_exposure: bool,
+        sample_size: int = DEFAULT_MC_SAMPLE_SIZE,
+):
+    # A stage of its own, such that the memory of the scenario processes is checked.
+    with metrics.stage_timer('scenario_statistics'):
+        model = mc_model.build_model(size=sample_size)
+        if (compute_prob_exposure):
+            # It means we have data to calculate the total_probability_rule
+            prob_probabilistic_exposure = model.total_probability_rule()
+        else:
+            prob_probabilistic_exposure = 0.
+
+        return {
+            'probability_of_infection': np.mean(model.infection_probability()),
+            'expected_new_cases': np.mean(model.expected_new_cases()),
+            'concentrations': [
+                np.mean(model.concentration(time))
+                for time in sample_times
+            ],
+            'prob_probabilistic_exposure': prob_probabilistic_exposure,
+        }
 
-    return {
-        'probability_of_infection': np.mean(model.infection_probability()),
-        'expected_new_cases': np.mean(model.expected_new_cases()),
-        'concentrations': [
-            np.mean(model.concentration(time))
-            for time in sample_times
-        ],
-        'prob_probabilistic_exposure': prob_probabilistic_exposure,
-    }
+
+def scenarios_statistics(
+        mc_models: typing.List[mc.ExposureModel],
+        sample_times: typing.List[float],
+        compute_prob_exposure: bool,
+        sample_size: int = DEFAULT_MC_SAMPLE_SIZE,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """The ``scenario_statistics`` of each of the given scenarios, computed by a single task."""
+    return [
+        scenario_statistics(mc_model, sample_times, compute_prob_exposure, sample_size)
+        for mc_model in mc_models
+    ]
+
+
+def _split(items: list, n_chunks: int) -> typing.List[list]:
+    # The given items, in (at most) ``n_chunks`` contiguous chunks of similar sizes.
+    n_chunks = max(1, min(n_chunks, len(items)))
+    size, remainder = divmod(len(items), n_chunks)
+    chunks, start = [], 0
+    for index in range(n_chunks):
+        end = start + size + (index < remainder)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
 
 
 def comparison_report(
@@ -418,6 +689,7 @@ def comparison_report(
         scenarios: typing.Dict[str, mc.ExposureModel],
         sample_times: typing.List[float],
         executor_factory: typing.Callable[[], concurrent.futures.Executor],
+        sample_size: int = DEFAULT_MC_SAMPLE_SIZE,
 ):
     if (form.short_range_option == "short_range_no"):
         statistics = {
@@ -435,16 +707,24 @@ def comparison_report(
     else:
         compute_prob_exposure = False
 
+    metrics.record_count('mc_samples', sample_size * len(scenarios))
     with executor_factory() as executor:
+        # The scenarios are sent in one chunk per worker (rather than one task per
+        # scenario), such that the components which they share (see
+        # ``model_generator.shared_components``) are pickled once per chunk, and
+        # are shared again by the scenarios in the worker.
+        max_workers: int = getattr(executor, 'max_workers', 0) or getattr(executor, '_max_workers', 1)
+        chunks = _split(list(scenarios.values()), max_workers)
         results = executor.map(
-            scenario_statistics,
-            scenarios.values(),
-            [sample_times] * len(scenarios),
-            [compute_prob_exposure] * len(scenarios),
+            scenarios_statistics,
+            chunks,
+            [sample_times] * len(chunks),
+            [compute_prob_exposure] * len(chunks),
+            [sample_size] * len(chunks),
             timeout=60,
         )
 
-    for (name, model), model_stats in zip(scenarios.items(), results):
+    for name, model_stats in zip(scenarios, itertools.chain.from_iterable(results)):
         statistics[name] = model_stats
 
     return {
@@ -463,9 +743,17 @@ class ReportGenerator:
             base_url: str,
             form: FormData,
             executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress_callback: typing.Optional[ProgressCallback] = None,
+            sample_size: int = DEFAULT_MC_SAMPLE_SIZE,
     ) -> str:
-        model = form.build_model()
-        context = self.prepare_context(base_url, model, form, executor_factory=executor_factory)
+        # The alternative scenarios share the unchanged components of the model.
+        with model_generator.shared_components():
+            with metrics.stage_timer('build_model'):
+                model = form.build_model(sample_size=sample_size)
+            context = self.prepare_context(
+                base_url, model, form, executor_factory=executor_factory, progress_callback=progress_callback,
+                sample_size=sample_size,
+            )
         return self.render(context)
 
     def prepare_context(
@@ -474,7 +762,19 @@ class ReportGenerator:
             model: models.ExposureModel,
             form: FormData,
             executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress_callback: typing.Optional[ProgressCallback] = None,
+            sample_size: int = DEFAULT_MC_SAMPLE_SIZE,
     ) -> dict:
+        """
+        Compute the context of the report. If given, the ``progress_callback`` is
+        notified of the "headline", "concentrations" and "alternative_scenarios"
+        stages as soon as each of them is available, with the (few) figures of
+        each stage which are shown whilst the report is loading. The alternative
+        scenarios are computed with ``sample_size`` samples, and a report computed
+        with fewer samples than the default (to fit in the memory available, see
+        :func:`memory.call_with_sample_size_fallback`) is flagged as such.
+
+        """
         now = datetime.utcnow().astimezone()
         time = now.strftime("%Y-%m-%d %H:%M:%S UTC")
 
@@ -482,17 +782,42 @@ class ReportGenerator:
             'model': model,
             'form': form,
             'creation_date': time,
+            'sample_size': sample_size,
+            'reduced_sample_size': sample_size < DEFAULT_MC_SAMPLE_SIZE,
         }
 
         scenario_sample_times = interesting_times(model)
-        report_data = calculate_report_data(form, model)
+        if progress_callback is not None:
+            # The infection probability is cached on the model, hence the headline
+            # figures come at no extra cost to the report data.
+            progress_callback('headline', calculate_headline_data(model))
+        with metrics.stage_timer('calculate_report_data'):
+            report_data = calculate_report_data(form, model)
         context.update(report_data)
-
-        alternative_scenarios = manufacture_alternative_scenarios(form)
-        context['alternative_viral_load'] = manufacture_viral_load_scenarios_percentiles(model) if form.conditional_probability_viral_loads else None
-        context['alternative_scenarios'] = comparison_report(
-            form, report_data, alternative_scenarios, scenario_sample_times, executor_factory=executor_factory,
-        )
+        if progress_callback is not None:
+            progress_callback('concentrations', {
+                'times': report_data['times'],
+                'concentrations': report_data['concentrations'],
+            })
+
+        with metrics.stage_timer('manufacture_alternative_scenarios'):
+            alternative_scenarios = manufacture_alternative_scenarios(form)
+        with metrics.stage_timer('viral_load_scenarios'):
+            context['alternative_viral_load'] = manufacture_viral_load_scenarios_percentiles(model) if form.conditional_probability_viral_loads else None
+        with metrics.stage_timer('comparison_report'):
+            alternative_statistics = comparison_report(
+                form, report_data, alternative_scenarios, scenario_sample_times, executor_factory=executor_factory,
+                sample_size=sample_size,
+            )
+        context['alternative_scenarios'] = alternative_statistics
+        if progress_callback is not None:
+            progress_callback('alternative_scenarios', {
+                name: {
+                    'probability_of_infection': stats['probability_of_infection'],
+                    'expected_new_cases': stats['expected_new_cases'],
+                }
+                for name, stats in alternative_statistics['stats'].items()
+            })
         context['permalink'] = generate_permalink(base_url, self.get_root_url, self.get_root_calculator_url, form)
         context['get_url'] = self.get_root_url
         context['get_calculator_url'] = self.get_root_calculator_url
@@ -500,22 +825,43 @@ class ReportGenerator:
         return context
 
     def _template_environment(self) -> jinja2.Environment:
-        env = jinja2.Environment(
-            loader=self.jinja_loader,
-            undefined=jinja2.StrictUndefined,
-        )
-        env.globals["common_text"] = markdown_tools.extract_rendered_markdown_blocks(
-            env.get_template('common_text.md.j2')
-        )
-        env.filters['non_zero_percentage'] = non_zero_percentage
-        env.filters['readable_minutes'] = readable_minutes
-        env.filters['minutes_to_time'] = minutes_to_time
-        env.filters['float_format'] = "{0:.2f}".format
-        env.filters['int_format'] = "{:0.0f}".format
-        env.filters['percentage'] = percentage
-        env.filters['JSONify'] = json.dumps
+        key = _loader_key(self.jinja_loader)
+        env = _TEMPLATE_ENVIRONMENTS.get(key)
+        metrics.record_cache_lookup('template_environment', hit=env is not None)
+        if env is None:
+            env = jinja2.Environment(
+                loader=self.jinja_loader,
+                undefined=jinja2.StrictUndefined,
+                # Compiled templates are shared between the worker processes (and
+                # survive their restart). Templates whose file has been modified
+                # are re-loaded, as ``auto_reload`` is enabled.
+                bytecode_cache=jinja2.FileSystemBytecodeCache(),
+                auto_reload=True,
+            )
+            env.filters['non_zero_percentage'] = non_zero_percentage
+            env.filters['readable_minutes'] = readable_minutes
+            env.filters['minutes_to_time'] = minutes_to_time
+            env.filters['float_format'] = "{0:.2f}".format
+            env.filters['int_format'] = "{:0.0f}".format
+            env.filters['percentage'] = percentage
+            env.filters['JSONify'] = json.dumps
+            while len(_TEMPLATE_ENVIRONMENTS) >= _MAX_TEMPLATE_ENVIRONMENTS:
+                oldest = next(iter(_TEMPLATE_ENVIRONMENTS))
+                del _TEMPLATE_ENVIRONMENTS[oldest]
+                _COMMON_TEXT.pop(oldest, None)
+            _TEMPLATE_ENVIRONMENTS[key] = env
+
+        # The markdown blocks are only rendered again if the template has changed
+        # (in which case the environment gives a newly loaded template).
+        common_text_template = env.get_template('common_text.md.j2')
+        cached_template, common_text = _COMMON_TEXT.get(key, (None, {}))
+        if cached_template is not common_text_template:
+            common_text = markdown_tools.extract_rendered_markdown_blocks(common_text_template)
+            _COMMON_TEXT[key] = (common_text_template, common_text)
+        env.globals["common_text"] = common_text
         return env
 
     def render(self, context: dict) -> str:
-        template = self._template_environment().get_template("calculator.report.html.j2")
-        return template.render(**context, text_blocks=template.globals["common_text"])
+        with metrics.stage_timer('render'):
+            template = self._template_environment().get_template("calculator.report.html.j2")
+            return template.render(**context, text_blocks=template.globals["common_text"])
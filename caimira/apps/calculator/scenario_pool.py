@@ -0,0 +1,228 @@
+import collections
+import concurrent.futures
+import functools
+import threading
+import time
+import typing
+
+import loky
+
+from . import memory
+from . import metrics
+from .job_queue import _timed_call
+from .worker_pool import warm_up_worker
+
+#: A task waiting to be sent to the processes: its future, function, arguments
+#: and submission time.
+_Task = typing.Tuple[concurrent.futures.Future, typing.Callable, tuple, float]
+
+
+class ScenarioPool:
+    """
+    A long-lived process pool, shared by the reports computed in this process.
+
+    Each report submits its scenarios through its own :class:`ScenarioLane`. At
+    most ``max_workers`` tasks are sent to the processes at any one time, and
+    the lanes take turns (round-robin) to send their next task, such that a
+    report with many scenarios does not hold back the reports which follow it.
+    Note that a report worker computes one report at a time, hence the turns
+    only matter where reports are computed concurrently by the threads of a
+    process.
+
+    The metrics recorded by each task, and the time it waited to be sent to
+    the processes, are recorded in the metrics of the report which submitted it
+    (see :meth:`ScenarioLane.shutdown`). The tasks are held to the memory limit
+    of that report (see :func:`memory.guarded_call`), and a task whose process
+    is killed (as done by the Operating System when it runs out of memory)
+    fails with a :class:`MemoryError`, such that the report can be computed
+    again with fewer samples.
+
+    """
+    def __init__(self, max_workers: typing.Optional[int] = None):
+        self._executor = loky.ProcessPoolExecutor(max_workers=max_workers, initializer=warm_up_worker)
+        self.max_workers: int = self._executor._max_workers  # type: ignore
+        self._lock = threading.Lock()
+        self._lanes: typing.Deque["ScenarioLane"] = collections.deque()
+        self._in_flight = 0
+        self._closing = False
+
+    def lane(self) -> "ScenarioLane":
+        """Return a new lane, through which the tasks of a single report are submitted."""
+        return ScenarioLane(self)
+
+    def _enqueue(self, lane: "ScenarioLane", task: _Task) -> None:
+        with self._lock:
+            if not lane._pending:
+                self._lanes.append(lane)
+            lane._pending.append(task)
+        self._dispatch()
+
+    def shutdown(self) -> None:
+        """
+        Shut down the processes of the pool, once the tasks already submitted
+        through its lanes have been sent to them (without waiting for them).
+
+        """
+        with self._lock:
+            self._closing = True
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # The tasks are chosen whilst holding the lock, but sent to the processes
+        # without it (as a task's callback may run immediately in this thread).
+        to_send: typing.List[typing.Tuple["ScenarioLane", _Task]] = []
+        with self._lock:
+            while self._in_flight < self.max_workers and self._lanes:
+                lane = self._lanes.popleft()
+                task = lane._pending.popleft()
+                if lane._pending:
+                    # Round-robin: the lane goes to the back of the line.
+                    self._lanes.append(lane)
+                if task[0].set_running_or_notify_cancel():
+                    self._in_flight += 1
+                    to_send.append((lane, task))
+            # The processes complete the tasks already sent to them before exiting.
+            shut_down = self._closing and not self._lanes and not to_send
+            if shut_down:
+                self._closing = False
+
+        for lane, (future, fn, args, submitted) in to_send:
+            try:
+                process_future = self._submit(_timed_call, metrics.collect, fn, *args)
+            except Exception as err:
+                self._task_done(lane, future, submitted, None, err)
+                continue
+            process_future.add_done_callback(functools.partial(self._task_done, lane, future, submitted))
+        if shut_down:
+            self._executor.shutdown(wait=False)
+
+    def _submit(self, fn: typing.Callable, *args) -> concurrent.futures.Future:
+        try:
+            return self._executor.submit(fn, *args)
+        except loky.BrokenProcessPool:
+            # A crashed process breaks the pool for good, hence start a new one.
+            self._executor = loky.ProcessPoolExecutor(max_workers=self.max_workers, initializer=warm_up_worker)
+            return self._executor.submit(fn, *args)
+
+    def _task_done(
+            self,
+            lane: "ScenarioLane",
+            future: concurrent.futures.Future,
+            submitted: float,
+            process_future: typing.Optional[concurrent.futures.Future],
+            error: typing.Optional[BaseException] = None,
+    ) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        if process_future is not None:
+            error = process_future.exception()
+        if isinstance(error, loky.process_executor.TerminatedWorkerError) and 'SIGKILL' in str(error):
+            error = MemoryError(f"A scenario process was killed, presumably for running out of memory ({error})")
+        if error is not None:
+            task_metrics = metrics.error_metrics(error)
+            if task_metrics is not None:
+                # The start of the failed task is unknown: estimate its wait from its duration.
+                queue_wait = max(0., time.time() - submitted - task_metrics.duration)
+                lane._task_metrics.append((queue_wait, task_metrics))
+            future.set_exception(error)
+        else:
+            started, _, (result, task_metrics) = process_future.result()  # type: ignore
+            lane._task_metrics.append((started - submitted, task_metrics))
+            future.set_result(result)
+        self._dispatch()
+
+
+class ScenarioLane(concurrent.futures.Executor):
+    """
+    The :class:`concurrent.futures.Executor` interface of a report onto a
+    :class:`ScenarioPool`. Shutting down a lane waits for its own tasks, but
+    leaves the pool running for the other reports.
+
+    Once its tasks are done, shutting down the lane also records their
+    metrics and queue wait times (see :func:`metrics.record_scenario_task`),
+    in the thread which computes the report.
+
+    """
+    def __init__(self, pool: ScenarioPool):
+        self._pool = pool
+        # The memory guard of the report, which its tasks are held to.
+        self._guard = memory.current_guard()
+        self._pending: typing.Deque[_Task] = collections.deque()
+        self._futures: typing.List[concurrent.futures.Future] = []
+        # The queue wait time and metrics of each of the completed tasks.
+        self._task_metrics: typing.List[typing.Tuple[float, metrics.WorkerMetrics]] = []
+        self._shutdown = False
+
+    @property
+    def max_workers(self) -> int:
+        """The number of tasks which the pool computes at any one time."""
+        return self._pool.max_workers
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        if kwargs:
+            fn = functools.partial(fn, **kwargs)
+        if self._guard is not None:
+            fn, args = memory.guarded_call, (self._guard.limit, self._guard.trace, fn, *args)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._futures.append(future)
+        self._pool._enqueue(self, (future, fn, args, time.time()))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._shutdown = True
+        if cancel_futures:
+            for future in self._futures:
+                future.cancel()
+        if wait:
+            concurrent.futures.wait(self._futures)
+            task_metrics, self._task_metrics = self._task_metrics, []
+            for queue_wait, metrics_of_task in task_metrics:
+                metrics.record_scenario_task(queue_wait, metrics_of_task)
+
+
+def scenario_pool_size(
+        total_processes: typing.Optional[int],
+        report_workers: typing.Optional[int],
+) -> int:
+    """
+    Return the number of processes of the scenario pool of each report worker,
+    such that the ``report_workers`` share ``total_processes`` between them
+    (each of them defaults to the number of CPUs), with one process at least.
+
+    """
+    cpu_count = loky.cpu_count()
+    return max(1, (total_processes or cpu_count) // (report_workers or cpu_count))
+
+
+_shared_pool: typing.Optional[ScenarioPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_scenario_pool(max_workers: typing.Optional[int] = None) -> ScenarioPool:
+    """
+    The scenario pool of this process, created when first needed. There is a
+    single pool per process: asking for another number of processes replaces
+    it, and the previous pool is shut down.
+
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        pool = _shared_pool
+        if pool is None or pool.max_workers != (max_workers or loky.cpu_count()):
+            _shared_pool = ScenarioPool(max_workers)
+        else:
+            return pool
+    if pool is not None:
+        pool.shutdown()
+    return _shared_pool
+
+
+def scenario_lane(max_workers: typing.Optional[int] = None) -> ScenarioLane:
+    """
+    Return a new lane onto the shared scenario pool of this process. Suitable
+    as the ``executor_factory`` of a report (once bound to ``max_workers``).
+
+    """
+    return shared_scenario_pool(max_workers).lane()
@@ -671,11 +671,126 @@ function validate_form(form) {
     $("#generate_report").html(
       `<span id="loading_spinner" class="spinner-border spinner-border-sm mr-2" role="status" aria-hidden="true"></span>Loading...`
     );
+    if (window.EventSource) {
+      stream_report(form);
+      return false;
+    }
   }
 
   return submit;
 }
 
+/* -------Report streaming------- */
+// The report is streamed as server-sent events, such that its headline figures,
+// concentration and comparison with the alternative scenarios are shown (below
+// the form) as soon as each of them is computed. If the stream fails, the form
+// is submitted as usual.
+function stream_report(form) {
+  var inputs = $(form).serializeArray();
+  // The form inputs, as for the permalink.
+  var args = $.param(inputs.filter(function(input) {
+    return input.name != "_xsrf";
+  }));
+  // The XSRF token is needed, as the report is computed by a GET request.
+  var source = new EventSource(form.action + "/events?" + $.param(inputs));
+  var completed = false;
+
+  var progress = $("#report_progress");
+  if (!progress.length) {
+    progress = $('<div id="report_progress" class="container container--padding"></div>');
+    $("#generate_report").parent().after(progress);
+  }
+  progress.empty();
+
+  source.addEventListener("headline", function(event) {
+    var headline = JSON.parse(event.data);
+    $("#generate_report").html(
+      `<span id="loading_spinner" class="spinner-border spinner-border-sm mr-2" role="status" aria-hidden="true"></span>` +
+      `Loading the full report...`
+    );
+    progress.append($("<p></p>").html(
+      `Probability of infection: <b>${headline.prob_inf.toFixed(1)}%</b>, ` +
+      `expected number of new cases: <b>${headline.expected_new_cases.toFixed(2)}</b>`
+    ));
+  });
+
+  source.addEventListener("concentrations", function(event) {
+    var data = JSON.parse(event.data);
+    progress.append($("<p></p>").text("Mean concentration (virions per m³) over time (hours):"));
+    progress.append(concentration_sparkline(data.times, data.concentrations));
+  });
+
+  source.addEventListener("alternative_scenarios", function(event) {
+    var scenarios = JSON.parse(event.data);
+    var table = $('<table class="table table-sm"></table>').append(
+      "<thead><tr><th>Scenario</th><th>Probability of infection</th><th>Expected new cases</th></tr></thead>"
+    );
+    var body = $("<tbody></tbody>").appendTo(table);
+    $.each(scenarios, function(name, stats) {
+      $("<tr></tr>")
+        .append($("<td></td>").text(name))
+        .append($("<td></td>").text(stats.probability_of_infection.toFixed(1) + "%"))
+        .append($("<td></td>").text(stats.expected_new_cases.toFixed(2)))
+        .appendTo(body);
+    });
+    progress.append(table);
+  });
+
+  source.addEventListener("report", function(event) {
+    completed = true;
+    source.close();
+    // Reloading the page shows the (pre-filled) form, as for the permalink.
+    history.pushState(null, "", window.location.pathname + "?" + args);
+    document.open();
+    document.write(JSON.parse(event.data).html);
+    document.close();
+    // Going back shows the form again, as the document is now the report.
+    window.addEventListener("popstate", function() {
+      window.location.reload();
+    });
+  });
+
+  // The report could not be generated: computing it again would not help.
+  source.addEventListener("report_error", function(event) {
+    completed = true;
+    source.close();
+    progress.append($('<p class="text-danger"></p>').text(
+      "The report could not be generated (error ID " + JSON.parse(event.data).error_id + "). " +
+      "Please try again later, or contact us with the error ID."
+    ));
+    $("#generate_report").prop("disabled", false).html(`Generate report`);
+  });
+
+  // The connection failed (or was refused, e.g. for an invalid form).
+  source.addEventListener("error", function() {
+    source.close();
+    if (!completed) form.submit();
+  });
+}
+
+// A minimal line plot of the given values, as an SVG element.
+function concentration_sparkline(times, values) {
+  var width = 600, height = 120;
+  var min_time = Math.min.apply(null, times), max_time = Math.max.apply(null, times);
+  var max_value = Math.max.apply(null, values) || 1;
+  var points = times.map(function(time, index) {
+    var x = (time - min_time) / ((max_time - min_time) || 1) * width;
+    var y = height - values[index] / max_value * height;
+    return x.toFixed(1) + "," + y.toFixed(1);
+  }).join(" ");
+  var svg = document.createElementNS("http://www.w3.org/2000/svg", "svg");
+  svg.setAttribute("viewBox", `0 0 ${width} ${height}`);
+  svg.setAttribute("width", "100%");
+  svg.setAttribute("height", height);
+  var line = document.createElementNS("http://www.w3.org/2000/svg", "polyline");
+  line.setAttribute("points", points);
+  line.setAttribute("fill", "none");
+  line.setAttribute("stroke", "#1f77b4");
+  line.setAttribute("stroke-width", "2");
+  svg.appendChild(line);
+  return svg;
+}
+
 function validateValue(obj) {
   $(obj).removeClass("red_border");
   removeErrorFor(obj);
@@ -0,0 +1,107 @@
+import concurrent.futures
+import functools
+import logging
+import os
+import time
+import typing
+
+import jinja2
+import loky
+
+from . import metrics
+from .report_generator import ReportGenerator
+
+LOG = logging.getLogger(__name__)
+
+#: The time (in seconds) after which idle report workers are shut down.
+WORKER_TIMEOUT = 300
+
+
+def _import_dependencies() -> None:
+    # The expiration distributions are built when the module is imported, and
+    # the Monte Carlo models are generated on first use.
+    import caimira.monte_carlo.data  # noqa
+    import caimira.monte_carlo
+    for name in caimira.monte_carlo.__all__:
+        getattr(caimira.monte_carlo, name)
+    import matplotlib.pyplot  # noqa
+    import pandas  # noqa
+    import scipy.stats  # noqa
+    import sklearn.neighbors  # type: ignore # noqa
+
+
+def _load_weather_data() -> None:
+    import caimira.data.weather
+    caimira.data.weather.wx_store()
+    caimira.data.weather.wx_station_index()
+    caimira.data.weather._timezone_finder()
+
+
+def _compile_report_template(template_searchpath: typing.Sequence[str]) -> None:
+    # The template environment is cached by search path, hence it is shared
+    # with the report generator of the application.
+    report_generator = ReportGenerator(jinja2.FileSystemLoader(template_searchpath), None, None)
+    report_generator._template_environment().get_template("calculator.report.html.j2")
+
+
+def _run_baseline_model() -> None:
+    from .model_generator import FormData, baseline_raw_form_data
+    form = FormData.from_dict(baseline_raw_form_data())
+    form.build_model(sample_size=100).infection_probability()
+
+
+def warm_up_worker(
+        template_searchpath: typing.Sequence[str] = (),
+        run_baseline_model: bool = False,
+) -> None:
+    """
+    Initialise a fresh worker process: import the heavy dependencies, build
+    the Monte Carlo distributions, load the weather data and compile the report
+    template, such that the first report computed by the worker does not pay
+    for it. Optionally, a baseline model (with a small sample) is computed too.
+
+    The warm-up is best-effort: a step which fails is logged and recorded in
+    the metrics, and is otherwise left to the first task which needs it (an
+    error in a pool initializer would break the pool for every task).
+
+    """
+    start = time.perf_counter()
+
+    steps: typing.List[typing.Tuple[str, typing.Callable[[], None]]] = [
+        ('import_dependencies', _import_dependencies),
+        ('load_weather_data', _load_weather_data),
+    ]
+    if template_searchpath:
+        steps.append(('compile_report_template', functools.partial(_compile_report_template, template_searchpath)))
+    if run_baseline_model:
+        steps.append(('run_baseline_model', _run_baseline_model))
+
+    errors = []
+    for step, warm_up in steps:
+        try:
+            warm_up()
+        except Exception:
+            LOG.exception(f"Report worker {os.getpid()} failed to warm up ({step})")
+            errors.append(step)
+
+    duration = time.perf_counter() - start
+    LOG.info(f"Report worker {os.getpid()} warmed up in {duration:.2f}s")
+    metrics.record_warm_up(duration, errors)
+
+
+def worker_executor(
+        max_workers: typing.Optional[int],
+        template_searchpath: typing.Sequence[str] = (),
+        warm_up_model: bool = False,
+) -> concurrent.futures.Executor:
+    """
+    Return the (re-usable) executor of the report workers. All the callers must
+    pass the same arguments, as the executor is otherwise replaced.
+
+    """
+    return loky.get_reusable_executor(
+        max_workers=max_workers,
+        timeout=WORKER_TIMEOUT,
+        initializer=warm_up_worker,
+        initargs=(tuple(template_searchpath), warm_up_model),
+    )
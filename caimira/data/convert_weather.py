@@ -0,0 +1,36 @@
+"""
+Convert the weather data from its JSON source to the binary store which is
+memory-mapped by :func:`caimira.data.weather.wx_store`, and build the index of
+the weather stations loaded by :func:`caimira.data.weather.wx_station_index`.
+
+The conversion is otherwise done on first use, which requires the data
+directory to be writable by the application.
+
+"""
+import argparse
+from pathlib import Path
+
+from caimira.data import weather
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--source", help="The JSON weather data",
+        default=str(weather.WX_DATA_LOCATION / weather.WX_DATA_SOURCE),
+    )
+    parser.add_argument(
+        "--destination", help="The directory of the binary store",
+        default=str(weather.WX_DATA_LOCATION),
+    )
+    args = parser.parse_args()
+    store = weather.convert_wx_data(Path(args.source), Path(args.destination))
+    index = weather.build_wx_station_index(
+        store.complete_stations(), weather.WX_DATA_LOCATION / weather.WX_STATION_FILE,
+    )
+    weather.save_wx_station_index(index, Path(args.destination))
+    print(f"Converted the weather data of {len(store.station_index)} stations to {args.destination}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,181 @@
 import datetime
 import functools
 import json
+import logging
+import os
 from pathlib import Path
+import pickle
+import tempfile
 import typing
 
 import dateutil.tz
 import numpy as np
-from scipy.spatial import cKDTree
-from timezonefinder import TimezoneFinder
 
+if typing.TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+    from timezonefinder import TimezoneFinder
+
+LOG = logging.getLogger(__name__)
 
 WX_DATA_LOCATION = Path(__file__).absolute().parent
 WxStationIdType = str
 MonthType = str
 # HourlyTempType - 24 temperatures, one for each hour of the day (the average for the given month).
-HourlyTempType = typing.List[float]
+HourlyTempType = np.ndarray
 WxStationRecordType = typing.Tuple[WxStationIdType, str, float, float]
 
+#: The name of the weather data (JSON) source, and of its binary form: the
+#: station ids (one per line) and the ``(stations, 12, 24)`` array of
+#: temperatures (in Celsius, NaN where the month is incomplete in the source).
+WX_DATA_SOURCE = 'global_weather_set.json'
+WX_STORE_STATIONS = 'global_weather_set.stations.txt'
+WX_STORE_TEMPERATURES = 'global_weather_set.temperatures_celsius.npy'
+
+#: The HadISD station file, and the (pickled) index of the stations with weather
+#: data. The version is to be increased whenever the index structure changes.
+WX_STATION_FILE = 'hadisd_station_fullinfo_v311_202001p.txt'
+WX_STATION_INDEX = 'global_weather_set.station_index.pickle'
+WX_STATION_INDEX_VERSION = 4
+
+
+class WxStore(typing.NamedTuple):
+    #: The index of each station in the temperatures array.
+    station_index: typing.Dict[WxStationIdType, int]
+    #: The mean hourly temperatures (in Celsius) by station, month (0 to 11)
+    #: and hour (UTC), all NaN for the months which are incomplete in the source.
+    temperatures: np.ndarray
+
+    def complete_stations(self) -> typing.List[WxStationIdType]:
+        """Return the stations with complete weather data for every month."""
+        complete = ~np.isnan(self.temperatures).any(axis=(1, 2))
+        return [station for station, i in self.station_index.items() if complete[i]]
+
+
+def _write_atomically(path: Path, write: typing.Callable[[typing.IO], typing.Any]) -> None:
+    # Other processes may be reading (or converting) the data at the same time.
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def convert_wx_data(source: Path, destination: Path) -> WxStore:
+    """
+    Convert the weather data from its JSON source (temperatures in Celsius)
+    to the binary store in the ``destination`` directory, and return it.
+
+    The months which are missing from the source, or which do not have 24
+    valid hourly temperatures, are left as NaN in the store.
+
+    """
+    store = _read_wx_source(source)
+    _write_wx_store(store, destination)
+    return store
+
+
+def _read_wx_source(source: Path) -> WxStore:
+    with source.open("r") as json_file:
+        data = json.load(json_file)
+
+    stations = list(data.keys())
+    temperatures = np.full((len(stations), 12, 24), np.nan, dtype=np.float32)
+    incomplete = 0
+    for i, station in enumerate(stations):
+        for month in range(1, 13):
+            hourly_temperatures = np.array(data[station].get(str(month), []), dtype=float)
+            if hourly_temperatures.shape != (24,) or np.isnan(hourly_temperatures).any():
+                incomplete += 1
+                continue
+            temperatures[i, month - 1] = hourly_temperatures
+    if incomplete:
+        LOG.info(f"{incomplete} station months of the weather data are incomplete, and ignored")
+    return WxStore({station: i for i, station in enumerate(stations)}, temperatures)
+
+
+def _write_wx_store(store: WxStore, destination: Path) -> None:
+    # The temperatures are written last: they mark the store as complete.
+    _write_atomically(
+        destination / WX_STORE_STATIONS,
+        lambda fh: fh.write(''.join(f'{station}\n' for station in store.station_index).encode()),
+    )
+    _write_atomically(destination / WX_STORE_TEMPERATURES, lambda fh: np.save(fh, store.temperatures))
+
 
 @functools.lru_cache()
-def wx_data() -> typing.Dict[WxStationIdType, typing.Dict[MonthType, HourlyTempType]]:
+def wx_store() -> WxStore:
     """
-    Load the weather data (temperature in kelvin).
+    Load the weather data (temperature in Celsius) as a read-only, memory-mapped
+    array, whose pages are shared by all the processes which load it.
 
-    The data is structured by station location, and for each station location, by month.
+    The binary store is converted from the JSON source when it is missing or
+    out of date. If it cannot be written, the converted data is kept in memory.
+    Raises a ``FileNotFoundError`` if neither the store nor the source exists.
 
     """
-    with (WX_DATA_LOCATION / 'global_weather_set.json').open("r") as json_file:
-        data = json.load(json_file)
+    source = WX_DATA_LOCATION / WX_DATA_SOURCE
+    stations_path = WX_DATA_LOCATION / WX_STORE_STATIONS
+    temperatures_path = WX_DATA_LOCATION / WX_STORE_TEMPERATURES
 
-    for station in list(data.keys()):
-        for month in list(data[station].keys()):
-            if not np.any(np.isnan(data[station][month])):
-                data[station][month] = tuple(
-                    273.15 + np.array(data[station][month]))
-    return data
+    up_to_date = temperatures_path.exists() and stations_path.exists() and (
+        not source.exists() or source.stat().st_mtime <= temperatures_path.stat().st_mtime
+    )
+    if not up_to_date:
+        if not source.exists():
+            raise FileNotFoundError(
+                f"The weather data source {source} is missing, and there is no "
+                f"weather data store in {WX_DATA_LOCATION} to use instead"
+            )
+        store = _read_wx_source(source)
+        try:
+            _write_wx_store(store, WX_DATA_LOCATION)
+        except OSError:
+            LOG.warning(f"Unable to write the weather data store in {WX_DATA_LOCATION}, "
+                        "the weather data is kept in memory instead")
+            return store
+
+    stations = stations_path.read_text().split()
+    temperatures = np.load(temperatures_path, mmap_mode='r')
+    if temperatures.shape != (len(stations), 12, 24):
+        raise ValueError(f"The weather data store in {WX_DATA_LOCATION} is inconsistent")
+    return WxStore({station: i for i, station in enumerate(stations)}, temperatures)
 
 
 @functools.lru_cache()
-def wx_station_data() -> typing.Dict[WxStationIdType, WxStationRecordType]:
+def wx_data() -> typing.Dict[WxStationIdType, typing.Dict[MonthType, HourlyTempType]]:
     """
-    Return a dictionary of ``station-id: station records``, where station records
-    are of the form ``(station-id, station-name, station-latitude, station-longitude)``.
+    Load the weather data (temperature in kelvin).
 
-    The stations returned are guaranteed to have valid weather data.
+    The data is structured by station location, and for each station location, by
+    month (the incomplete months are left out). Prefer :func:`mean_hourly_temperatures`,
+    which does not copy the whole dataset.
+
+    """
+    store = wx_store()
+    return {
+        station: {
+            str(month): 273.15 + store.temperatures[i, month - 1].astype(float)
+            for month in range(1, 13)
+            if not np.isnan(store.temperatures[i, month - 1]).any()
+        }
+        for station, i in store.station_index.items()
+    }
+
+
+def parse_wx_stations(
+        station_index: typing.Container[WxStationIdType],
+        station_file: Path,
+) -> typing.Dict[WxStationIdType, WxStationRecordType]:
+    """
+    Parse the (fixed width) HadISD station file, keeping the stations with
+    weather data (in the order of the file).
 
     """
-    weather_data = wx_data()
     station_data = {}
     fixed_delimits = [0, 12, 13, 44, 51, 60, 69, 90, 91]
-    station_file = WX_DATA_LOCATION / 'hadisd_station_fullinfo_v311_202001p.txt'
 
     for line in station_file.open('rt'):
         start_end_positions = zip(fixed_delimits[:-1], fixed_delimits[1:])
@@ -58,18 +184,109 @@ def wx_station_data() -> typing.Dict[WxStationIdType, WxStationRecordType]:
             split_vals[0], split_vals[2], float(split_vals[3]), float(split_vals[4]),
         )
         # We only consider stations with weather data, don't include the rest.
-        if split_vals[0] in weather_data:
+        if split_vals[0] in station_index:
             station_data[split_vals[0]] = station_location
     return station_data
 
 
+class WxStationIndex(typing.NamedTuple):
+    #: The station records, in the order of the kd-tree points.
+    records: typing.Tuple[WxStationRecordType, ...]
+    #: A kd-tree of the station locations, as 3-D unit vectors (see :func:`_unit_vectors`).
+    kdtree: "cKDTree"
+    #: The timezone name of each station (if found), in the order of the records.
+    timezones: typing.Tuple[typing.Optional[str], ...]
+
+
+def _unit_vectors(longitudes: typing.Sequence[float], latitudes: typing.Sequence[float]) -> np.ndarray:
+    """
+    Return the 3-D unit vectors of the given locations on the sphere. The
+    (chord) distance between them increases with the great-circle distance,
+    unlike that between (longitude, latitude) pairs, which is wrong across the
+    antimeridian and increasingly so towards the poles.
+
+    """
+    longitudes_rad = np.radians(np.asarray(longitudes, dtype=float))
+    latitudes_rad = np.radians(np.asarray(latitudes, dtype=float))
+    return np.stack([
+        np.cos(latitudes_rad) * np.cos(longitudes_rad),
+        np.cos(latitudes_rad) * np.sin(longitudes_rad),
+        np.sin(latitudes_rad),
+    ], axis=-1).reshape(-1, 3)
+
+
+def build_wx_station_index(
+        station_index: typing.Container[WxStationIdType],
+        station_file: Path,
+) -> WxStationIndex:
+    """Build the index of the given stations (those with complete weather data)."""
+    from scipy.spatial import cKDTree
+
+    records = tuple(parse_wx_stations(station_index, station_file).values())
+    coords = _unit_vectors(
+        [stn_record[3] for stn_record in records], [stn_record[2] for stn_record in records],
+    )
+    timezones = []
+    for _, _, latitude, longitude in records:
+        try:
+            timezones.append(_timezone_finder().timezone_at(lat=latitude, lng=longitude))
+        except ValueError:
+            timezones.append(None)
+    return WxStationIndex(records, cKDTree(coords), tuple(timezones))
+
+
+def save_wx_station_index(index: WxStationIndex, destination: Path) -> None:
+    _write_atomically(
+        destination / WX_STATION_INDEX,
+        lambda fh: pickle.dump(
+            {'version': WX_STATION_INDEX_VERSION, **index._asdict()},
+            fh, protocol=pickle.HIGHEST_PROTOCOL,
+        ),
+    )
+
+
 @functools.lru_cache()
-def _wx_station_kdtree() -> cKDTree:
-    """Build a kd-tree of wx station longitude & latitudes (note the coordinate order)"""
-    station_data = wx_station_data().values()
-    coords = np.array([(stn_record[3], stn_record[2])
-                      for stn_record in station_data])
-    return cKDTree(coords)
+def wx_station_index() -> WxStationIndex:
+    """
+    Load the (serialized) index of the stations with weather data.
+
+    The index is built again, and saved if possible, when it is missing, out
+    of date with respect to the weather data or the station file, or of
+    another version.
+
+    """
+    store = wx_store()
+    index_path = WX_DATA_LOCATION / WX_STATION_INDEX
+    station_file = WX_DATA_LOCATION / WX_STATION_FILE
+
+    sources = [WX_DATA_LOCATION / WX_STORE_TEMPERATURES, station_file]
+    if index_path.exists() and all(
+        not source.exists() or source.stat().st_mtime <= index_path.stat().st_mtime
+        for source in sources
+    ):
+        with index_path.open('rb') as fh:
+            serialized = pickle.load(fh)
+        if serialized.get('version') == WX_STATION_INDEX_VERSION:
+            return WxStationIndex(serialized['records'], serialized['kdtree'], serialized['timezones'])
+
+    index = build_wx_station_index(store.complete_stations(), station_file)
+    try:
+        save_wx_station_index(index, WX_DATA_LOCATION)
+    except OSError:
+        LOG.warning(f"Unable to write the weather station index in {WX_DATA_LOCATION}")
+    return index
+
+
+@functools.lru_cache()
+def wx_station_data() -> typing.Dict[WxStationIdType, WxStationRecordType]:
+    """
+    Return a dictionary of ``station-id: station records``, where station records
+    are of the form ``(station-id, station-name, station-latitude, station-longitude)``.
+
+    The stations returned are guaranteed to have valid weather data for every month.
+
+    """
+    return {record[0]: record for record in wx_station_index().records}
 
 
 def mean_hourly_temperatures(wx_station: str, month: int) -> HourlyTempType:
@@ -79,19 +296,39 @@ def mean_hourly_temperatures(wx_station: str, month: int) -> HourlyTempType:
     Returns
     -------
 
-    temperatures: List[24 floats]
-        A list containing 24 temperature values, one for each hour, in kelvin.
+    temperatures: np.ndarray (24 floats)
+        An array containing 24 temperature values, one for each hour, in kelvin.
         Index 0 of the result corresponds to hour 00:00 (UTC), and index 23 (the last) to 23:00 (UTC).
 
+    Raises a KeyError if the station has no (complete) weather data for the month.
+
     """
-    # Note that the current dataset encodes month number as a string.
-    return wx_data()[wx_station][str(month)]
+    store = wx_store()
+    temperatures = store.temperatures[store.station_index[wx_station], month - 1]
+    if np.isnan(temperatures).any():
+        raise KeyError(f"No complete weather data for station {wx_station} in month {month}")
+    # Converted in double precision, as the store is in single precision.
+    return 273.15 + temperatures.astype(float)
 
 
-def timezone_at(*, latitude: float, longitude: float) -> datetime.tzinfo:
-    """Find a timezone for the given location, or raise."""
-    tf = TimezoneFinder()
-    tz_name = tf.timezone_at(lat=latitude, lng=longitude)
+@functools.lru_cache()
+def _timezone_finder() -> "TimezoneFinder":
+    # Creating a finder loads its (large) polygon data, hence it is shared.
+    from timezonefinder import TimezoneFinder
+    return TimezoneFinder()
+
+
+#: The number of decimals to which coordinates are rounded when looking up
+#: their timezone (about 10 metres).
+TIMEZONE_COORDINATE_DECIMALS = 4
+
+
+@functools.lru_cache(maxsize=4096)
+def _timezone_name_at(latitude: float, longitude: float) -> typing.Optional[str]:
+    return _timezone_finder().timezone_at(lat=latitude, lng=longitude)
+
+
+def _timezone(tz_name: typing.Optional[str], latitude: float, longitude: float) -> datetime.tzinfo:
     tz = dateutil.tz.gettz(tz_name)
     if tz_name is None or tz is None:
         raise ValueError(
@@ -101,6 +338,64 @@ def timezone_at(*, latitude: float, longitude: float) -> datetime.tzinfo:
     return tz
 
 
+def timezone_at(*, latitude: float, longitude: float) -> datetime.tzinfo:
+    """Find a timezone for the given location, or raise."""
+    tz_name = _timezone_name_at(
+        round(latitude, TIMEZONE_COORDINATE_DECIMALS), round(longitude, TIMEZONE_COORDINATE_DECIMALS),
+    )
+    return _timezone(tz_name, latitude, longitude)
+
+
+def timezones_at(
+        coordinates: typing.Iterable[typing.Tuple[float, float]],
+) -> typing.List[datetime.tzinfo]:
+    """
+    Find the timezones of many ``(latitude, longitude)`` locations, or raise.
+    Each distinct (rounded) location is looked up once only.
+
+    """
+    rounded = [
+        (round(latitude, TIMEZONE_COORDINATE_DECIMALS), round(longitude, TIMEZONE_COORDINATE_DECIMALS))
+        for latitude, longitude in coordinates
+    ]
+    timezones = {
+        location: _timezone(_timezone_name_at(*location), *location)
+        for location in dict.fromkeys(rounded)
+    }
+    return [timezones[location] for location in rounded]
+
+
+@functools.lru_cache(maxsize=4096)
+def timezone_name_and_utc_offset(
+        *, latitude: float, longitude: float, year: int, month: int,
+) -> typing.Tuple[str, float]:
+    """
+    Return the timezone name (e.g. CET) of the given location, and the offset,
+    in hours, that needs to be *added* to UTC to convert to it, on the first
+    of the given month.
+
+    """
+    timezone = timezone_at(latitude=latitude, longitude=longitude)
+    date = datetime.datetime(year, month, 1)
+    name = timezone.tzname(date)
+    assert isinstance(name, str)
+    utc_offset_td = timezone.utcoffset(date)
+    assert isinstance(utc_offset_td, datetime.timedelta)
+    return name, utc_offset_td.total_seconds() / 60 / 60
+
+
+@functools.lru_cache()
+def _wx_station_timezone_names() -> typing.Dict[WxStationIdType, typing.Optional[str]]:
+    index = wx_station_index()
+    return {record[0]: tz_name for record, tz_name in zip(index.records, index.timezones)}
+
+
+def wx_station_timezone(wx_station: WxStationIdType) -> datetime.tzinfo:
+    """Return the timezone of the given weather station (precomputed in the station index), or raise."""
+    _, _, latitude, longitude = wx_station_data()[wx_station]
+    return _timezone(_wx_station_timezone_names()[wx_station], latitude, longitude)
+
+
 def refine_hourly_data(source_times, hourly_data, npts):
     """
     Given times (in hours), where each data point is on the hour,
@@ -138,12 +433,23 @@ def refine_hourly_data(source_times, hourly_data, npts):
     return target_time_boundaries, data
 
 
+def nearest_wx_stations(
+        longitudes: typing.Sequence[float],
+        latitudes: typing.Sequence[float],
+) -> typing.List[WxStationRecordType]:
+    """
+    Given latitudes & longitudes, return the nearest station with valid weather
+    data of each location (in a single query).
+
+    """
+    index = wx_station_index()
+    _, ii = index.kdtree.query(_unit_vectors(longitudes, latitudes))
+    return [index.records[i] for i in ii]
+
+
 def nearest_wx_station(*, longitude: float, latitude: float) -> WxStationRecordType:
     """
     Given a latitude & longitude, return the nearest station with valid weather data.
 
     """
-    ktree = _wx_station_kdtree()
-    station_data = list(wx_station_data().values())
-    dd, ii = ktree.query((longitude, latitude), k=[1])
-    return station_data[ii[0]]
+    return nearest_wx_stations([longitude], [latitude])[0]
@@ -32,12 +32,11 @@ or length N arrays, where N is the number of parameterisations to run; N must be
 the same for all parameters of a single model.
 
 """
+import dataclasses
 from dataclasses import dataclass
 import typing
 
 import numpy as np
-from scipy.interpolate import interp1d
-import scipy.stats as sct
 
 if not typing.TYPE_CHECKING:
     from memoization import cached
@@ -170,6 +169,8 @@ class PiecewiseConstant:
         return SpecificInterval(present_times=tuple(present_times))
 
     def refine(self, refine_factor=10) -> "PiecewiseConstant":
+        from scipy.interpolate import interp1d
+
         # Build a new PiecewiseConstant object with a refined mesh,
         # using a linear interpolation in-between the initial mesh points
         refined_times = np.linspace(self.transition_times[0], self.transition_times[-1],
@@ -334,6 +335,75 @@ class WindowOpening(Ventilation):
         window_area = self.window_height * self.opening_length * self.number_of_windows
         return (3600 / (3 * room.volume)) * self.discharge_coefficient * window_area * root
 
+    def _temperature_factor(self, inside_temp: np.ndarray, outside_temp: np.ndarray) -> np.ndarray:
+        # The factor of the air exchange which depends on the temperatures.
+        inside_temp = np.maximum(inside_temp, outside_temp + self.min_deltaT)
+        return np.sqrt((inside_temp - outside_temp) / outside_temp)
+
+    def compress_outside_temp(self, room: Room, rtol: float) -> "WindowOpening":
+        """
+        Return this window opening with fewer outside temperature steps:
+        adjacent steps are merged as long as the air exchange during each of
+        them changes by at most ``rtol`` (relative).
+
+        Error bound: the air exchange of the window is part of the total
+        removal rate of the virus (or CO2), hence the relative change of the
+        latter is at most ``rtol`` too. The steady state concentration, hence
+        the dose, is inversely proportional to the removal rate, so its
+        relative error is at most ``rtol / (1 - rtol)``, as is that of the
+        infection probability (whose relative sensitivity to the dose is at
+        most 1). The bound holds to first order during transients.
+
+        Only scalar temperatures are supported, otherwise the window opening
+        is returned unchanged.
+
+        """
+        times = np.array(self.outside_temp.transition_times)
+        outside_temps = np.array(self.outside_temp.values)
+        if outside_temps.ndim != 1 or len(outside_temps) < 2:
+            return self
+        inside_temps = np.array([room.inside_temp.value(time) for time in times[1:]])
+        if inside_temps.ndim != 1:
+            return self
+
+        factors = self._temperature_factor(inside_temps, outside_temps)
+        durations = np.diff(times)
+        new_times = [float(times[0])]
+        new_temps = []
+        start = 0
+        while start < len(factors):
+            # Extend the run of steps whilst their (duration weighted) mean
+            # factor stays within the tolerance of each of them.
+            end = start + 1
+            weighted_sum, duration = factors[start] * durations[start], durations[start]
+            f_min = f_max = factors[start]
+            while end < len(factors) and inside_temps[end] == inside_temps[start]:
+                candidate_mean = (weighted_sum + factors[end] * durations[end]) / (duration + durations[end])
+                candidate_min, candidate_max = min(f_min, factors[end]), max(f_max, factors[end])
+                if not (1 - rtol) * candidate_max <= candidate_mean <= (1 + rtol) * candidate_min:
+                    break
+                weighted_sum += factors[end] * durations[end]
+                duration += durations[end]
+                f_min, f_max = candidate_min, candidate_max
+                end += 1
+
+            new_times.append(float(times[end]))
+            if end == start + 1:
+                new_temps.append(float(outside_temps[start]))
+            else:
+                # The outside temperature for which the factor is the mean factor.
+                mean_factor = weighted_sum / duration
+                inside_temp = inside_temps[start]
+                if mean_factor ** 2 >= self.min_deltaT / (inside_temp - self.min_deltaT):
+                    new_temps.append(float(inside_temp / (1 + mean_factor ** 2)))
+                else:
+                    new_temps.append(float(self.min_deltaT / mean_factor ** 2))
+            start = end
+
+        return dataclasses.replace(
+            self, outside_temp=PiecewiseConstant(tuple(new_times), tuple(new_temps)),
+        )
+
 
 @dataclass(frozen=True)
 class SlidingWindow(WindowOpening):
@@ -1000,6 +1070,8 @@ class Cases:
         Probability to meet n_infected persons in an event.
         From https://doi.org/10.1038/s41562-020-01000-9.
         """
+        import scipy.stats as sct
+
         return sct.binom.pmf(n_infected, event_population, self.probability_random_individual(virus))
 
 
@@ -1 +1,11 @@
-from .models import *
+from . import models
+from .models import MCModelBase
+
+__all__ = models.__all__
+
+
+def __getattr__(name):
+    # The MC models are generated on first use (rather than on import).
+    if name in models.__all__:
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
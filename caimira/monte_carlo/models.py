@@ -1,6 +1,7 @@
 import copy
 import dataclasses
 import sys
+import threading
 import typing
 
 import caimira.models
@@ -46,6 +47,34 @@ class MCModelBase(typing.Generic[_ModelType]):
             kwargs[field.name] = self._to_vectorized_form(attr, size)
         return self._base_cls(**kwargs)
 
+    @classmethod
+    def _to_expected_value_form(cls, item):
+        if isinstance(item, SampleableDistribution):
+            return item.expected_value()
+        elif isinstance(item, MCModelBase):
+            return item.build_expected_value_model()
+        elif isinstance(item, tuple):
+            return tuple(cls._to_expected_value_form(sub) for sub in item)
+        else:
+            return item
+
+    def build_expected_value_model(self) -> _ModelType:
+        """
+        Turn this MCModelBase subclass into a (scalar) caimira.model Model
+        instance, in which each distribution is replaced by its expected value.
+
+        The outputs of this model are the expected values of those of the
+        sampled model only where they depend linearly on each of the
+        (independent) distributions, e.g. the CO2 concentration, which is
+        proportional to the exhalation rate.
+
+        """
+        kwargs = {}
+        for field in dataclasses.fields(self._base_cls):
+            attr = getattr(self, field.name)
+            kwargs[field.name] = self._to_expected_value_form(attr)
+        return self._base_cls(**kwargs)
+
 
 def _build_mc_model(model: dataclass_instance) -> typing.Type[MCModelBase[_ModelType]]:
     """
@@ -122,11 +151,22 @@ _MODEL_CLASSES = [
     cls for cls in vars(caimira.models).values()
     if dataclasses.is_dataclass(cls)
 ]
-
-
-# Inject the runtime generated MC types into this module.
-for _model in _MODEL_CLASSES:
-    setattr(sys.modules[__name__], _model.__name__, _build_mc_model(_model))
+_MODEL_CLASSES_BY_NAME = {_model.__name__: _model for _model in _MODEL_CLASSES}
+
+# Generating a class generates its bases and field types first (recursively).
+_build_lock = threading.RLock()
+
+
+def __getattr__(name: str) -> typing.Any:
+    # The MC types are generated at runtime, on first use, and injected into this module.
+    model = _MODEL_CLASSES_BY_NAME.get(name)
+    if model is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _build_lock:
+        module = sys.modules[__name__]
+        if name not in vars(module):
+            setattr(module, name, _build_mc_model(model))
+    return vars(module)[name]
 
 
 # Make sure that each of the models is imported if you do a ``import *``.
@@ -1,7 +1,6 @@
 import typing
 
 import numpy as np
-from sklearn.neighbors import KernelDensity # type: ignore
 
 import caimira.models
 
@@ -14,6 +13,10 @@ class SampleableDistribution:
     def generate_samples(self, size: int) -> float_array_size_n:
         raise NotImplementedError()
 
+    def expected_value(self) -> float:
+        """The expected value (mean) of the distribution."""
+        raise NotImplementedError()
+
 
 class Normal(SampleableDistribution):
     """
@@ -26,6 +29,9 @@ class Normal(SampleableDistribution):
     def generate_samples(self, size: int) -> float_array_size_n:
         return np.random.normal(self.mean, self.standard_deviation, size=size)
 
+    def expected_value(self) -> float:
+        return self.mean
+
 
 class Uniform(SampleableDistribution):
     """
@@ -38,6 +44,9 @@ class Uniform(SampleableDistribution):
     def generate_samples(self, size: int) -> float_array_size_n:
         return np.random.uniform(self.low, self.high, size=size)
 
+    def expected_value(self) -> float:
+        return (self.low + self.high) / 2
+
 
 class LogNormal(SampleableDistribution):
     """
@@ -56,6 +65,9 @@ class LogNormal(SampleableDistribution):
                                    self.standard_deviation_gaussian,
                                    size=size)
 
+    def expected_value(self) -> float:
+        return float(np.exp(self.mean_gaussian + self.standard_deviation_gaussian ** 2 / 2))
+
 
 class Custom(SampleableDistribution):
     """
@@ -126,6 +138,8 @@ class CustomKernel(SampleableDistribution):
         self.kernel_bandwidth = kernel_bandwidth
 
     def generate_samples(self, size: int) -> float_array_size_n:
+        from sklearn.neighbors import KernelDensity # type: ignore
+
         kde_model = KernelDensity(kernel='gaussian',
                                   bandwidth=self.kernel_bandwidth)
         kde_model.fit(self.variable.reshape(-1, 1),
@@ -150,6 +164,8 @@ class LogCustomKernel(SampleableDistribution):
         self.kernel_bandwidth = kernel_bandwidth
 
     def generate_samples(self, size: int) -> float_array_size_n:
+        from sklearn.neighbors import KernelDensity # type: ignore
+
         kde_model = KernelDensity(kernel='gaussian',
                                   bandwidth=self.kernel_bandwidth)
         kde_model.fit(self.log_variable.reshape(-1, 1),
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import tornado.testing
+import tornado.web
+
+from caimira.apps.calculator.arve import ArveClient
+
+
+class StandInArve:
+    """A local stand-in for the token endpoint and the sensor API of ARVE."""
+    def __init__(self):
+        self.token_requests = 0
+        self.api_requests = 0
+        self.expires_in = 3600
+        self.revoked_tokens = set()
+
+    def app(self) -> tornado.web.Application:
+        arve = self
+
+        class Token(tornado.web.RequestHandler):
+            def post(self):
+                assert self.request.headers['Authorization'].startswith('Basic ')
+                arve.token_requests += 1
+                self.finish({'access_token': f'token-{arve.token_requests}', 'expires_in': arve.expires_in})
+
+        class SensorData(tornado.web.RequestHandler):
+            async def get(self, hotel_id, floor_id):
+                token = self.request.headers['Authorization'][len('Bearer '):]
+                if token in arve.revoked_tokens:
+                    raise tornado.web.HTTPError(401)
+                arve.api_requests += 1
+                # Slow enough for concurrent requests to overlap.
+                await asyncio.sleep(0.05)
+                self.finish({'hotel': hotel_id, 'floor': floor_id, 'request': arve.api_requests})
+
+        return tornado.web.Application([
+            (r'/oauth2/token', Token),
+            (r'/v1/(.*)/(.*)', SensorData),
+        ])
+
+
+class TestArveClient(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        self.arve = StandInArve()
+        return self.arve.app()
+
+    def client(self, **kwargs) -> ArveClient:
+        return ArveClient(
+            'client-id', 'client-secret', 'api-key',
+            token_url=self.get_url('/oauth2/token'),
+            api_url=self.get_url('/v1'),
+            **kwargs,
+        )
+
+    @tornado.testing.gen_test
+    def test_cached_response(self):
+        client = self.client()
+        first = yield client.sensor_data('hotel', 'floor')
+        second = yield client.sensor_data('hotel', 'floor')
+        assert first == second
+        assert json.loads(first)['floor'] == 'floor'
+        assert (self.arve.token_requests, self.arve.api_requests) == (1, 1)
+
+        # Another floor is another response, with the same token.
+        yield client.sensor_data('hotel', 'other-floor')
+        assert (self.arve.token_requests, self.arve.api_requests) == (1, 2)
+
+    @tornado.testing.gen_test
+    def test_single_flight(self):
+        client = self.client()
+        responses = yield [client.sensor_data('hotel', 'floor') for _ in range(5)]
+        assert len(set(responses)) == 1
+        assert (self.arve.token_requests, self.arve.api_requests) == (1, 1)
+
+    @tornado.testing.gen_test
+    def test_expired_response(self):
+        client = self.client(response_ttl=0)
+        yield client.sensor_data('hotel', 'floor')
+        yield client.sensor_data('hotel', 'floor')
+        assert (self.arve.token_requests, self.arve.api_requests) == (1, 2)
+
+    @tornado.testing.gen_test
+    def test_token_refreshed_before_expiry(self):
+        self.arve.expires_in = 30
+        client = self.client(response_ttl=0, token_refresh_margin=60)
+        yield client.sensor_data('hotel', 'floor')
+        yield client.sensor_data('hotel', 'floor')
+        assert self.arve.token_requests == 2
+
+    @tornado.testing.gen_test
+    def test_revoked_token(self):
+        client = self.client(response_ttl=0)
+        yield client.sensor_data('hotel', 'floor')
+        self.arve.revoked_tokens.add('token-1')
+        yield client.sensor_data('hotel', 'floor')
+        assert (self.arve.token_requests, self.arve.api_requests) == (2, 2)
@@ -0,0 +1,106 @@
+import datetime
+import json
+
+import pytest
+
+import caimira.apps.calculator
+from caimira.apps.calculator import cases_data
+
+TODAY = datetime.date(2023, 3, 10)
+
+
+def _cases_csv() -> bytes:
+    # A small extract of the WHO data, with a country whose data is not up to date
+    # (FR, zero cases reported) and a country code read as "missing" by default (NA).
+    lines = ['Date_reported,Country_code,Country,WHO_region,New_cases,Cumulative_cases,New_deaths,Cumulative_deaths']
+    for day in range(1, 11):
+        date = f'2023-03-{day:02}'
+        lines.append(f'{date},CH,Switzerland,EURO,{100 + day},0,0,0')
+        lines.append(f'{date},FR,France,EURO,{0 if day == 8 else 1000},0,0,0')
+        lines.append(f'{date},NA,Namibia,AFRO,{10 if day > 2 else ""},0,0,0')
+    return '\n'.join(lines).encode()
+
+
+def _countries_json() -> bytes:
+    return json.dumps([
+        {'cca2': 'CH', 'cca3': 'CHE', 'name': {'common': 'Switzerland'}},
+        {'cca2': 'FR', 'cca3': 'FRA', 'name': {'common': 'France'}},
+        {'cca2': 'NA', 'cca3': 'NAM', 'name': {'common': 'Namibia'}},
+    ]).encode()
+
+
+class FixtureFetcher:
+    def __init__(self):
+        self.fail = False
+        self.calls = 0
+
+    async def __call__(self, url: str) -> bytes:
+        self.calls += 1
+        if self.fail:
+            raise IOError('The service is unavailable')
+        return _cases_csv() if url == cases_data.WHO_CASES_URL else _countries_json()
+
+
+@pytest.fixture
+def fetcher():
+    return FixtureFetcher()
+
+
+@pytest.fixture
+def app(fetcher):
+    app = caimira.apps.calculator.make_app()
+    app.settings['cases_data'] = cases_data.CasesDataIndex(fetch=fetcher, today=lambda: TODAY)
+    yield app
+    app.settings['cases_data'].stop()
+
+
+def test_rolling_average_cases():
+    averages, codes_by_name = cases_data.rolling_average_cases(_cases_csv(), TODAY)
+    # The 8 days from the 3rd to the 10th of March (inclusive).
+    assert averages == {'CH': round(sum(range(103, 111)) / 8), 'FR': None, 'NA': 10}
+    assert codes_by_name == {'switzerland': 'CH', 'france': 'FR', 'namibia': 'NA'}
+
+
+async def test_cases_endpoint(http_server_client, fetcher):
+    for country in ['CHE', 'CH', 'switzerland']:
+        response = await http_server_client.fetch(f'/calculator/cases/{country}')
+        assert response.body.decode() == str(round(sum(range(103, 111)) / 8))
+
+    response = await http_server_client.fetch('/calculator/cases/FRA')
+    assert response.body.decode() == ''
+    response = await http_server_client.fetch('/calculator/cases/XYZ')
+    assert response.body.decode() == ''
+
+    # The data was fetched once only, for all the requests.
+    assert fetcher.calls == 2
+
+
+async def test_stale_data_on_failure(fetcher):
+    index = cases_data.CasesDataIndex(fetch=fetcher, today=lambda: TODAY)
+    await index.refresh()
+    last_refresh = index.last_refresh
+
+    fetcher.fail = True
+    await index.refresh()
+    assert index.lookup('NAM') == 10
+    assert index.last_refresh == last_refresh
+
+
+async def test_failure_backoff(fetcher):
+    index = cases_data.CasesDataIndex(fetch=fetcher, today=lambda: TODAY, retry_interval=60)
+    fetcher.fail = True
+    await index.ensure_started()
+    index.stop()
+    assert index.lookup('CH') is None
+    calls = fetcher.calls
+
+    # The data is unavailable without being fetched again, until the retry interval has elapsed.
+    fetcher.fail = False
+    await index.ensure_started()
+    assert index.lookup('CH') is None
+    assert fetcher.calls == calls
+
+    index.last_failure -= 61
+    await index.ensure_started()
+    index.stop()
+    assert index.lookup('CH') == round(sum(range(103, 111)) / 8)
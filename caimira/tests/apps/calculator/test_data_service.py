@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import json
+import time
+
+import tornado.testing
+import tornado.web
+
+from caimira.apps.calculator.data_service import DataService
+
+
+def _jwt(claims: dict) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.signature"
+
+
+class StandInDataService:
+    """A local stand-in for the login and data endpoints of the CAiMIRA Data Service."""
+    def __init__(self):
+        self.logins = 0
+        self.data_requests = 0
+        self.expires_in = 3600
+        self.fail = False
+
+    def app(self) -> tornado.web.Application:
+        service = self
+
+        class Login(tornado.web.RequestHandler):
+            def post(self):
+                assert json.loads(self.request.body)['email'] == 'test@example.com'
+                service.logins += 1
+                token = _jwt({'sub': 'test', 'exp': int(time.time()) + service.expires_in})
+                self.finish({'access_token': token})
+
+        class Data(tornado.web.RequestHandler):
+            async def get(self):
+                assert self.request.headers['Authorization'].startswith('Bearer ')
+                if service.fail:
+                    raise tornado.web.HTTPError(503)
+                service.data_requests += 1
+                # Slow enough for concurrent requests to overlap.
+                await asyncio.sleep(0.05)
+                self.finish({'data': service.data_requests})
+
+        return tornado.web.Application([
+            (r'/login', Login),
+            (r'/data', Data),
+        ])
+
+
+class TestDataService(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        self.service = StandInDataService()
+        return self.service.app()
+
+    def data_service(self, **kwargs) -> DataService:
+        data_service = DataService(
+            {'data_service_client_email': 'test@example.com', 'data_service_client_password': 'password'},
+            host=self.get_url(''),
+            **kwargs,
+        )
+        self.addCleanup(data_service.stop)
+        return data_service
+
+    def test_token_validity(self):
+        data_service = self.data_service(token_expiry_margin=30)
+        assert data_service._is_valid(_jwt({'exp': time.time() + 60}))
+        assert not data_service._is_valid(_jwt({'exp': time.time() + 10}))
+        assert not data_service._is_valid(_jwt({'sub': 'no expiry'}))
+        assert not data_service._is_valid('not a token')
+        assert not data_service._is_valid(None)
+
+    @tornado.testing.gen_test
+    def test_cached_data(self):
+        data_service = self.data_service()
+        first = yield data_service.fetch()
+        second = yield data_service.fetch()
+        assert first == second == {'data': 1}
+        assert (self.service.logins, self.service.data_requests) == (1, 1)
+
+    @tornado.testing.gen_test
+    def test_token_reused(self):
+        data_service = self.data_service(cache_ttl=0)
+        yield data_service.refresh()
+        yield data_service.refresh()
+        assert (self.service.logins, self.service.data_requests) == (1, 2)
+
+        # A token about to expire is renewed.
+        self.service.expires_in = 10
+        data_service._access_token = None
+        yield data_service.refresh()
+        yield data_service.refresh()
+        assert self.service.logins == 3
+
+    @tornado.testing.gen_test
+    def test_single_flight(self):
+        data_service = self.data_service()
+        responses = yield [data_service.fetch() for _ in range(5)]
+        assert all(response == {'data': 1} for response in responses)
+        assert self.service.data_requests == 1
+
+    @tornado.testing.gen_test
+    def test_stale_while_revalidate(self):
+        data_service = self.data_service(cache_ttl=0)
+        assert (yield data_service.fetch()) == {'data': 1}
+        # The stale data is returned straight away, and refreshed in the background.
+        assert (yield data_service.fetch()) == {'data': 1}
+        yield data_service._refreshing
+        assert (yield data_service.fetch()) == {'data': 2}
+
+    @tornado.testing.gen_test
+    def test_stale_data_on_failure(self):
+        data_service = self.data_service(cache_ttl=0)
+        yield data_service.fetch()
+        self.service.fail = True
+        yield data_service._background_refresh()
+        assert (yield data_service.fetch()) == {'data': 1}
+
+    @tornado.testing.gen_test
+    def test_failed_stale_while_revalidate(self):
+        data_service = self.data_service(cache_ttl=0)
+        yield data_service.fetch()
+        self.service.fail = True
+        # The failure of the refresh in the background is logged.
+        with self.assertLogs('caimira.apps.calculator.data_service', 'ERROR'):
+            assert (yield data_service.fetch()) == {'data': 1}
+            yield asyncio.wait([data_service._refreshing])
+            yield asyncio.sleep(0)
+
+    @tornado.testing.gen_test
+    def test_too_stale(self):
+        data_service = self.data_service(cache_ttl=0, max_staleness=0)
+        assert (yield data_service.fetch()) == {'data': 1}
+        assert (yield data_service.fetch()) == {'data': 2}
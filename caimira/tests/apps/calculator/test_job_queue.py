@@ -0,0 +1,153 @@
+import asyncio
+import concurrent.futures
+import functools
+import json
+import threading
+
+import pytest
+import tornado.testing
+
+import caimira.apps.calculator
+from caimira.apps.calculator import metrics, model_generator
+from caimira.apps.calculator.job_queue import JobQueue, QueueFullError
+
+_TIMEOUT = 40.
+
+
+@pytest.fixture
+def thread_executor():
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        yield executor
+
+
+async def test_job_result(thread_executor):
+    job_queue = JobQueue(executor_factory=lambda: thread_executor)
+    job = job_queue.submit(pow, 2, 10)
+    assert job_queue.get(job.job_id) is job
+
+    await job.wait(5)
+    assert job.status == 'done'
+    assert job.future.result() == 1024
+    assert job.started is not None and job.finished >= job.started
+
+    stats = job_queue.stats()
+    assert stats['depth'] == 0
+    assert stats['accepted'] == 1
+    assert stats['wait_time_max'] >= 0
+
+
+def staged_pow(base, exponent):
+    with metrics.stage_timer('job_stage'):
+        return pow(base, exponent)
+
+
+async def test_job_metrics(thread_executor):
+    # The metrics recorded by the jobs are merged once they are completed.
+    job_queue = JobQueue(executor_factory=lambda: thread_executor)
+    count = (metrics.REGISTRY.get_sample_value('caimira_report_stage_duration_seconds_count', {'stage': 'job_stage'}) or 0)
+    job = job_queue.submit(staged_pow, 2, 10)
+    await job.wait(5)
+    assert job.future.result() == 1024
+    assert (metrics.REGISTRY.get_sample_value('caimira_report_stage_duration_seconds_count', {'stage': 'job_stage'}) or 0) == count + 1
+
+
+async def test_job_failure(thread_executor):
+    job_queue = JobQueue(executor_factory=lambda: thread_executor)
+    job = job_queue.submit(int, 'not a number')
+    await job.wait(5)
+    assert job.status == 'failed'
+    assert isinstance(job.future.exception(), ValueError)
+
+
+async def test_job_cancelled():
+    executor = concurrent.futures.ThreadPoolExecutor(1)
+    release = threading.Event()
+    job_queue = JobQueue(executor_factory=lambda: executor)
+    blocker = job_queue.submit(release.wait, 5)
+    job = job_queue.submit(pow, 2, 10)
+    # The pending job is cancelled, e.g. as its executor is shut down.
+    executor.shutdown(wait=False, cancel_futures=True)
+    release.set()
+    await job.wait(5)
+    assert job.status == 'failed'
+    assert isinstance(job.future.exception(), RuntimeError)
+    await blocker.wait(5)
+    assert blocker.status == 'done'
+
+
+async def test_queue_full(thread_executor):
+    job_queue = JobQueue(executor_factory=lambda: thread_executor, max_depth=2)
+    release = threading.Event()
+    jobs = [job_queue.submit(release.wait, 5) for _ in range(2)]
+
+    with pytest.raises(QueueFullError) as err:
+        job_queue.submit(release.wait, 5)
+    assert 1 <= err.value.retry_after <= 60
+    assert job_queue.stats()['rejected'] == 1
+
+    release.set()
+    await asyncio.gather(*(job.wait(5) for job in jobs))
+    assert job_queue.depth == 0
+    job_queue.submit(release.wait, 5)
+
+
+async def test_job_expiry(thread_executor):
+    job_queue = JobQueue(executor_factory=lambda: thread_executor, result_ttl=0)
+    job = job_queue.submit(pow, 2, 10)
+    await job.wait(5)
+    await asyncio.sleep(0.01)
+    assert job_queue.get(job.job_id) is None
+
+
+class TestReportJobs(tornado.testing.AsyncHTTPTestCase):
+    def setUp(self):
+        super().setUp()
+        self.http_client.defaults['request_timeout'] = _TIMEOUT
+
+    def get_app(self):
+        return caimira.apps.calculator.make_app()
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_job_lifecycle(self):
+        response = yield self.http_client.fetch(
+            request=self.get_url("/calculator/report-json/jobs"),
+            method="POST",
+            headers={'content-type': 'application/json'},
+            body=json.dumps(model_generator.baseline_raw_form_data()),
+        )
+        self.assertEqual(response.code, 202)
+        job_id = json.loads(response.body)['job_id']
+        self.assertTrue(response.headers['Location'].endswith(job_id))
+
+        response = yield self.http_client.fetch(
+            self.get_url(f"/calculator/report-json/jobs/{job_id}?wait={_TIMEOUT - 5}"),
+        )
+        data = json.loads(response.body)
+        self.assertEqual(data['status'], 'done')
+        self.assertIsInstance(data['report_data']['prob_inf'], float)
+
+        response = yield self.http_client.fetch(self.get_url("/calculator/report-json/jobs"))
+        self.assertEqual(json.loads(response.body)['accepted'], 1)
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_unknown_job(self):
+        response = yield self.http_client.fetch(
+            self.get_url("/calculator/report-json/jobs/0123abcd"), raise_error=False,
+        )
+        self.assertEqual(response.code, 404)
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_queue_full(self):
+        self._app.settings['job_queue'] = JobQueue(
+            executor_factory=functools.partial(concurrent.futures.ThreadPoolExecutor, 1),
+            max_depth=0,
+        )
+        response = yield self.http_client.fetch(
+            request=self.get_url("/calculator/report-json/jobs"),
+            method="POST",
+            headers={'content-type': 'application/json'},
+            body=json.dumps(model_generator.baseline_raw_form_data()),
+            raise_error=False,
+        )
+        self.assertEqual(response.code, 503)
+        self.assertIn('Retry-After', response.headers)
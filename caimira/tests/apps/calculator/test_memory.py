@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from caimira.apps.calculator import memory, metrics
+
+requires_rss = pytest.mark.skipif(memory.current_rss() is None, reason="The resident memory is not known")
+
+
+@requires_rss
+def test_guard_limit():
+    guard = memory.MemoryGuard(limit=256, baseline=memory.current_rss())
+    with metrics.observe_stages(guard):
+        with metrics.stage_timer('small_stage'):
+            np.ones(1024)
+
+        with pytest.raises(memory.MemoryLimitExceeded, match='at the large_stage stage'):
+            with metrics.stage_timer('large_stage'):
+                data = np.ones(512 * 1024 * 1024 // 8)
+                data[:] = 2.
+
+
+@requires_rss
+def test_guarded_call_limits_the_increase():
+    # The memory held by the process before the task does not count towards its limit.
+    held = np.ones(128 * 1024 * 1024 // 8)
+
+    def task():
+        with metrics.stage_timer('small_stage'):
+            return np.ones(1024).sum()
+
+    assert memory.current_rss() > 64
+    assert memory.guarded_call(64, False, task) == 1024
+    del held
+
+
+@requires_rss
+def test_guarded_call_accounting():
+    def task():
+        with metrics.stage_timer('allocating_stage'):
+            np.ones(64 * 1024 * 1024 // 8)
+        return 'result'
+
+    result, task_metrics = metrics.collect(memory.guarded_call, None, True, task)
+    assert result == 'result'
+    assert task_metrics.peak_rss >= 64
+    [(stage, peak)] = task_metrics.stage_memory
+    assert stage == 'allocating_stage'
+    assert 64 <= peak < 128
+
+    metrics.merge(task_metrics)
+    assert (metrics.REGISTRY.get_sample_value('caimira_report_stage_memory_mib_count', {'stage': 'allocating_stage'}) or 0) == 1
+
+
+def test_sample_size_fallback():
+    sample_sizes = []
+
+    def report(name, sample_size):
+        sample_sizes.append(sample_size)
+        if sample_size > memory.DEFAULT_MC_SAMPLE_SIZE // 4:
+            raise memory.MemoryLimitExceeded('too large')
+        return name, sample_size
+
+    result, task_metrics = metrics.collect(memory.call_with_sample_size_fallback, report, 'report')
+    assert result == ('report', memory.DEFAULT_MC_SAMPLE_SIZE // 4)
+    assert sample_sizes == [memory.DEFAULT_MC_SAMPLE_SIZE // 2 ** n for n in range(3)]
+    assert task_metrics.counts == {'memory_degraded_reports': 2}
+
+
+def test_sample_size_fallback_exhausted():
+    sample_sizes = []
+
+    def report(sample_size):
+        sample_sizes.append(sample_size)
+        raise MemoryError()
+
+    with pytest.raises(memory.MemoryLimitExceeded, match='more memory than is available'):
+        memory.call_with_sample_size_fallback(report)
+    assert sample_sizes[-1] == memory.MIN_DEGRADED_SAMPLE_SIZE
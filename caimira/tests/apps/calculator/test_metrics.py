@@ -0,0 +1,105 @@
+import contextlib
+import json
+import pickle
+
+import pytest
+import tornado.testing
+
+import caimira.apps.calculator
+from caimira.apps.calculator import metrics, model_generator
+
+
+def sample_value(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_collect_and_merge():
+    def task():
+        with metrics.stage_timer('test_stage'):
+            metrics.record_count('mc_samples', 10)
+            metrics.record_cache_lookup('test_cache', hit=True)
+            metrics.record_cache_lookup('test_cache', hit=False)
+        return 'result'
+
+    samples = sample_value('caimira_mc_samples_total')
+    result, task_metrics = metrics.collect(task)
+    assert result == 'result'
+    assert [stage for stage, _ in task_metrics.stages] == ['test_stage']
+    assert task_metrics.cache_lookups == {'test_cache': [1, 1]}
+    # Nothing is recorded until the metrics are merged.
+    assert sample_value('caimira_report_stage_duration_seconds_count', stage='test_stage') == 0
+
+    metrics.merge(task_metrics)
+    assert sample_value('caimira_report_stage_duration_seconds_count', stage='test_stage') == 1
+    assert sample_value('caimira_mc_samples_total') == samples + 10
+    assert sample_value('caimira_cache_lookups_total', cache='test_cache', result='hit') == 1
+
+
+def test_collect_failure():
+    def task():
+        with metrics.stage_timer('failed_task_stage'):
+            metrics.record_count('mc_samples', 10)
+        raise ValueError('failed')
+
+    with pytest.raises(ValueError) as exc_info:
+        metrics.collect(task)
+    # The metrics of the failed call are pickled with its exception.
+    error = pickle.loads(pickle.dumps(exc_info.value))
+    task_metrics = metrics.error_metrics(error)
+    assert [stage for stage, _ in task_metrics.stages] == ['failed_task_stage']
+    assert task_metrics.counts == {'mc_samples': 10}
+
+    metrics.merge_error(error)
+    assert sample_value('caimira_report_stage_duration_seconds_count', stage='failed_task_stage') == 1
+    # Other exceptions carry no metrics.
+    metrics.merge_error(ValueError())
+
+
+def test_observe_stages():
+    events = []
+
+    @contextlib.contextmanager
+    def observer(stage):
+        events.append(('enter', stage))
+        try:
+            yield
+        finally:
+            events.append(('exit', stage))
+
+    with metrics.observe_stages(observer):
+        with pytest.raises(ValueError):
+            with metrics.stage_timer('failing_stage'):
+                raise ValueError()
+        with metrics.stage_timer('test_stage'):
+            events.append(('run', 'test_stage'))
+    with metrics.stage_timer('unobserved_stage'):
+        pass
+
+    assert events == [
+        ('enter', 'failing_stage'), ('exit', 'failing_stage'),
+        ('enter', 'test_stage'), ('run', 'test_stage'), ('exit', 'test_stage'),
+    ]
+    assert sample_value('caimira_report_stage_duration_seconds_count', stage='failing_stage') == 1
+
+
+class TestMetricsEndpoint(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return caimira.apps.calculator.make_app()
+
+    @tornado.testing.gen_test(timeout=40)
+    def test_metrics(self):
+        yield self.http_client.fetch(
+            request=self.get_url("/calculator/report-json"),
+            method="POST",
+            headers={'content-type': 'application/json'},
+            body=json.dumps(model_generator.baseline_raw_form_data()),
+            request_timeout=40,
+        )
+        response = yield self.http_client.fetch(self.get_url('/metrics'))
+        self.assertEqual(response.code, 200)
+        body = response.body.decode()
+        assert 'caimira_http_requests_total{code="200",handler="ConcentrationModelJsonResponse",method="POST"}' in body
+        for stage in ['from_dict', 'build_model', 'calculate_report_data']:
+            assert f'caimira_report_stage_duration_seconds_count{{stage="{stage}"}}' in body
+        assert 'caimira_mc_samples_total' in body
+        assert 'caimira_job_queue_depth 0' in body
@@ -74,6 +74,85 @@ def test_ventilation_slidingwindow(baseline_form: model_generator.FormData):
     assert ventilation == baseline_vent
 
 
+def test_outside_temp_shared(baseline_form_data, monkeypatch):
+    monkeypatch.setattr(model_generator, 'OUTSIDE_TEMP_RTOL', 0.01)
+    forms = [model_generator.FormData.from_dict(baseline_form_data) for _ in range(2)]
+    forms[1].window_height = 2.
+
+    # The (compressed) profiles are the same instances, whatever the window.
+    assert forms[0].outside_temp() is forms[1].outside_temp()
+    windows = [form.ventilation().ventilations[0] for form in forms]
+    assert windows[0].outside_temp is windows[1].outside_temp
+    assert len(windows[0].outside_temp.values) < len(forms[0].outside_temp().values)
+
+    # A different month is another profile.
+    forms[1].event_month = 'July'
+    assert forms[0].outside_temp() is not forms[1].outside_temp()
+    assert model_generator.outside_temp_profile.cache_info().maxsize == model_generator.OUTSIDE_TEMP_CACHE_SIZE
+
+
+def test_shared_components(baseline_form: model_generator.FormData):
+    with_mask = dataclasses.replace(baseline_form, mask_wearing_option='mask_on')
+    no_vent = dataclasses.replace(baseline_form, ventilation_type='no_ventilation')
+
+    # Outside of the context, each form builds its own components.
+    assert baseline_form.ventilation() is not with_mask.ventilation()
+
+    with model_generator.shared_components():
+        assert baseline_form.initialize_room() is no_vent.initialize_room()
+        assert baseline_form.ventilation() is with_mask.ventilation()
+        assert baseline_form.ventilation() is not no_vent.ventilation()
+        assert baseline_form.exposed_present_interval() is with_mask.exposed_present_interval()
+        assert baseline_form.exposed_population() is no_vent.exposed_population()
+        assert baseline_form.exposed_population() is not with_mask.exposed_population()
+        with model_generator.shared_components():
+            assert baseline_form.infected_population() is no_vent.infected_population()
+
+        model = with_mask.build_mc_model()
+        assert model.concentration_model.ventilation is baseline_form.ventilation()
+
+    assert baseline_form.ventilation() is not with_mask.ventilation()
+
+
+def test_outside_temp_compression(baseline_form: model_generator.FormData, monkeypatch):
+    # The outside temperature steps are only merged on request, as this changes the results.
+    assert baseline_form.ventilation().ventilations[0].outside_temp is baseline_form.outside_temp()
+
+    monkeypatch.setattr(model_generator, 'OUTSIDE_TEMP_RTOL', 0.01)
+    compressed = baseline_form.ventilation().ventilations[0].outside_temp
+    assert len(compressed.transition_times) < len(baseline_form.outside_temp().transition_times)
+
+
+def test_shared_components_fields():
+    field_names = {field.name for field in dataclasses.fields(model_generator.FormData)}
+    for fields in [
+        model_generator._VENTILATION_FIELDS,
+        model_generator._INFECTED_POPULATION_FIELDS,
+        model_generator._EXPOSED_POPULATION_FIELDS,
+    ]:
+        assert set(fields) <= field_names
+
+
+@pytest.mark.parametrize("activity_type", ['office', 'gym', 'smallmeeting', 'precise'])
+def test_expected_CO2_model(baseline_form: model_generator.FormData, activity_type):
+    baseline_form.activity_type = activity_type
+    baseline_form.precise_activity = {
+        'physical_activity': 'Moderate activity',
+        'respiratory_activity': [{'type': 'Breathing', 'percentage': 100}],
+    }
+    expected_model = baseline_form.build_expected_CO2_model()
+    sampled_model = baseline_form.build_CO2_model(sample_size=200_000)
+
+    assert expected_model.CO2_emitters.number == sampled_model.CO2_emitters.number
+    assert np.isscalar(expected_model.CO2_emitters.activity.exhalation_rate)
+    times = np.linspace(baseline_form.exposed_start / 60, baseline_form.exposed_finish / 60, 20)
+    npt.assert_allclose(
+        np.array([expected_model.concentration(t) for t in times]),
+        np.array([np.mean(sampled_model.concentration(t)) for t in times]),
+        rtol=1e-3,
+    )
+
+
 def test_ventilation_hingedwindow(baseline_form: model_generator.FormData):
     baseline_form.ventilation_type = 'natural_ventilation'
     baseline_form.windows_duration = 10
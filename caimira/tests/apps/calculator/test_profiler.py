@@ -0,0 +1,96 @@
+import json
+import time
+
+import tornado.testing
+
+import caimira.apps.calculator
+from caimira.apps.calculator import model_generator, profiler
+
+_TIMEOUT = 60.
+
+_SECRET = 'a-profiling-secret'
+
+
+def _busy_function(duration: float) -> str:
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+    return 'result'
+
+
+def test_profiled_call():
+    result, profile = profiler.profiled_call('request-1', 0.001, _busy_function, 0.2)
+    assert result == 'result'
+    assert profile.request_id == 'request-1'
+    assert profile.sample_count > 10
+
+    [top_function, *_] = profile.top_functions()
+    assert top_function['function'].startswith('_busy_function (calculator/test_profiler.py:')
+    assert top_function['self'] > 0.5
+    assert top_function['total'] >= top_function['self']
+
+    for line in profile.collapsed().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert stack.split(';')[-1] in {function['function'] for function in profile.top_functions(limit=100)}
+
+
+def test_verify():
+    signature = profiler.sign(_SECRET, 'request-1')
+    assert profiler.verify(_SECRET, f'request-1:{signature}') == 'request-1'
+    assert profiler.verify(_SECRET, f'request-2:{signature}') is None
+    assert profiler.verify('another-secret', f'request-1:{signature}') is None
+    assert profiler.verify(None, f'request-1:{signature}') is None
+    assert profiler.verify(_SECRET, 'request-1') is None
+
+
+def test_profile_store():
+    store = profiler.ProfileStore(max_size=2)
+    for request_id in ['a', 'b', 'c']:
+        store.add(profiler.Profile(request_id, duration=1., interval=0.1, stacks={('f',): 10}))
+    assert store.get('a') is None
+    assert store.get('c').top_functions() == [{'function': 'f', 'self': 1., 'total': 1.}]
+
+
+class TestProfiledRequest(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        app = caimira.apps.calculator.make_app()
+        app.settings['profiling_secret'] = _SECRET
+        return app
+
+    def post_report_json(self, headers=None):
+        return self.http_client.fetch(
+            request=self.get_url("/calculator/report-json"),
+            method="POST",
+            headers={'content-type': 'application/json', **(headers or {})},
+            body=json.dumps(model_generator.baseline_raw_form_data()),
+            request_timeout=_TIMEOUT,
+        )
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_profiled_request(self):
+        header = {'X-Caimira-Profile': f'request-1:{profiler.sign(_SECRET, "request-1")}'}
+        response = yield self.post_report_json(header)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['X-Caimira-Profile-Id'], 'request-1')
+
+        response = yield self.http_client.fetch(self.get_url('/calculator/profiles/request-1'), headers=header)
+        summary = json.loads(response.body)
+        assert summary['samples'] > 0
+        assert summary['top_functions']
+
+        response = yield self.http_client.fetch(
+            self.get_url('/calculator/profiles/request-1.collapsed'), headers=header,
+        )
+        assert response.headers['Content-Type'].startswith('text/plain')
+        assert 'calculate_report_data' in response.body.decode()
+
+        # The profile is only served to authorized requests.
+        response = yield self.http_client.fetch(self.get_url('/calculator/profiles/request-1'), raise_error=False)
+        self.assertEqual(response.code, 404)
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_unsigned_request(self):
+        response = yield self.post_report_json({'X-Caimira-Profile': 'request-2:invalid'})
+        self.assertEqual(response.code, 200)
+        assert 'X-Caimira-Profile-Id' not in response.headers
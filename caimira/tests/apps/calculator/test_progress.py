@@ -0,0 +1,52 @@
+import asyncio
+import json
+import pickle
+
+import pytest
+
+from caimira.apps.calculator.progress import ProgressChannel, call_with_progress
+
+
+def report(name, progress_callback, sample_size):
+    progress_callback('headline', {'prob_inf': 1.5})
+    progress_callback('report_data', {'sample_size': sample_size})
+    return f'report of {name}'
+
+
+async def test_progress_stream():
+    channel = ProgressChannel()
+    await channel.ensure_started()
+    try:
+        with channel.stream() as (sender, stages), channel.stream() as (other_sender, other_stages):
+            # The sender is computed by a worker process in practice.
+            sender = pickle.loads(pickle.dumps(sender))
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: call_with_progress(sender, report, 'baseline', sample_size=100),
+            )
+            assert result == ('report of baseline', 2)
+
+            received = [await asyncio.wait_for(stages.get(), 5) for _ in range(2)]
+            assert [stage for stage, _ in received] == ['headline', 'report_data']
+            assert json.loads(received[1][1]) == {'sample_size': 100}
+            assert other_stages.empty()
+    finally:
+        channel.stop()
+
+
+async def test_progress_stream_closed():
+    channel = ProgressChannel()
+    with pytest.raises(RuntimeError):
+        with channel.stream():
+            pass
+
+    await channel.ensure_started()
+    try:
+        with channel.stream() as (sender, stages):
+            pass
+        # The stages sent to a closed stream are dropped.
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: call_with_progress(sender, report, 'baseline', sample_size=100),
+        )
+        assert stages.empty()
+    finally:
+        channel.stop()
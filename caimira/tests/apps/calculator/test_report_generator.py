@@ -1,12 +1,19 @@
+import base64
 import concurrent.futures
 from functools import partial
+import os
+import pickle
 import time
+import zlib
+
+import jinja2
+from loky.backend.reduction import cloudpickle
 
 import numpy.testing
 import numpy as np
 import pytest
 
-from caimira.apps.calculator import make_app
+from caimira.apps.calculator import make_app, model_generator
 from caimira.apps.calculator.report_generator import ReportGenerator, readable_minutes
 import caimira.apps.calculator.report_generator as rep_gen
 
@@ -27,6 +34,79 @@ def test_generate_report(baseline_form) -> None:
     end = time.perf_counter()
     assert report != ""
     assert end - start < time_limit
+    assert 'id="reduced_sample_size"' not in report
+
+
+def test_generate_report_reduced_sample_size(baseline_form) -> None:
+    # A report computed with fewer samples to fit in the memory is flagged.
+    sample_size = model_generator.DEFAULT_MC_SAMPLE_SIZE // 16
+    generator: ReportGenerator = make_app().settings['report_generator']
+    report = generator.build_report("", baseline_form, partial(
+        concurrent.futures.ThreadPoolExecutor, 1,
+    ), sample_size=sample_size)
+    assert 'id="reduced_sample_size"' in report
+    assert f'Monte Carlo samples ({sample_size})' in report
+
+
+def test_template_environment_reused():
+    generator: ReportGenerator = make_app().settings['report_generator']
+    env = generator._template_environment()
+    # The generator is pickled when sent to a worker process.
+    assert pickle.loads(pickle.dumps(generator))._template_environment() is env
+    assert env.get_template("calculator.report.html.j2") is env.get_template("calculator.report.html.j2")
+
+
+def test_template_environment_key():
+    loader = jinja2.ChoiceLoader([
+        jinja2.FileSystemLoader(['a', 'b']),
+        jinja2.PackageLoader('caimira.apps', 'templates'),
+    ])
+    # The key of a loader survives its pickling.
+    assert rep_gen._loader_key(pickle.loads(pickle.dumps(loader))) == rep_gen._loader_key(loader)
+    assert rep_gen._loader_key(jinja2.FileSystemLoader(['a'])) != rep_gen._loader_key(loader)
+
+
+def test_template_environments_bounded(tmp_path, monkeypatch):
+    (tmp_path / 'common_text.md.j2').write_text('# Title\nSome text\n')
+    monkeypatch.setattr(rep_gen, '_TEMPLATE_ENVIRONMENTS', {})
+    monkeypatch.setattr(rep_gen, '_COMMON_TEXT', {})
+    # Loaders without a stable key are identified by their identity.
+    for _ in range(rep_gen._MAX_TEMPLATE_ENVIRONMENTS + 2):
+        loader = jinja2.FunctionLoader(lambda name: (tmp_path / name).read_text())
+        ReportGenerator(loader, None, None)._template_environment()
+    assert len(rep_gen._TEMPLATE_ENVIRONMENTS) == rep_gen._MAX_TEMPLATE_ENVIRONMENTS
+    assert rep_gen._COMMON_TEXT.keys() == rep_gen._TEMPLATE_ENVIRONMENTS.keys()
+
+
+def test_template_environment_reloads_common_text(tmp_path):
+    common_text = tmp_path / 'common_text.md.j2'
+    common_text.write_text('# Title\nSome text\n')
+    generator = ReportGenerator(jinja2.FileSystemLoader([str(tmp_path)]), None, None)
+    assert 'Some text' in generator._template_environment().globals['common_text']['Title']
+
+    common_text.write_text('# Title\nSome other text\n')
+    stat = common_text.stat()
+    os.utime(common_text, (stat.st_atime, stat.st_mtime + 10))
+    assert 'Some other text' in generator._template_environment().globals['common_text']['Title']
+
+
+def test_split():
+    assert rep_gen._split(list(range(7)), 3) == [[0, 1, 2], [3, 4], [5, 6]]
+    assert rep_gen._split(list(range(2)), 4) == [[0], [1]]
+    assert rep_gen._split([], 4) == [[]]
+
+
+def test_scenario_chunks_share_components(baseline_form):
+    with model_generator.shared_components():
+        scenarios = list(rep_gen.manufacture_alternative_scenarios(baseline_form).values())
+    assert len(scenarios) >= 2
+
+    # The scenarios of a chunk (as sent to a worker, with loky's cloudpickle)
+    # still share their components.
+    [chunk] = pickle.loads(cloudpickle.dumps(rep_gen._split(scenarios, 1)))
+    assert chunk[0].concentration_model.room is chunk[1].concentration_model.room
+    first, second = [scenario.build_model(10) for scenario in chunk[:2]]
+    assert first.concentration_model.room is second.concentration_model.room
 
 
 @pytest.mark.parametrize(
@@ -88,3 +168,64 @@ def test_interesting_times_w_temp(exposure_model_w_outside_temp_changes):
         5., 5.4, 5.8, 6.2, 6.6, 7., 7.4, 7.8, 8.
     ]
     np.testing.assert_allclose(result, expected)
+
+
+def test_uncertainties_plot(baseline_form, monkeypatch, tmp_path):
+    cache_dir = tmp_path / 'plots'
+    monkeypatch.setattr(rep_gen, 'PLOT_CACHE_DIR', cache_dir)
+    baseline_form.conditional_probability_plot = True
+    model = baseline_form.build_model(sample_size=5000)
+    report_data = rep_gen.calculate_report_data(baseline_form, model)
+
+    # The plot identifier is its (compressed) data, such that it can be rendered anywhere.
+    plot_id = report_data['uncertainties_plot_id']
+    assert len(plot_id) < 4096
+    plot_data = rep_gen.decode_plot_data(plot_id)
+    np.testing.assert_allclose(plot_data['prob_mean'] * 100, report_data['prob_inf'], rtol=1e-6)
+    np.testing.assert_allclose(
+        plot_data['pi_means'] * 100, report_data['conditional_probability_data']['pi_means'], rtol=1e-6,
+    )
+    np.testing.assert_allclose(
+        plot_data['viral_loads'], report_data['conditional_probability_data']['viral_loads'], rtol=1e-6,
+    )
+    np.testing.assert_allclose(plot_data['vl_hist_bins'], np.linspace(2, 10, 151), rtol=1e-6)
+    assert plot_data['prob_hist_count'].sum() == 5000
+
+    image = rep_gen.render_uncertainties_plot(plot_id, 'png')
+    assert image.startswith(b'\x89PNG')
+    assert cache_dir.stat().st_mode & 0o777 == 0o700
+    assert len(list(cache_dir.glob('*.png'))) == 1
+    assert rep_gen.render_uncertainties_plot(plot_id, 'png') == image
+    assert b'<svg' in rep_gen.render_uncertainties_plot(plot_id, 'svg')
+
+    # The cache of rendered plots is not needed to render them again.
+    for path in cache_dir.iterdir():
+        path.unlink()
+    assert rep_gen.render_uncertainties_plot(plot_id, 'png').startswith(b'\x89PNG')
+
+    # Nor is it used if other users can access it.
+    cache_dir.chmod(0o755)
+    for path in cache_dir.iterdir():
+        path.unlink()
+    assert rep_gen.render_uncertainties_plot(plot_id, 'png').startswith(b'\x89PNG')
+    assert list(cache_dir.iterdir()) == []
+
+
+def _encoded(values) -> str:
+    content = np.asarray(values, dtype='<f4').tobytes()
+    return base64.urlsafe_b64encode(zlib.compress(content)).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('plot_id', [
+    '0123abcd',
+    'not base64!',
+    # Too much (or too little) data, however well it compresses.
+    base64.urlsafe_b64encode(zlib.compress(bytes(100_000_000))).decode(),
+    _encoded([0.5] * 100),
+    # Bounds of the evenly spaced arrays which are not finite.
+    _encoded([0.5, np.nan, 10] + [0.] * (rep_gen._PLOT_DATA_SIZE // 4 - 3)),
+    _encoded([0.5, 2, np.inf] + [0.] * (rep_gen._PLOT_DATA_SIZE // 4 - 3)),
+])
+def test_invalid_plot_id(plot_id):
+    with pytest.raises(ValueError):
+        rep_gen.decode_plot_data(plot_id)
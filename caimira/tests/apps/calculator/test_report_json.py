@@ -1,4 +1,6 @@
+import asyncio
 import json
+from unittest import mock
 
 import tornado.testing
 
@@ -29,4 +31,88 @@ class TestCalculatorJsonResponse(tornado.testing.AsyncHTTPTestCase):
         data = json.loads(response.body)
         self.assertIsInstance(data['prob_inf'], float)
         self.assertIsInstance(data['expected_new_cases'], float)
+        self.assertFalse(data['reduced_sample_size'])
 
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_batch_response(self):
+        form_data = model_generator.baseline_raw_form_data()
+        response = yield self.http_client.fetch(
+            request=self.get_url("/calculator/report-json/batch"),
+            method="POST",
+            headers={'content-type': 'application/json'},
+            body=json.dumps([form_data, {'not_a_form_field': 1}, form_data]),
+        )
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+
+        lines = [json.loads(line) for line in response.body.decode().splitlines()]
+        lines_by_index = {line['index']: line for line in lines}
+        self.assertEqual(sorted(lines_by_index), [0, 1, 2])
+        self.assertIn('error', lines_by_index[1])
+        self.assertIsInstance(lines_by_index[0]['report_data']['prob_inf'], float)
+        self.assertEqual(lines_by_index[0]['report_data'], lines_by_index[2]['report_data'])
+
+
+class TestBatchConcurrency(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        app = caimira.apps.calculator.make_app()
+        app.settings['report_batch_concurrency'] = 2
+        return app
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_batch_in_flight(self):
+        in_flight = []
+        max_in_flight = 0
+
+        async def run_report_in_worker(handler, fn, form):
+            nonlocal max_in_flight
+            in_flight.append(form)
+            max_in_flight = max(max_in_flight, len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(form)
+            return {'occupancy': form.total_people}
+
+        forms = [
+            dict(model_generator.baseline_raw_form_data(), total_people=str(total_people))
+            for total_people in range(5, 15)
+        ]
+        with mock.patch.object(
+                caimira.apps.calculator.ConcentrationModelJsonBatch, 'run_report_in_worker', run_report_in_worker,
+        ):
+            response = yield self.http_client.fetch(
+                request=self.get_url("/calculator/report-json/batch"),
+                method="POST",
+                headers={'content-type': 'application/json'},
+                body=json.dumps(forms),
+            )
+        lines = [json.loads(line) for line in response.body.decode().splitlines()]
+        self.assertEqual(
+            sorted((line['index'], line['report_data']['occupancy']) for line in lines),
+            [(index, index + 5) for index in range(10)],
+        )
+        # The forms of the batch are not all given to the workers at once.
+        self.assertEqual(max_in_flight, 2)
+
+
+class TestMemoryLimit(tornado.testing.AsyncHTTPTestCase):
+    def setUp(self):
+        super().setUp()
+        self.http_client.defaults['request_timeout'] = _TIMEOUT
+
+    def get_app(self):
+        app = caimira.apps.calculator.make_app()
+        # No report fits in 1 MiB, even with the fewest samples.
+        app.settings['report_memory_limit'] = 1.
+        return app
+
+    @tornado.testing.gen_test(timeout=_TIMEOUT)
+    def test_memory_limit_exceeded(self):
+        response = yield self.http_client.fetch(
+            request=self.get_url("/calculator/report-json"),
+            method="POST",
+            headers={'content-type': 'application/json'},
+            body=json.dumps(model_generator.baseline_raw_form_data()),
+            raise_error=False,
+        )
+        self.assertEqual(response.code, 503)
@@ -0,0 +1,148 @@
+import concurrent.futures
+import os
+import signal
+import threading
+import time
+
+import loky
+import numpy as np
+import pytest
+
+from caimira.apps.calculator import memory, metrics
+from caimira.apps.calculator.scenario_pool import (
+    ScenarioPool, shared_scenario_pool, scenario_lane, scenario_pool_size,
+)
+
+
+def test_lane_map():
+    pool = ScenarioPool(max_workers=2)
+    with pool.lane() as lane:
+        results = lane.map(pow, [2, 3, 4], [2, 2, 2], timeout=60)
+    assert list(results) == [4, 9, 16]
+    assert pool._in_flight == 0
+
+
+def test_lane_metrics():
+    pool = ScenarioPool(max_workers=2)
+
+    def report():
+        with pool.lane() as lane:
+            return list(lane.map(pow, [2, 3, 4], [2, 2, 2], timeout=60))
+
+    # The tasks are recorded in the metrics of the report, and exported once merged.
+    result, task_metrics = metrics.collect(report)
+    assert result == [4, 9, 16]
+    assert len(task_metrics.scenario_tasks) == 3
+    assert all(queue_wait >= 0 for queue_wait, _ in task_metrics.scenario_tasks)
+
+    count = (metrics.REGISTRY.get_sample_value('caimira_scenario_task_duration_seconds_count') or 0)
+    metrics.merge(task_metrics)
+    assert (metrics.REGISTRY.get_sample_value('caimira_scenario_task_duration_seconds_count') or 0) == count + 3
+
+
+def test_lane_error():
+    pool = ScenarioPool(max_workers=1)
+    with pool.lane() as lane:
+        future = lane.submit(int, 'not a number')
+    assert isinstance(future.exception(), ValueError)
+
+
+def staged_task():
+    with metrics.stage_timer('scenario_statistics'):
+        return os.getpid()
+
+
+def allocating_task():
+    with metrics.stage_timer('scenario_statistics'):
+        data = np.ones(64 * 1024 * 1024 // 8)
+        data[:] = 2.
+    return os.getpid()
+
+
+def kill_process():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_lane_memory_limit():
+    pool = ScenarioPool(max_workers=1)
+
+    def report(task=staged_task):
+        with pool.lane() as lane:
+            return lane.submit(task)
+
+    # The tasks are held to the memory limit of the report which submitted them.
+    future, task_metrics = metrics.collect(memory.guarded_call, None, False, report)
+    assert future.result() != os.getpid()
+    [(_, scenario_metrics)] = task_metrics.scenario_tasks
+    if memory.current_rss() is not None:
+        assert scenario_metrics.peak_rss is not None
+        # A task cannot allocate 64 MiB within 16 MiB.
+        future = memory.guarded_call(16., False, report, allocating_task)
+        assert isinstance(future.exception(), memory.MemoryLimitExceeded)
+
+
+def test_lane_killed_process():
+    pool = ScenarioPool(max_workers=1)
+    with pool.lane() as lane:
+        future = lane.submit(kill_process)
+    # As the Operating System kills the processes which run out of memory.
+    assert isinstance(future.exception(), MemoryError)
+
+    # The pool recovers from the loss of its process.
+    with pool.lane() as lane:
+        assert lane.submit(pow, 2, 2).result(timeout=60) == 4
+
+
+def test_fair_ordering():
+    # Only one task is sent at a time, hence the order in which the tasks
+    # complete reflects the order in which they were dispatched.
+    pool = ScenarioPool(max_workers=1)
+    blocker = pool.lane()
+    blocker.submit(time.sleep, 1)
+    first, second = pool.lane(), pool.lane()
+    completed = []
+    lock = threading.Lock()
+
+    def record(name):
+        def callback(future):
+            with lock:
+                completed.append(name)
+        return callback
+
+    futures = []
+    for i in range(3):
+        futures.append(first.submit(pow, 2, i))
+        futures[-1].add_done_callback(record('first'))
+    futures.append(second.submit(pow, 3, 1))
+    futures[-1].add_done_callback(record('second'))
+    concurrent.futures.wait(futures, timeout=60)
+
+    # The second report does not wait for all the tasks of the first one.
+    assert completed.index('second') < 2
+
+
+def test_scenario_pool_size():
+    assert scenario_pool_size(8, 2) == 4
+    assert scenario_pool_size(2, 4) == 1
+    assert scenario_pool_size(None, 1) == loky.cpu_count()
+    assert scenario_pool_size(None, None) == 1
+
+
+def test_shared_pool():
+    assert scenario_lane(1)._pool is shared_scenario_pool(1)
+    assert scenario_lane(1) is not scenario_lane(1)
+
+
+def test_shared_pool_resized():
+    pool = shared_scenario_pool(1)
+    with pool.lane() as lane:
+        future = lane.submit(pow, 2, 3)
+        # A single pool is kept: the previous one is shut down once its tasks are sent.
+        resized = shared_scenario_pool(2)
+        assert resized is not pool and resized.max_workers == 2
+        assert shared_scenario_pool(2) is resized
+        assert future.result(timeout=60) == 8
+    with pytest.raises(RuntimeError):
+        pool._executor.submit(pow, 2, 3)
+    with resized.lane() as lane:
+        assert lane.submit(pow, 2, 4).result(timeout=60) == 16
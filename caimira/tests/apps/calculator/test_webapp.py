@@ -1,10 +1,13 @@
 from pathlib import Path
+import json
+import urllib.parse
 
 import pytest
 import tornado.testing
 from retry import retry
 
 import caimira.apps.calculator
+from caimira.apps.calculator import model_generator
 from caimira.apps.calculator.report_generator import generate_permalink
 
 _TIMEOUT = 20.
@@ -91,6 +94,55 @@ class TestOpenApp(tornado.testing.AsyncHTTPTestCase):
         assert response.code == 404
 
 
+class TestReportEvents(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return caimira.apps.calculator.make_app()
+
+    @tornado.testing.gen_test(timeout=60)
+    def test_report_events(self):
+        # The XSRF cookie set by the form page, which is also a valid token.
+        response = yield self.http_client.fetch(self.get_url('/calculator'))
+        xsrf_token = response.headers['Set-Cookie'].split('_xsrf=', 1)[1].split(';', 1)[0]
+        query = urllib.parse.urlencode(dict(model_generator.baseline_raw_form_data(), _xsrf=xsrf_token))
+        response = yield self.http_client.fetch(
+            self.get_url(f'/calculator/report/events?{query}'), request_timeout=60,
+            headers={'Cookie': f'_xsrf={xsrf_token}'},
+        )
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+
+        events = []
+        for message in response.body.decode().strip().split('\n\n'):
+            event, data = message.split('\n', 1)
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+
+        assert [event for event, _ in events] == [
+            'headline', 'concentrations', 'alternative_scenarios', 'report',
+        ]
+        headline, concentrations, alternative_scenarios = (data for _, data in events[:3])
+        # Only the figures shown whilst the report is loading are sent.
+        assert sorted(headline) == ['expected_new_cases', 'prob_inf', 'prob_inf_sd']
+        assert len(concentrations['times']) == len(concentrations['concentrations'])
+        assert all(
+            sorted(stats) == ['expected_new_cases', 'probability_of_infection']
+            for stats in alternative_scenarios.values()
+        )
+        assert 'expected number of new cases is' in events[-1][1]['html']
+
+    def test_report_events_xsrf(self):
+        # The report is computed by a GET request, which must carry the XSRF token.
+        query = urllib.parse.urlencode(model_generator.baseline_raw_form_data())
+        response = self.fetch(f'/calculator/report/events?{query}')
+        self.assertEqual(response.code, 403)
+        response = self.fetch(f'/calculator/report?{query}')
+        self.assertEqual(response.code, 405)
+
+
+async def test_invalid_report_plot(http_server_client):
+    response = await http_server_client.fetch('/calculator/report/plots/0123abcd.png', raise_error=False)
+    assert response.code == 400
+
+
 async def test_permalink_urls(http_server_client, baseline_form):
     base_url = 'proto://hostname/prefix'
     permalink_data = generate_permalink(base_url, lambda: "", lambda: "/calculator", baseline_form)
@@ -0,0 +1,57 @@
+import os
+
+import loky
+
+from caimira.apps.calculator import make_app, metrics, worker_pool
+
+
+def test_warm_up_worker(monkeypatch):
+    monkeypatch.setattr(metrics, '_warm_up_duration', None)
+    worker_pool.warm_up_worker(make_app().settings['template_searchpath'], run_baseline_model=True)
+
+    # The warm-up time is reported with the first task of the worker only.
+    _, task_metrics = metrics.collect(os.getpid)
+    assert task_metrics.warm_up_duration is not None and task_metrics.warm_up_duration > 0
+    assert task_metrics.warm_up_errors == []
+    _, task_metrics = metrics.collect(os.getpid)
+    assert task_metrics.warm_up_duration is None
+
+
+def test_warm_up_worker_errors(monkeypatch):
+    def fail():
+        raise FileNotFoundError('global_weather_set.json')
+
+    monkeypatch.setattr(worker_pool, '_load_weather_data', fail)
+
+    # A failed step does not fail the warm-up (hence the pool), and is recorded.
+    worker_pool.warm_up_worker()
+    _, task_metrics = metrics.collect(os.getpid)
+    assert task_metrics.warm_up_errors == ['load_weather_data']
+
+    errors = (metrics.REGISTRY.get_sample_value('caimira_worker_warm_up_errors_total', {'step': 'load_weather_data'}) or 0)
+    metrics.merge(task_metrics)
+    assert (metrics.REGISTRY.get_sample_value('caimira_worker_warm_up_errors_total', {'step': 'load_weather_data'}) or 0) == errors + 1
+
+
+def test_worker_executor():
+    # The executor is re-used as long as the arguments are the same, including
+    # across applications.
+    executor = worker_pool.worker_executor(1, make_app().settings['template_searchpath'])
+    assert worker_pool.worker_executor(1, make_app().settings['template_searchpath']) is executor
+
+    result, _ = executor.submit(metrics.collect, os.getpid).result(timeout=120)
+    assert result != os.getpid()
+
+
+def test_warm_up_worker_process():
+    # A fresh executor, as the workers of the re-usable one may have already
+    # reported their warm-up.
+    executor = loky.ProcessPoolExecutor(
+        max_workers=1, initializer=worker_pool.warm_up_worker,
+        initargs=(tuple(make_app().settings['template_searchpath']),),
+    )
+    try:
+        _, task_metrics = executor.submit(metrics.collect, os.getpid).result(timeout=120)
+    finally:
+        executor.shutdown()
+    assert task_metrics.warm_up_duration is not None
@@ -1,4 +1,7 @@
 import datetime
+import json
+import os
+import pickle
 
 import dateutil.tz
 import numpy as np
@@ -72,3 +75,203 @@ def test_timezone_at__expected(latitude, longitude, expected_tz_name):
     assert wx.timezone_at(latitude=longitude, longitude=latitude) == dateutil.tz.gettz(expected_tz_name)
     assert wx.timezone_at(latitude=0, longitude=-175) == dateutil.tz.gettz('Etc/GMT+12')
     assert wx.timezone_at(latitude=89.8, longitude=-170) == dateutil.tz.gettz('Etc/GMT+11')
+
+
+@pytest.fixture
+def wx_source(tmp_path, monkeypatch):
+    source = {
+        '000001-99999': {str(month): [month + hour / 10 for hour in range(24)] for month in range(1, 13)},
+        '000002-99999': {str(month): [-month - hour / 10 for hour in range(24)] for month in range(1, 13)},
+    }
+    (tmp_path / wx.WX_DATA_SOURCE).write_text(json.dumps(source))
+    monkeypatch.setattr(wx, 'WX_DATA_LOCATION', tmp_path)
+    wx.wx_store.cache_clear()
+    yield source
+    wx.wx_store.cache_clear()
+
+
+def test_convert_wx_data(wx_source, tmp_path):
+    store = wx.convert_wx_data(tmp_path / wx.WX_DATA_SOURCE, tmp_path)
+    assert store.station_index == {'000001-99999': 0, '000002-99999': 1}
+    assert store.temperatures.shape == (2, 12, 24)
+    assert store.temperatures.dtype == np.float32
+    np.testing.assert_allclose(store.temperatures[1, 2], -3 - np.arange(24) / 10, rtol=1e-6)
+
+
+def test_wx_store_memory_mapped(wx_source, tmp_path):
+    store = wx.wx_store()
+    assert (tmp_path / wx.WX_STORE_TEMPERATURES).exists()
+    assert isinstance(store.temperatures, np.memmap)
+    assert not store.temperatures.flags.writeable
+
+    temperatures = wx.mean_hourly_temperatures('000001-99999', 12)
+    assert temperatures.dtype == np.float64
+    np.testing.assert_allclose(temperatures, 273.15 + 12 + np.arange(24) / 10, rtol=1e-8)
+
+
+@pytest.fixture
+def wx_ragged_source(wx_source, tmp_path):
+    # Stations with a short month, a missing month and a month with NaN values.
+    wx_source['000003-99999'] = {**wx_source['000001-99999'], '2': [1.0] * 7}
+    wx_source['000004-99999'] = {
+        month: temperatures for month, temperatures in wx_source['000001-99999'].items() if month != '5'
+    }
+    wx_source['000005-99999'] = {**wx_source['000001-99999'], '3': [float('nan')] * 24}
+    (tmp_path / wx.WX_DATA_SOURCE).write_text(json.dumps(wx_source))
+    yield wx_source
+
+
+def test_convert_wx_data__incomplete_months(wx_ragged_source, tmp_path):
+    store = wx.convert_wx_data(tmp_path / wx.WX_DATA_SOURCE, tmp_path)
+    assert len(store.station_index) == 5
+    assert np.isnan(store.temperatures[2, 1]).all()
+    assert np.isnan(store.temperatures[3, 4]).all()
+    assert np.isnan(store.temperatures[4, 2]).all()
+    assert store.complete_stations() == ['000001-99999', '000002-99999']
+
+    # The complete months of incomplete stations are kept.
+    np.testing.assert_allclose(wx.mean_hourly_temperatures('000003-99999', 1), 273.15 + 1 + np.arange(24) / 10)
+    for station, month in [('000003-99999', 2), ('000004-99999', 5), ('000005-99999', 3)]:
+        with pytest.raises(KeyError):
+            wx.mean_hourly_temperatures(station, month)
+    assert '2' not in wx.wx_data()['000003-99999']
+
+
+def test_wx_store_not_writable(wx_source, tmp_path, monkeypatch):
+    def read_only(*args):
+        raise PermissionError('read-only')
+
+    # The converted data is kept in memory, rather than converted again.
+    monkeypatch.setattr(wx, '_write_wx_store', read_only)
+    monkeypatch.setattr(wx, 'convert_wx_data', read_only)
+    store = wx.wx_store()
+    assert not (tmp_path / wx.WX_STORE_TEMPERATURES).exists()
+    assert set(store.station_index) == {'000001-99999', '000002-99999'}
+
+
+def test_wx_store_missing_source(wx_source, tmp_path):
+    (tmp_path / wx.WX_DATA_SOURCE).unlink()
+    with pytest.raises(FileNotFoundError, match='weather data source .* is missing'):
+        wx.wx_store()
+
+
+def test_wx_store_reconverted(wx_source, tmp_path):
+    wx.wx_store()
+    wx.wx_store.cache_clear()
+
+    # A newer source replaces the existing store.
+    wx_source['000003-99999'] = wx_source['000001-99999']
+    source = tmp_path / wx.WX_DATA_SOURCE
+    source.write_text(json.dumps(wx_source))
+    mtime = (tmp_path / wx.WX_STORE_TEMPERATURES).stat().st_mtime
+    os.utime(source, (mtime + 1, mtime + 1))
+    assert set(wx.wx_store().station_index) == {'000001-99999', '000002-99999', '000003-99999'}
+
+
+def _station_line(station_id: str, name: str, latitude: float, longitude: float) -> str:
+    return f'{station_id:<12} {name:<31}{latitude:>7.3f}{longitude:>9.3f}{0:>9.1f}\n'
+
+
+@pytest.fixture
+def wx_station_file(wx_ragged_source, tmp_path):
+    (tmp_path / wx.WX_STATION_FILE).write_text(''.join([
+        _station_line('000001-99999', 'STATION A', 46.2, 6.1),
+        _station_line('000009-99999', 'NO WEATHER DATA', 46.2, 6.2),
+        _station_line('000003-99999', 'INCOMPLETE WEATHER DATA', 46.2, 6.2),
+        _station_line('000002-99999', 'STATION B', -37.8, 144.9),
+    ]))
+    wx.wx_station_index.cache_clear()
+    wx.wx_station_data.cache_clear()
+    yield
+    wx.wx_station_index.cache_clear()
+    wx.wx_station_data.cache_clear()
+
+
+def test_wx_station_index(wx_station_file, tmp_path):
+    index = wx.wx_station_index()
+    assert (tmp_path / wx.WX_STATION_INDEX).exists()
+    assert [record[0] for record in index.records] == ['000001-99999', '000002-99999']
+    assert index.records[1] == ('000002-99999', 'STATION B                      ', -37.8, 144.9)
+
+    assert wx.nearest_wx_station(longitude=6.2, latitude=46.2)[0] == '000001-99999'
+    assert wx.nearest_wx_station(longitude=145, latitude=-38)[0] == '000002-99999'
+    assert list(wx.wx_station_data()) == ['000001-99999', '000002-99999']
+
+
+def test_wx_station_index_versioned(wx_station_file, tmp_path, monkeypatch):
+    wx.wx_station_index()
+    wx.wx_station_index.cache_clear()
+    mtime = (tmp_path / wx.WX_STATION_INDEX).stat().st_mtime
+
+    # The saved index is loaded as long as it is up to date.
+    build_wx_station_index = wx.build_wx_station_index
+    monkeypatch.setattr(wx, 'build_wx_station_index', None)
+    assert len(wx.wx_station_index().records) == 2
+    monkeypatch.setattr(wx, 'build_wx_station_index', build_wx_station_index)
+    wx.wx_station_index.cache_clear()
+
+    # An index of another version is built again.
+    monkeypatch.setattr(wx, 'WX_STATION_INDEX_VERSION', wx.WX_STATION_INDEX_VERSION + 1)
+    assert len(wx.wx_station_index().records) == 2
+    assert (tmp_path / wx.WX_STATION_INDEX).stat().st_mtime >= mtime
+    with (tmp_path / wx.WX_STATION_INDEX).open('rb') as fh:
+        assert pickle.load(fh)['version'] == wx.WX_STATION_INDEX_VERSION
+
+
+def test_wx_station_timezone(wx_station_file):
+    assert wx.wx_station_timezone('000001-99999') == dateutil.tz.gettz('Europe/Zurich')
+    assert wx.wx_station_timezone('000002-99999') == dateutil.tz.gettz('Australia/Melbourne')
+
+
+def test_timezones_at(monkeypatch):
+    wx._timezone_name_at.cache_clear()
+    lookups = []
+
+    class Finder:
+        def timezone_at(self, lat, lng):
+            lookups.append((lat, lng))
+            return 'Europe/Zurich'
+
+    monkeypatch.setattr(wx, '_timezone_finder', Finder)
+
+    # Nearby locations (after rounding) are looked up once only.
+    timezones = wx.timezones_at([(46.20833, 6.14275), (46.208331, 6.142751), (46.3, 6.2)])
+    assert timezones == [dateutil.tz.gettz('Europe/Zurich')] * 3
+    assert lookups == [(46.2083, 6.1428), (46.3, 6.2)]
+
+    assert wx.timezone_at(latitude=46.3, longitude=6.2) == dateutil.tz.gettz('Europe/Zurich')
+    assert len(lookups) == 2
+    wx._timezone_name_at.cache_clear()
+
+
+def test_timezone_name_and_utc_offset():
+    assert wx.timezone_name_and_utc_offset(latitude=46.20833, longitude=6.14275, year=2023, month=1) == ('CET', 1)
+    assert wx.timezone_name_and_utc_offset(latitude=46.20833, longitude=6.14275, year=2023, month=7) == ('CEST', 2)
+
+
+def test_nearest_wx_stations(tmp_path, monkeypatch):
+    stations = {
+        '000001-99999': ('ANTIMERIDIAN EAST', 0., 179.5),
+        '000002-99999': ('ANTIMERIDIAN WEST', 0., 170.),
+        '000003-99999': ('NEAR POLE', 89., 0.),
+        '000004-99999': ('ARCTIC', 80., 90.),
+    }
+    (tmp_path / wx.WX_DATA_SOURCE).write_text(json.dumps({
+        station_id: {str(month): [0.] * 24 for month in range(1, 13)} for station_id in stations
+    }))
+    (tmp_path / wx.WX_STATION_FILE).write_text(''.join(
+        _station_line(station_id, name, latitude, longitude)
+        for station_id, (name, latitude, longitude) in stations.items()
+    ))
+    monkeypatch.setattr(wx, 'WX_DATA_LOCATION', tmp_path)
+    wx.wx_store.cache_clear()
+    wx.wx_station_index.cache_clear()
+
+    # Across the antimeridian, and across the pole (both further away in
+    # longitude & latitude than the wrong stations).
+    records = wx.nearest_wx_stations([-179.5, 180.], [0., 88.])
+    assert [record[0] for record in records] == ['000001-99999', '000003-99999']
+    assert wx.nearest_wx_station(longitude=171, latitude=1)[0] == '000002-99999'
+
+    wx.wx_store.cache_clear()
+    wx.wx_station_index.cache_clear()
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+import caimira
+
+#: The maximum time (in seconds) to import the calculator app in a fresh
+#: interpreter. It took about 5 seconds before the heavy dependencies and data
+#: were deferred to first use, and takes well under a second since. The default
+#: is generous, such that a busy machine does not fail the test, and can be
+#: overridden with the CAIMIRA_IMPORT_TIME_BUDGET environment variable (e.g. on
+#: a dedicated benchmark runner).
+IMPORT_TIME_BUDGET = float(os.environ.get('CAIMIRA_IMPORT_TIME_BUDGET', 3.))
+
+#: The modules which are only needed to compute (or plot) a report.
+DEFERRED_MODULES = [
+    'IPython', 'ipywidgets', 'matplotlib', 'pandas', 'scipy.stats', 'scipy.interpolate',
+    'scipy.spatial', 'sklearn', 'timezonefinder', 'caimira.monte_carlo.data',
+]
+
+
+def _import_times(module: str) -> dict:
+    """Return the cumulative import time (in seconds) of each module imported with the given one."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=Path(caimira.__file__).parent.parent, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize('module', ['caimira.apps.calculator', 'caimira.monte_carlo', 'caimira.data'])
+def test_deferred_imports(module):
+    imported = _import_times(module)
+    assert [name for name in DEFERRED_MODULES if name in imported] == []
+
+
+def test_import_time_budget():
+    # The best of a few runs, to be robust to a busy machine.
+    import_time = min(_import_times('caimira.apps.calculator')['caimira.apps.calculator'] for _ in range(3))
+    assert import_time < IMPORT_TIME_BUDGET
@@ -55,6 +55,19 @@ def test_lognormal(mean_gaussian, std_gaussian):
     npt.assert_allclose(selected_histogram, exact_dist, rtol=0.03)
 
 
+@pytest.mark.parametrize(
+    "distribution",[
+        sampleable.Normal(1., 0.5),
+        sampleable.Uniform(0.2, 1.4),
+        sampleable.LogNormal(-0.6872121723362303, 0.10498338229297108),
+        sampleable.LogNormal(1.1644665696723049, 0.6),
+    ]
+)
+def test_expected_value(distribution):
+    samples = distribution.generate_samples(2000000)
+    npt.assert_allclose(distribution.expected_value(), samples.mean(), rtol=0.005)
+
+
 @pytest.mark.parametrize(
     "use_kernel",
     [False, True],
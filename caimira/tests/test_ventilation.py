@@ -135,3 +135,50 @@ def test_multiple_vectorisation():
     r = models.MultipleVentilation([v2, v3]).air_exchange(room, t_active)
     assert isinstance(r, np.ndarray)
     np.testing.assert_array_equal(r, [10, 11, 12, 13, 14])
+
+
+@pytest.mark.parametrize("rtol", [0.001, 0.01, 0.05])
+def test_compress_outside_temp(baseline_slidingwindow, rtol):
+    # A daily temperature cycle, in 6 minute steps, some of which are warmer
+    # than inside (where the minimum temperature difference applies).
+    times = np.linspace(0, 24, 241)
+    temperatures = 290 + 8 * np.sin(np.pi * times[:-1] / 12)
+    window = dataclasses.replace(
+        baseline_slidingwindow,
+        active=models.PeriodicInterval(period=120, duration=120),
+        outside_temp=models.PiecewiseConstant(tuple(times), tuple(temperatures)),
+    )
+    room = models.Room(volume=75, inside_temp=models.PiecewiseConstant((0, 24), (293,)))
+
+    compressed = window.compress_outside_temp(room, rtol)
+    assert compressed.outside_temp.transition_times[0] == 0
+    assert compressed.outside_temp.transition_times[-1] == 24
+    assert len(compressed.outside_temp.values) < len(temperatures)
+
+    # The air exchange of each original step changes by at most rtol.
+    for time in (times[:-1] + times[1:]) / 2:
+        npt.assert_allclose(
+            compressed.air_exchange(room, time), window.air_exchange(room, time), rtol=rtol * (1 + 1e-9),
+        )
+
+
+def test_compress_outside_temp_inside_temp_transitions(baseline_slidingwindow):
+    window = dataclasses.replace(
+        baseline_slidingwindow,
+        outside_temp=models.PiecewiseConstant((0, 1, 2, 3, 4), (280, 280, 280, 280)),
+    )
+    room = models.Room(volume=75, inside_temp=models.PiecewiseConstant((0, 2, 4), (293, 295)))
+
+    # Steps are not merged across a change of the inside temperature.
+    compressed = window.compress_outside_temp(room, 0.01)
+    assert compressed.outside_temp.transition_times == (0, 2, 4)
+    npt.assert_allclose(compressed.outside_temp.values, (280, 280))
+
+
+def test_compress_outside_temp_vectorised(baseline_slidingwindow):
+    window = dataclasses.replace(
+        baseline_slidingwindow,
+        outside_temp=models.PiecewiseConstant((0, 1, 2), (np.array([280, 281]), np.array([280, 281]))),
+    )
+    room = models.Room(volume=75, inside_temp=models.PiecewiseConstant((0, 24), (293,)))
+    assert window.compress_outside_temp(room, 0.01) is window
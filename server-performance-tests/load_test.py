@@ -0,0 +1,223 @@
+"""
+In-process load test of the calculator: the app (``make_app``) is served on an
+ephemeral local port and driven by a weighted mix of report requests
+(``/calculator/report`` form posts and ``/calculator/report-json`` posts), at
+each of several concurrency levels, and for each combination of the
+``HANDLER_WORKER_POOL_SIZE`` and ``REPORT_PARALLELISM`` settings.
+
+The latency percentiles (p50/p95/p99) of each endpoint and the throughput are
+printed as a table (and optionally stored as JSON). The XSRF token and cookies
+of the form posts are handled as by a browser.
+
+Usage::
+
+    python server-performance-tests/load_test.py \\
+        --concurrency 1 2 4 8 --pool-sizes 1 2 --report-parallelism 1 2 \\
+        --requests 40 --mix report=1 report-json=3
+
+"""
+import argparse
+import asyncio
+import dataclasses
+import http.cookies
+import itertools
+import json
+import os
+import time
+import typing
+import urllib.parse
+
+import numpy as np
+import tornado.httpclient
+import tornado.httpserver
+import tornado.netutil
+
+from caimira.apps.calculator import make_app, model_generator
+
+#: The changes to the baseline form data of the forms which are posted (in turn).
+FORM_VARIANTS: typing.List[typing.Dict[str, typing.Any]] = [
+    {},
+    {
+        'ventilation_type': 'mechanical_ventilation',
+        'mechanical_ventilation_type': 'mech_type_air_changes', 'air_changes': '3',
+        'mask_wearing_option': 'mask_on',
+    },
+    {
+        'window_opening_regime': 'windows_open_periodically',
+        'windows_frequency': '60', 'windows_duration': '10', 'event_month': 'July',
+    },
+    {
+        'short_range_option': 'short_range_yes',
+        'short_range_interactions': json.dumps([
+            {'expiration': 'Shouting', 'start_time': '10:30', 'duration': '30'},
+        ]),
+    },
+]
+
+ENDPOINTS = ('report', 'report-json')
+
+#: The timeout (in seconds) of a single report request.
+REQUEST_TIMEOUT = 600.
+
+
+@dataclasses.dataclass
+class RequestResult:
+    endpoint: str
+    latency: float
+    ok: bool
+
+
+class Session:
+    """
+    A client of the calculator, which keeps the cookies set by the server (as a
+    browser would), and sends the XSRF token with the form posts.
+
+    """
+    def __init__(self, base_url: str, max_clients: int) -> None:
+        self.base_url = base_url
+        self.client = tornado.httpclient.AsyncHTTPClient(force_instance=True, max_clients=max_clients)
+        self.cookies: http.cookies.SimpleCookie = http.cookies.SimpleCookie()
+
+    async def fetch(self, path: str, **kwargs) -> tornado.httpclient.HTTPResponse:
+        headers = kwargs.pop('headers', {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+        response = await self.client.fetch(
+            self.base_url + path, headers=headers, raise_error=False,
+            request_timeout=REQUEST_TIMEOUT, **kwargs,
+        )
+        for cookie in response.headers.get_list('Set-Cookie'):
+            self.cookies.load(cookie)
+        return response
+
+    async def xsrf_token(self) -> str:
+        if '_xsrf' not in self.cookies:
+            # The calculator form sets the XSRF cookie.
+            await self.fetch('/calculator')
+        return self.cookies['_xsrf'].value
+
+    async def post_report(self, endpoint: str, form_data: dict) -> tornado.httpclient.HTTPResponse:
+        if endpoint == 'report':
+            body = urllib.parse.urlencode({**form_data, '_xsrf': await self.xsrf_token()})
+            return await self.fetch('/calculator/report', method='POST', body=body)
+        return await self.fetch(f'/calculator/{endpoint}', method='POST', body=json.dumps(form_data))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def forms() -> typing.Iterator[dict]:
+    for changes in itertools.cycle(FORM_VARIANTS):
+        yield {**model_generator.baseline_raw_form_data(), **changes}
+
+
+async def run_level(session: Session, mix: typing.Dict[str, int], concurrency: int, n_requests: int):
+    """Send ``n_requests`` (in the given mix of endpoints) from ``concurrency`` concurrent clients."""
+    endpoints = itertools.cycle([endpoint for endpoint, weight in mix.items() for _ in range(weight)])
+    requests = iter(list(zip(
+        [next(endpoints) for _ in range(n_requests)], itertools.islice(forms(), n_requests),
+    )))
+    results: typing.List[RequestResult] = []
+
+    async def client():
+        for endpoint, form_data in requests:
+            start = time.perf_counter()
+            response = await session.post_report(endpoint, form_data)
+            results.append(RequestResult(endpoint, time.perf_counter() - start, response.code == 200))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return results, time.perf_counter() - start
+
+
+def summarise(results: typing.List[RequestResult], duration: float) -> typing.Dict[str, dict]:
+    summary = {}
+    for endpoint in ['all', *ENDPOINTS]:
+        selected = [result for result in results if endpoint in ('all', result.endpoint)]
+        if not selected:
+            continue
+        latencies = [result.latency for result in selected if result.ok]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else [np.nan] * 3
+        summary[endpoint] = {
+            'requests': len(selected),
+            'errors': sum(not result.ok for result in selected),
+            'p50': p50, 'p95': p95, 'p99': p99,
+            'throughput': len(latencies) / duration,
+        }
+    return summary
+
+
+async def run_config(pool_size: int, report_parallelism: int, args) -> typing.List[dict]:
+    os.environ['HANDLER_WORKER_POOL_SIZE'] = str(pool_size)
+    os.environ['REPORT_PARALLELISM'] = str(report_parallelism)
+    app = make_app()
+    sockets = tornado.netutil.bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    server = tornado.httpserver.HTTPServer(app)
+    server.add_sockets(sockets)
+
+    rows = []
+    session = Session(f'http://127.0.0.1:{port}', max_clients=max(args.concurrency))
+    try:
+        # Warm up the workers (and the caches), before any measurement.
+        await run_level(session, {endpoint: 1 for endpoint in ENDPOINTS}, pool_size, 2 * pool_size)
+        for concurrency in args.concurrency:
+            results, duration = await run_level(session, args.mix, concurrency, args.requests)
+            for endpoint, summary in summarise(results, duration).items():
+                row = {
+                    'pool_size': pool_size, 'report_parallelism': report_parallelism,
+                    'concurrency': concurrency, 'endpoint': endpoint, **summary,
+                }
+                rows.append(row)
+                print(
+                    f"{pool_size:>5} {report_parallelism:>11} {concurrency:>11} {endpoint:<12} "
+                    f"{row['requests']:>8} {row['errors']:>6} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+                    f"{row['p99']:>8.2f} {row['throughput']:>10.3f}",
+                    flush=True,
+                )
+    finally:
+        session.close()
+        server.stop()
+        await server.close_all_connections()
+    return rows
+
+
+def parse_mix(items: typing.List[str]) -> typing.Dict[str, int]:
+    mix = {}
+    for item in items:
+        endpoint, _, weight = item.partition('=')
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {endpoint!r} (expected one of {ENDPOINTS})")
+        mix[endpoint] = int(weight or 1)
+    return mix
+
+
+async def main_async(args) -> None:
+    print(f"{'pool':>5} {'parallelism':>11} {'concurrency':>11} {'endpoint':<12} "
+          f"{'requests':>8} {'errors':>6} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'req/s':>10}")
+    rows = []
+    for pool_size, report_parallelism in itertools.product(args.pool_sizes, args.report_parallelism):
+        rows.extend(await run_config(pool_size, report_parallelism, args))
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(rows, fh, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument("--pool-sizes", type=int, nargs='+', default=[1],
+                        help="The values of HANDLER_WORKER_POOL_SIZE")
+    parser.add_argument("--report-parallelism", type=int, nargs='+', default=[1],
+                        help="The values of REPORT_PARALLELISM")
+    parser.add_argument("--requests", type=int, default=20, help="The number of requests at each concurrency level")
+    parser.add_argument("--mix", nargs='+', default=['report=1', 'report-json=1'],
+                        help="The weight of each endpoint, e.g. report=1 report-json=3")
+    parser.add_argument("--output", help="Also store the results in this JSON file")
+    args = parser.parse_args()
+    args.mix = parse_mix(args.mix)
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
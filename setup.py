@@ -29,6 +29,7 @@ REQUIREMENTS: dict = {
         'mistune',
         'numpy',
         'pandas',
+        'prometheus_client',
         'psutil',
         'python-dateutil',
         'retry',
@@ -95,6 +96,8 @@ setup(
         'apps/*/*/*/*',
         'apps/*/*/*/*/*',
         'data/*.json',
+        'data/*.npy',
+        'data/*.pickle',
         'data/*.txt',
     ]},
 )